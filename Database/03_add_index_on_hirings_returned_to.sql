@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS hirings_returned_to ON hirings (returned_to);
@@ -0,0 +1,21 @@
+-- point hirings of duplicated books to the oldest copy and remove duplicates,
+-- so (author, title) can be unique
+UPDATE hirings
+SET book_id = (
+	SELECT MIN(duplicate.id)
+	FROM books original
+	JOIN books duplicate ON duplicate.author = original.author AND duplicate.title = original.title
+	WHERE original.id = hirings.book_id
+)
+WHERE book_id IN (
+	SELECT id FROM books
+	WHERE id NOT IN (SELECT MIN(id) FROM books GROUP BY author, title)
+);
+
+DELETE FROM books
+WHERE id NOT IN (SELECT MIN(id) FROM books GROUP BY author, title);
+
+CREATE UNIQUE INDEX IF NOT EXISTS books_author_title ON books (author, title);
+CREATE INDEX IF NOT EXISTS users_email ON users (email);
+CREATE INDEX IF NOT EXISTS hirings_user_id ON hirings (user_id);
+CREATE INDEX IF NOT EXISTS hirings_book_id ON hirings (book_id);
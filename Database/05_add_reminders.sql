@@ -0,0 +1,18 @@
+-- last reminder sent for every hiring and time when it should be repeated
+CREATE TABLE IF NOT EXISTS reminders (
+	hiring_id INTEGER PRIMARY KEY,
+	last_sent_at DATETIME,
+	next_reminder_at DATETIME,
+	sent_count INTEGER NOT NULL DEFAULT 0,
+	CONSTRAINT reminders_hirings FOREIGN KEY (hiring_id) REFERENCES hirings(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS reminders_next_reminder_at ON reminders (next_reminder_at);
+
+-- high-water mark: hirings with returned_to before overdue_until were handled by run
+CREATE TABLE IF NOT EXISTS reminder_runs (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	overdue_until DATETIME,
+	sent INTEGER,
+	failed INTEGER
+);
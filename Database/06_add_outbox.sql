@@ -0,0 +1,14 @@
+-- outgoing emails waiting for worker.py (sent messages are deleted)
+CREATE TABLE IF NOT EXISTS outbox (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	kind TEXT NOT NULL,
+	recipient TEXT NOT NULL,
+	hirings_ids TEXT NOT NULL,
+	status TEXT NOT NULL DEFAULT 'pending',
+	attempts INTEGER NOT NULL DEFAULT 0,
+	available_at REAL NOT NULL,
+	last_error TEXT,
+	created_at DATETIME
+);
+
+CREATE INDEX IF NOT EXISTS outbox_status_available_at ON outbox (status, available_at);
@@ -0,0 +1,11 @@
+-- dates compared by queries are stored as integer seconds since 1970-01-01 (see controllers.to_timestamp)
+UPDATE hirings SET returned_to = CAST(strftime('%s', returned_to) AS INTEGER)
+WHERE typeof(returned_to) = 'text';
+
+UPDATE reminders SET
+	last_sent_at = CAST(strftime('%s', last_sent_at) AS INTEGER),
+	next_reminder_at = CAST(strftime('%s', next_reminder_at) AS INTEGER)
+WHERE typeof(last_sent_at) = 'text' OR typeof(next_reminder_at) = 'text';
+
+UPDATE reminder_runs SET overdue_until = CAST(strftime('%s', overdue_until) AS INTEGER)
+WHERE typeof(overdue_until) = 'text';
@@ -0,0 +1,44 @@
+-- full-text indexes of books and users (external content - rows are stored only once,
+-- indexes are kept in sync by triggers); case and diacritics are ignored,
+-- prefix indexes make 'term*' queries as fast as whole words
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5 (
+	title, author,
+	content='books', content_rowid='id',
+	tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+	INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+	INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+END;
+
+CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+	INSERT INTO books_fts (books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+	INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5 (
+	name, email,
+	content='users', content_rowid='id',
+	tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+	INSERT INTO users_fts (rowid, name, email) VALUES (new.id, new.name, new.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+	INSERT INTO users_fts (users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, email ON users BEGIN
+	INSERT INTO users_fts (users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+	INSERT INTO users_fts (rowid, name, email) VALUES (new.id, new.name, new.email);
+END;
+
+-- index rows existing before migration
+INSERT INTO books_fts (books_fts) VALUES ('rebuild');
+INSERT INTO users_fts (users_fts) VALUES ('rebuild');
@@ -0,0 +1,5 @@
+-- result of models.is_valid_email saved with user (NULL - not validated yet, filled by
+-- Database.validate_emails), reminders aren't sent to users with email_valid = 0
+ALTER TABLE users ADD COLUMN email_valid INTEGER;
+
+CREATE INDEX IF NOT EXISTS users_email_valid ON users (email_valid);
@@ -0,0 +1,4 @@
+-- second part of high-water mark: the highest hirings.id which existed when run selected
+-- reminders, hirings added later are checked by the next run whatever their returned_to is
+-- (NULL in runs saved before this migration - only returned_to is compared for them)
+ALTER TABLE reminder_runs ADD COLUMN hirings_until INTEGER;
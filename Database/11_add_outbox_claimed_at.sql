@@ -0,0 +1,3 @@
+-- time when message was claimed by worker (NULL - not claimed since it was queued, failed or requeued),
+-- tells claimed messages from messages waiting for retry (both have available_at in the future)
+ALTER TABLE outbox ADD COLUMN claimed_at REAL;
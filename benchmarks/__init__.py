@@ -0,0 +1 @@
+""" Performance benchmarks (run from repository root, e.g. `python -m benchmarks.bench_smtp`) """
@@ -0,0 +1,108 @@
+""" Hydration of hirings and date filtering: dates stored as text vs. integer timestamps
+
+Database/07_store_dates_as_timestamps.sql converts hirings.returned_to to integer seconds.
+Compared are: text + strptime for every row (before interning), text + fromisoformat
+with interning (before migration 07) and timestamps + from_timestamp (current).
+"""
+from argparse import ArgumentParser
+from datetime import datetime
+from os import path
+from sqlite3 import connect
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks.common import create_schema
+from controllers import HIRINGS_QUERY, Database, to_timestamp
+from factories import BooksFactory, UsersFactory
+from models import Book, Hiring, User
+
+
+def create_database(filename: str, hirings: int, distinct_dates: int, as_text: bool) -> None:
+    connection = connect(filename)
+    create_schema(connection)
+    database = Database(filename)
+    BooksFactory(database, seed=1).create(10_000)
+    UsersFactory(database, seed=1).create(10_000)
+    database.close_connection()
+
+    start = to_timestamp(datetime(2020, 1, 1))
+    step = 365 * 24 * 3600 * 4 // distinct_dates
+    rows = ((i % 10_000 + 1, i * 7 % 10_000 + 1, start + i % distinct_dates * step) for i in range(hirings))
+    connection.executemany('INSERT INTO hirings (user_id, book_id, returned_to) VALUES (?, ?, ?)', rows)
+    if as_text:
+        connection.execute("UPDATE hirings SET returned_to = datetime(returned_to, 'unixepoch')")
+    connection.commit()
+    connection.close()
+
+
+def strptime_hydration(database: Database) -> list:
+    """ get_all_hirings before interning - every date parsed by strptime """
+    database.cursor.execute(HIRINGS_QUERY)
+    return [
+        Hiring(User(name, email), Book(title, author), datetime.strptime(returned_to, '%Y-%m-%d %H:%M:%S'))
+        for _, title, author, name, email, returned_to in database.cursor.fetchall()
+    ]
+
+
+def fromisoformat_hydration(database: Database) -> list:
+    """ get_all_hirings before migration 07 - interning, dates parsed by fromisoformat """
+    database.cursor.execute(HIRINGS_QUERY)
+    users, books, dates = {}, {}, {}
+    result = []
+    for hiring_id, title, author, name, email, returned_to in database.cursor.fetchall():
+        user = users.get((name, email))
+        if user is None:
+            user = users[name, email] = User(name, email)
+        book = books.get((title, author))
+        if book is None:
+            book = books[title, author] = Book(title, author)
+        date = dates.get(returned_to)
+        if date is None:
+            date = dates[returned_to] = datetime.fromisoformat(returned_to)
+        result.append(Hiring(user, book, date, hiring_id))
+    return result
+
+
+def measure(function, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--hirings', type=int, default=1_000_000)
+    parser.add_argument('-d', '--distinct-dates', type=int, nargs='+', default=[60, 1_000_000])
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        for distinct_dates in args.distinct_dates:
+            text_filename = path.join(directory, f'text{distinct_dates}.db')
+            create_database(text_filename, args.hirings, distinct_dates, as_text=True)
+            timestamp_filename = path.join(directory, f'timestamp{distinct_dates}.db')
+            create_database(timestamp_filename, args.hirings, distinct_dates, as_text=False)
+            text_database, timestamp_database = Database(text_filename), Database(timestamp_filename)
+            as_of = datetime(2022, 1, 1)
+
+            results = {
+                'text, strptime': measure(lambda: strptime_hydration(text_database), 1),
+                'text, fromisoformat': measure(lambda: fromisoformat_hydration(text_database)),
+                'timestamp': measure(timestamp_database.get_all_hirings),
+                'filter text': measure(lambda: text_database.connection.execute(
+                    'SELECT COUNT(*) FROM hirings WHERE returned_to < ?', (as_of,)).fetchone()),
+                'filter timestamp': measure(lambda: timestamp_database.connection.execute(
+                    'SELECT COUNT(*) FROM hirings WHERE returned_to < ?', (to_timestamp(as_of),)).fetchone()),
+            }
+            text_database.close_connection()
+            timestamp_database.close_connection()
+
+            print(f'{args.hirings} hirings, {min(distinct_dates, args.hirings)} distinct dates [ms]')
+            for label, elapsed in results.items():
+                print(f'{label:>20}: {elapsed * 1000:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
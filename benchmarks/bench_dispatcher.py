@@ -0,0 +1,47 @@
+""" Reminder dispatch: serial loop vs. ReminderDispatcher against local SMTP stub """
+from argparse import ArgumentParser
+from datetime import datetime
+from functools import partial
+from time import perf_counter
+
+from benchmarks.smtp_stub import SMTPStub, StubEmailSender
+from dispatcher import ReminderDispatcher
+from models import Book, Hiring, User
+
+
+def make_hirings(quantity: int) -> list:
+    return [
+        Hiring(User(f'user{i}', f'user{i}@mail.com'), Book(f'title{i}', 'author'), datetime(2000, 1, 1))
+        for i in range(quantity)
+    ]
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--messages', type=int, default=500)
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='simulated SMTP round-trip (seconds per message)')
+    parser.add_argument('--rate', type=float, default=None)
+    args = parser.parse_args()
+
+    hirings = make_hirings(args.messages)
+
+    with SMTPStub(latency=args.latency) as stub:
+        sender = StubEmailSender(stub)
+        start = perf_counter()
+        with sender:
+            for hiring in hirings:
+                sender.send_reminder_email(hiring)
+        print(f'{"serial loop":>16}: {args.messages / (perf_counter() - start):10.1f} msg/s')
+
+        for concurrency in args.concurrency:
+            dispatcher = ReminderDispatcher(
+                partial(StubEmailSender, stub), concurrency=concurrency, rate=args.rate)
+            report = dispatcher.run(hirings)
+            print(f'{f"concurrency {concurrency}":>16}: '
+                  f'{report.sent / report.elapsed:10.1f} msg/s  ({report})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+""" Bulk import of hirings (importer.py) vs. Database.add_hiring loop """
+from argparse import ArgumentParser
+from csv import writer
+from os import path
+from sqlite3 import connect
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks.common import create_schema
+from controllers import Database
+from importer import import_file, read_csv, rows_to_hirings
+
+COLUMNS = ('name', 'email', 'title', 'author', 'returned_to')
+
+
+def write_hirings_csv(filename: str, rows: int) -> None:
+    with open(filename, mode='w', encoding='utf8', newline='') as file:
+        csv_writer = writer(file)
+        csv_writer.writerow(COLUMNS)
+        for i in range(rows):
+            csv_writer.writerow((
+                f'user {i % 50_000}', f'user{i % 50_000}@mail.com',
+                f'title {i}', f'author {i % 1000}', f'2022-01-{i % 28 + 1:02d}'))
+
+
+def new_database(filename: str) -> Database:
+    connection = connect(filename)
+    create_schema(connection)
+    connection.close()
+    return Database(filename)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=1_000_000)
+    parser.add_argument('--loop-rows', type=int, default=2_000,
+                        help='rows loaded with add_hiring (extrapolated to --rows)')
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        csv_file = path.join(directory, 'hirings.csv')
+        write_hirings_csv(csv_file, args.rows)
+
+        database = new_database(path.join(directory, 'bulk.db'))
+        start = perf_counter()
+        added = import_file(database, 'hirings', csv_file)
+        bulk = perf_counter() - start
+        print(f'bulk import: {added} hirings in {bulk:.1f} s ({added / bulk:.0f} rows/s)')
+
+        database = new_database(path.join(directory, 'loop.db'))
+        with open(csv_file, mode='r', encoding='utf8', newline='') as file:
+            hirings = rows_to_hirings(read_csv(file, COLUMNS))
+            start = perf_counter()
+            for _, hiring in zip(range(args.loop_rows), hirings):
+                database.add_hiring(hiring)
+            loop = perf_counter() - start
+        print(f'add_hiring loop: {args.loop_rows} hirings in {loop:.1f} s '
+              f'({args.loop_rows / loop:.0f} rows/s, ~{loop / args.loop_rows * args.rows / 60:.0f} min '
+              f'for {args.rows} rows)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+""" Lookup latency before and after lookup indexes (Database/04_add_lookup_indexes.sql) """
+from argparse import ArgumentParser
+from os import path
+from tempfile import TemporaryDirectory
+
+from benchmarks.common import DATABASE_DIR, create_database, timeit
+from controllers import Database
+from models import Book, User
+
+MIGRATION = '04_add_lookup_indexes.sql'
+
+
+def measure(database: Database, rows: int, legacy: bool) -> dict:
+    cursor = database.cursor
+    book = Book(f'title {rows // 2}', f'author {rows // 2 % 1000}')
+    user = User(f'user {rows // 2}', f'user{rows // 2}@mail.com')
+    if legacy:
+        # queries used before lookup indexes were added
+        return {
+            '_get_book_id': timeit(lambda: cursor.execute(
+                'SELECT id FROM books WHERE author LIKE ? AND title LIKE ?',
+                (book.author, book.title)).fetchone(), 20),
+            '_get_user_id': timeit(lambda: cursor.execute(
+                'SELECT id FROM users WHERE name LIKE ? AND email LIKE ?',
+                (user.name, user.email)).fetchone(), 20),
+            'hirings of user': timeit(lambda: cursor.execute(
+                'SELECT id FROM hirings WHERE user_id = ?', (rows // 2,)).fetchall(), 20),
+        }
+    return {
+        '_get_book_id': timeit(lambda: database._get_book_id(book)),
+        '_get_user_id': timeit(lambda: database._get_user_id(user)),
+        'hirings of user': timeit(lambda: cursor.execute(
+            'SELECT id FROM hirings WHERE user_id = ?', (rows // 2,)).fetchall()),
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        filename = path.join(directory, 'bench.db')
+        create_database(filename, args.rows, args.rows, args.rows, until=MIGRATION).close()
+
+        database = Database(filename)
+        before = measure(database, args.rows, legacy=True)
+        with open(path.join(DATABASE_DIR, MIGRATION), mode='r', encoding='utf8') as sql_script:
+            database.connection.executescript(sql_script.read())
+        after = measure(database, args.rows, legacy=False)
+        database.close_connection()
+
+    print(f'{args.rows} rows per table, mean latency [us]')
+    for name, value in before.items():
+        print(f'{name:>16}: {value:12.1f} -> {after[name]:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+""" Memory used by Database.get_all_hirings() result: plain classes vs. slots + interning """
+from argparse import ArgumentParser
+from os import path
+from tempfile import TemporaryDirectory
+from tracemalloc import start, stop, take_snapshot
+
+from benchmarks.common import create_database
+from controllers import Database, from_timestamp
+
+
+class LegacyUser:
+    def __init__(self, name, email):
+        self.name = name
+        self.email = email
+
+
+class LegacyBook:
+    def __init__(self, title, author):
+        self.title = title
+        self.author = author
+
+
+class LegacyHiring:
+    def __init__(self, user, book, returned_to):
+        self.user = user
+        self.book = book
+        self.returned_to = returned_to
+
+
+def legacy_get_all_hirings(database: Database) -> list:
+    """ hydration used before slots models and interning """
+    database.cursor.execute('''
+        SELECT b.title, b.author, u.name, u.email, h.returned_to
+        FROM hirings h
+        LEFT JOIN books b ON h.book_id=b.id
+        LEFT JOIN users u ON h.user_id=u.id
+    ''')
+    return [
+        LegacyHiring(LegacyUser(row[2], row[3]), LegacyBook(row[0], row[1]),
+                     from_timestamp(row[4]))
+        for row in database.cursor.fetchall()
+    ]
+
+
+def measure(function) -> tuple:
+    start()
+    result = function()
+    size = sum(stat.size for stat in take_snapshot().statistics('filename'))
+    stop()
+    return size, len(result)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--hirings', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--books', type=int, default=50_000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        filename = path.join(directory, 'bench.db')
+        create_database(filename, args.books, args.users, args.hirings).close()
+        database = Database(filename)
+
+        for label, function in (('plain classes', lambda: legacy_get_all_hirings(database)),
+                                ('slots + interning', database.get_all_hirings)):
+            size, rows = measure(function)
+            print(f'{label:>18}: {size / 2**20:8.1f} MiB, {size / rows:6.1f} B per hiring')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+""" Time of enqueueing reminders for all overdue hirings into outbox (one transaction) """
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from benchmarks.common import create_database
+from controllers import Database
+from outbox import Outbox
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        filename = path.join(directory, 'bench.db')
+        create_database(filename, args.rows, args.rows, args.rows).close()
+        # all hirings are overdue
+        as_of = datetime.now() + timedelta(days=60)
+
+        for digest in (False, True):
+            database = Database(filename)
+            database.connection.execute('DELETE FROM reminders')
+            database.connection.execute('DELETE FROM reminder_runs')
+            database.connection.execute('DELETE FROM outbox')
+            database.connection.commit()
+
+            start = perf_counter()
+            enqueued = Outbox(database).enqueue_reminders(as_of, digest=digest)
+            elapsed = perf_counter() - start
+            database.close_connection()
+            label = 'digests' if digest else 'reminders'
+            print(f'{label:>9}: {enqueued} messages enqueued in {elapsed * 1000:.0f} ms '
+                  f'({enqueued / elapsed:,.0f} messages/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+""" Messages rendered per second: f-string + bytes() vs. precompiled templates (templates.py) """
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from models import Book, Hiring, User
+from templates import MessageRenderer
+
+SENDER_NAME, EMAIL = 'Rafał', 'rafal@mail.com'
+
+
+def legacy_render(hiring: Hiring) -> bytes:
+    """ message built as in EmailSender.send_reminder_email before templates """
+    return bytes(f'''
+        From: {SENDER_NAME} <{EMAIL}>
+        To: {hiring.user.name} <{hiring.user.email}>
+        Subject: Czas zwrócić moją książkę
+
+        Hej {hiring.user.name}!
+        Może Ci umkneło, ale {hiring.returned_to.strftime('%d.%m.%Y')} powinieneś zwrócić moją książkę {hiring.book.title} (autorstwa {hiring.book.author})
+
+        Będę wdzięczny za zwrot.
+
+        Pozdrawiam,
+        {SENDER_NAME}
+        ''', encoding='utf8')
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--hirings', type=int, default=100_000)
+    args = parser.parse_args()
+
+    start_date = datetime(2022, 1, 1)
+    hirings = [
+        Hiring(User(f'user {i}', f'user{i}@mail.com'), Book(f'title {i}', f'author {i % 100}'),
+               start_date + timedelta(days=i % 365))
+        for i in range(args.hirings)
+    ]
+    renderer = MessageRenderer(SENDER_NAME, EMAIL)
+
+    for label, render in (('f-string', legacy_render), ('templates', renderer.reminder)):
+        start = perf_counter()
+        for hiring in hirings:
+            render(hiring)
+        elapsed = perf_counter() - start
+        print(f'{label:>10}: {args.hirings / elapsed:10.0f} messages/s')
+
+    users = {}
+    for hiring in hirings:
+        users.setdefault(hiring.user.name[-1], []).append(hiring)
+    start = perf_counter()
+    for user_hirings in users.values():
+        renderer.digest(user_hirings[0].user, user_hirings)
+    print(f'{"digests":>10}: {args.hirings / (perf_counter() - start):10.0f} hirings/s '
+          f'({len(users)} messages)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+""" Reports of hirings: aggregating get_all_hirings() in Python vs. SQL aggregates streamed by reports.py """
+from argparse import ArgumentParser
+from collections import defaultdict
+from datetime import datetime
+from os import devnull, path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from benchmarks.common import create_database
+from controllers import Database
+from reports import REPORTS, export_report, write_csv
+
+
+def python_overdue_by_user(database: Database, as_of: datetime) -> list:
+    """ overdue_by_user report as it had to be done before reports.py """
+    days_late = defaultdict(list)
+    for hiring in database.get_all_hirings():
+        if hiring.returned_to < as_of:
+            days_late[hiring.user.name, hiring.user.email].append((as_of - hiring.returned_to).total_seconds() / 86400)
+    return sorted(((name, email, len(days), round(sum(days) / len(days), 1), int(max(days)))
+                   for (name, email), days in days_late.items()), key=lambda row: -row[2])
+
+
+def measure(function) -> tuple:
+    """ returns time [s] and peak of allocated memory [MiB] of call """
+    start()
+    begin = perf_counter()
+    function()
+    elapsed = perf_counter() - begin
+    peak = get_traced_memory()[1]
+    stop()
+    return elapsed, peak / 2**20
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--hirings', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--books', type=int, default=50_000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory, open(devnull, 'w', encoding='utf8') as output:
+        filename = path.join(directory, 'bench.db')
+        create_database(filename, args.books, args.users, args.hirings).close()
+        database = Database(filename)
+        as_of = datetime.now()
+
+        print(f'{args.hirings} hirings, time [s] and peak memory [MiB]')
+        elapsed, peak = measure(lambda: write_csv(python_overdue_by_user(database, as_of),
+                                                  REPORTS['overdue_by_user'].columns, output))
+        print(f'{"overdue_by_user (Python)":>26}: {elapsed:6.2f} s {peak:8.1f} MiB')
+        for name in REPORTS:
+            elapsed, peak = measure(lambda: export_report(database, name, output, 'csv', as_of))
+            print(f'{name:>26}: {elapsed:6.2f} s {peak:8.1f} MiB')
+        database.close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+""" Scheduler (scheduler.py): CPU time used while idle and delay of reminders after deadlines """
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from os import path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import process_time, sleep
+
+from benchmarks.smtp_stub import SMTPStub, StubEmailSender
+from controllers import Database
+from factories import populate
+from migrations import migrate
+from models import Book, Hiring, User
+from outbox import Outbox
+from scheduler import Scheduler
+
+
+class TimedStubEmailSender(StubEmailSender):
+    """ StubEmailSender remembering when reminder of every book title was sent """
+    sent_at = {}
+
+    def send_reminder_email(self, hiring) -> None:
+        super().send_reminder_email(hiring)
+        self.sent_at[hiring.book.title] = datetime.now()
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--hirings', type=int, default=1_000_000)
+    parser.add_argument('--idle', type=float, default=10.0, help='seconds of idle measurement')
+    parser.add_argument('--deadlines', type=int, default=5)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory, SMTPStub() as stub:
+        filename = path.join(directory, 'bench.db')
+        database, other_database = Database(filename), Database(filename)
+        migrate(other_database.connection)
+        populate(other_database, args.hirings // 10, args.hirings // 10, args.hirings, overdue_ratio=0, seed=1)
+
+        scheduler = Scheduler(database, Outbox(database), lambda: TimedStubEmailSender(stub), interval=None)
+        thread = Thread(target=scheduler.run)
+        start = process_time()
+        thread.start()
+        sleep(args.idle)
+        idle = process_time() - start
+
+        # deadlines known in advance and hirings added already overdue
+        deadlines = {}
+        for number in range(args.deadlines):
+            deadline = datetime.now().replace(microsecond=0) + timedelta(seconds=number + 1)
+            deadlines[f'deadline {number}'] = deadline + timedelta(seconds=1)
+            other_database.add_hiring(Hiring(User('user', 'user@mail.com'), Book(f'deadline {number}', 'a'), deadline))
+        sleep(args.deadlines + 3)
+        for number in range(args.deadlines):
+            deadlines[f'added {number}'] = datetime.now()
+            other_database.add_hiring(Hiring(User('user', 'user@mail.com'), Book(f'added {number}', 'a'),
+                                             datetime.now() - timedelta(days=1)))
+            sleep(0.5)
+        sleep(2)
+        scheduler.stop()
+        thread.join()
+        database.close_connection()
+        other_database.close_connection()
+
+    print(f'{args.hirings} hirings, idle CPU: {idle / args.idle * 100:.3f} % ({idle * 1000:.0f} ms in {args.idle:.0f} s)')
+    for title, due in deadlines.items():
+        sent_at = TimedStubEmailSender.sent_at.get(title)
+        delay = f'{(sent_at - due).total_seconds():.2f} s' if sent_at else 'not sent'
+        print(f'{title:>12}: {delay}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+""" Search latency: LIKE '%term%' scans vs. full-text index (Database/08_add_search_index.sql) """
+from argparse import ArgumentParser
+from os import path
+from tempfile import TemporaryDirectory
+
+from benchmarks.common import DATABASE_DIR, create_schema, timeit
+from controllers import Database
+from factories import BooksFactory, UsersFactory
+
+MIGRATION = '08_add_search_index.sql'
+
+
+def typed_phrases(database: Database, rows: int) -> tuple:
+    """ returns (label, table, phrase) - whole and unfinished phrases as typed in _add_hiring flow """
+    title, author = database.cursor.execute('SELECT title, author FROM books WHERE id = ?', (rows // 2,)).fetchone()
+    name, = database.cursor.execute('SELECT name FROM users WHERE id = ?', (rows // 2,)).fetchone()
+    return (
+        ('book, whole title', 'books', title),
+        ('book, unfinished title', 'books', title[:-len(title.split()[-1]) + 2]),
+        ('book, author', 'books', author),
+        ('user, whole name', 'users', name),
+        ('user, unfinished name', 'users', name[:-len(name.split()[-1]) + 2]),
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        database = Database(path.join(directory, 'bench.db'))
+        create_schema(database.connection, until=MIGRATION)
+        BooksFactory(database, seed=1).create(args.rows)
+        UsersFactory(database, seed=1).create(args.rows)
+        phrases = typed_phrases(database, args.rows)
+
+        before = {
+            label: timeit(lambda: database.get_books_by_titles(phrase) if table == 'books'
+                          else database.get_users_by_name(phrase), 5)
+            for label, table, phrase in phrases
+        }
+        with open(path.join(DATABASE_DIR, MIGRATION), mode='r', encoding='utf8') as sql_script:
+            database.connection.executescript(sql_script.read())
+        after = {
+            label: timeit(lambda: database.search_books(phrase) if table == 'books'
+                          else database.search_users(phrase), 100)
+            for label, table, phrase in phrases
+        }
+        database.close_connection()
+
+    print(f'{args.rows} books and users, mean latency [ms] (LIKE -> full-text index)')
+    for label, table, phrase in phrases:
+        print(f'{label:>22}: {before[label] / 1000:10.2f} -> {after[label] / 1000:8.2f}  ({phrase!r})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+""" Reminder run: one process vs. shards in pool of processes (sharding.py) against local SMTP stub """
+from argparse import ArgumentParser
+from datetime import timedelta
+from os import path
+from tempfile import TemporaryDirectory
+
+from benchmarks.common import create_database
+from benchmarks.smtp_stub import SMTPStub, StubSenderFactory
+from controllers import Database
+from sharding import run_sharded
+
+
+def reset_reminders(filename: str) -> None:
+    database = Database(filename)
+    with database.connection:
+        database.connection.execute('DELETE FROM reminders')
+        database.connection.execute('DELETE FROM reminder_runs')
+    database.close_connection()
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=20_000)
+    parser.add_argument('-s', '--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='SMTP sessions per process')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated SMTP round-trip (seconds per message)')
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory, SMTPStub(latency=args.latency) as stub:
+        filename = path.join(directory, 'bench.db')
+        # half of hirings is overdue
+        create_database(filename, args.rows, args.rows, args.rows).close()
+
+        for shards in args.shards:
+            for digest in (False, True):
+                reset_reminders(filename)
+                report = run_sharded(filename, shards, digest=digest, interval=timedelta(days=7),
+                                     sender_factory=StubSenderFactory(stub), concurrency=args.concurrency)
+                label = f'{shards} shards{", digest" if digest else ""}'
+                print(f'{label:>16}: {report.sent / report.elapsed:10.1f} msg/s  ({report})')
+
+
+if __name__ == '__main__':
+    main()
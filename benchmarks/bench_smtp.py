@@ -0,0 +1,38 @@
+""" Messages per second: connection per message vs. reused SMTP session """
+from argparse import ArgumentParser
+from time import perf_counter
+
+from benchmarks.smtp_stub import SMTPStub, StubEmailSender
+
+MESSAGE = b'Subject: benchmark\r\n\r\nbody\r\n'
+
+
+def run(messages: int, batch: bool, max_messages_per_connection: int) -> tuple:
+    with SMTPStub() as stub:
+        sender = StubEmailSender(stub, max_messages_per_connection)
+        start = perf_counter()
+        if batch:
+            with sender:
+                for _ in range(messages):
+                    sender.send_email('user@mail.com', MESSAGE)
+        else:
+            for _ in range(messages):
+                sender.send_email('user@mail.com', MESSAGE)
+        elapsed = perf_counter() - start
+    return messages / elapsed, stub.stats
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--messages', type=int, default=2000)
+    parser.add_argument('--per-connection', type=int, default=100)
+    args = parser.parse_args()
+
+    for label, batch in (('connection per message', False), ('session reuse', True)):
+        rate, stats = run(args.messages, batch, args.per_connection)
+        print(f'{label:>24}: {rate:10.1f} msg/s  '
+              f'(connections: {stats["connections"]}, logins: {stats["logins"]})')
+
+
+if __name__ == '__main__':
+    main()
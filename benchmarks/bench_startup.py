@@ -0,0 +1,64 @@
+""" Cold start of main.py: import time measured by `python -X importtime` in fresh interpreters
+
+    python -m benchmarks.bench_startup            # exit code 1 when main imports longer than budget
+    python -m benchmarks.bench_startup --top 20   # the slowest imported modules
+"""
+from argparse import ArgumentParser
+from os import path
+from statistics import median
+from subprocess import run
+from sys import executable, exit as sys_exit
+
+ROOT_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+
+# median cumulative import time of main [ms] (before lazy imports it was ~180 ms)
+BUDGET_MS = 120
+
+# loaded only by commands which need them
+LAZY_MODULES = ('ssl', 'smtplib', 'dotenv', 'tabulate', 'email.message', 'asyncio', 'cProfile', 'subprocess')
+
+
+def import_times(module: str = 'main') -> dict:
+    """ function imports module in new interpreter
+
+    Returns:
+        dict: key is name of every imported module, item is its cumulative import time in ms
+    """
+    result = run([executable, '-X', 'importtime', '-c', f'import {module}'],
+                 cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        parts = line.split('|')  # 'import time: self | cumulative | name'
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            times[parts[2].strip()] = int(parts[1]) / 1000
+    return times
+
+
+def import_time(module: str = 'main', repeat: int = 5) -> float:
+    """ function returns median cumulative import time of module in ms """
+    return median(import_times(module)[module] for _ in range(repeat))
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-m', '--module', default='main')
+    parser.add_argument('-r', '--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='number of the slowest modules shown')
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    print(f'the slowest modules imported by {args.module} [ms]')
+    for name, value in sorted(times.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f'{name:>30}: {value:8.1f}')
+    loaded = [name for name in LAZY_MODULES if name in times]
+    if loaded:
+        print(f'\nloaded eagerly: {", ".join(loaded)}')
+
+    result = import_time(args.module, args.repeat)
+    print(f'\nimport {args.module}: {result:.1f} ms (budget {BUDGET_MS} ms)')
+    if args.module == 'main' and result > BUDGET_MS:
+        sys_exit(1)
+
+
+if __name__ == '__main__':
+    main()
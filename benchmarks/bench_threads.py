@@ -0,0 +1,77 @@
+""" Multi-threaded reads with concurrent writer: WAL + per-thread connections vs. rollback journal """
+from argparse import ArgumentParser
+from datetime import datetime
+from os import path
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from benchmarks.common import create_database
+from controllers import Database
+from models import Book, Hiring, User
+
+
+class RollbackJournalDatabase(Database):
+    """ Database with SQLite defaults (used before WAL mode was enabled) """
+    PRAGMAS = ('PRAGMA journal_mode=DELETE',)
+
+
+def reader(database: Database, users: int, stop: Event, counts: list, index: int) -> None:
+    number = index
+    while not stop.is_set():
+        number = (number * 7919 + 1) % users
+        database.has_user(User(f'user {number}', f'user{number}@mail.com'))
+        database.get_books_by_id(number + 1)
+        counts[index] += 2
+
+
+def writer(database: Database, stop: Event, counts: list) -> None:
+    number = 0
+    while not stop.is_set():
+        number += 1
+        database.add_hiring(Hiring(
+            User(f'user {number}', f'user{number}@mail.com'),
+            Book(f'new title {number}', 'author'), datetime(2030, 1, 1)))
+        counts[0] += 1
+
+
+def run(database: Database, threads: int, users: int, duration: float) -> tuple:
+    stop = Event()
+    read_counts = [0] * threads
+    write_counts = [0]
+    workers = [Thread(target=reader, args=(database, users, stop, read_counts, i)) for i in range(threads)]
+    workers.append(Thread(target=writer, args=(database, stop, write_counts)))
+
+    start = perf_counter()
+    for worker in workers:
+        worker.start()
+    sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = perf_counter() - start
+    return sum(read_counts) / elapsed, write_counts[0] / elapsed
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=100_000)
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('-d', '--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        filename = path.join(directory, 'bench.db')
+        create_database(filename, args.rows, args.rows, args.rows).close()
+
+        for label, database_class in (('rollback journal', RollbackJournalDatabase), ('WAL', Database)):
+            for threads in args.threads:
+                database = database_class(filename)
+                reads, writes = run(database, threads, args.rows, args.duration)
+                database.close_connection()
+                print(f'{label:>16}, {threads} reader threads: '
+                      f'{reads:10.0f} reads/s, {writes:8.0f} writes/s')
+
+
+if __name__ == '__main__':
+    main()
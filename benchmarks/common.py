@@ -0,0 +1,47 @@
+""" Helpers shared by benchmarks """
+from datetime import datetime, timedelta
+from os import path
+from sqlite3 import Connection, connect
+from time import perf_counter
+from typing import Callable
+
+from controllers import to_timestamp
+from migrations import migrate
+
+DATABASE_DIR = path.join(path.dirname(path.dirname(path.abspath(__file__))), 'Database')
+
+
+def create_schema(connection: Connection, until: str = None) -> None:
+    """ applies migrations from Database dir (only migrations before script `until` if given) """
+    migrate(connection, DATABASE_DIR, int(until.split('_')[0]) if until else None)
+
+
+def populate(connection: Connection, books: int, users: int, hirings: int) -> None:
+    """ fills db with synthetic rows - hirings are spread over users and books """
+    now = datetime.now()
+    connection.executemany(
+        'INSERT INTO books (author, title, created_at) VALUES (?, ?, ?)',
+        ((f'author {i % 1000}', f'title {i}', now) for i in range(books)))
+    connection.executemany(
+        'INSERT INTO users (name, email, created_at) VALUES (?, ?, ?)',
+        ((f'user {i}', f'user{i}@mail.com', now) for i in range(users)))
+    connection.executemany(
+        'INSERT INTO hirings (user_id, book_id, created_at, returned_to) VALUES (?, ?, ?, ?)',
+        ((i % users + 1, i % books + 1, now, to_timestamp(now + timedelta(days=i % 60 - 30)))
+         for i in range(hirings)))
+    connection.commit()
+
+
+def create_database(filename: str, books: int, users: int, hirings: int, until: str = None) -> Connection:
+    connection = connect(filename)
+    create_schema(connection, until)
+    populate(connection, books, users, hirings)
+    return connection
+
+
+def timeit(function: Callable, repeat: int = 1000) -> float:
+    """ returns mean time of one call in microseconds """
+    start = perf_counter()
+    for _ in range(repeat):
+        function()
+    return (perf_counter() - start) / repeat * 1e6
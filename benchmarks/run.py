@@ -0,0 +1,334 @@
+""" Benchmark suite: every Database method, hydration, rendering and SMTP dispatch
+
+Db is filled by factories.py, SMTP relay is replaced by local stub (smtp_stub.py).
+Results (median time of one call) can be saved and compared with previous run:
+
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --compare baseline.json  # exit code 1 when any benchmark got slower
+    python -m benchmarks.run -n 100000 -k pending     # bigger db, only benchmarks matching 'pending'
+"""
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from itertools import count
+from json import dump, load
+from os import path
+from statistics import median
+from sys import exit as sys_exit
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable
+
+from benchmarks.common import create_schema
+from benchmarks.smtp_stub import SMTPStub, StubEmailSender
+from controllers import Database
+from dispatcher import DigestDispatcher, ReminderDispatcher
+from factories import BooksFactory, HiringsFactory, UsersFactory, populate
+from models import Book, Hiring, User
+from reports import REPORTS, run_report
+from templates import MessageRenderer
+
+# name: (setup, repeat) - setup(context) returns function which is timed, in order of registration
+# (benchmarks changing reminders state are registered last)
+BENCHMARKS = {}
+
+
+def benchmark(repeat: int = 100) -> Callable:
+    """ decorator registering benchmark setup """
+    def register(setup: Callable) -> Callable:
+        BENCHMARKS[setup.__name__] = (setup, repeat)
+        return setup
+    return register
+
+
+class Context:
+    """ data shared by benchmarks """
+
+    def __init__(self, database: Database, stub: SMTPStub, rows: int) -> None:
+        self.database = database
+        self.stub = stub
+        self.rows = rows
+        self.as_of = datetime.now()
+        self.numbers = count()
+        self.books = BooksFactory(seed=1).generate_books(min(rows, 100))
+        self.users = UsersFactory(seed=1).generate_users(min(rows, 100))
+        self.ids = list(range(1, rows + 1, max(rows // 100, 1)))
+        self.hirings = HiringsFactory(overdue_ratio=1, seed=1).generate_hirings(self.users, self.books, 200)
+
+
+# books
+
+@benchmark()
+def add_book(context: Context):
+    return lambda: context.database.add_book(Book(f'new title {next(context.numbers)}', 'author'))
+
+
+@benchmark(repeat=10)
+def add_books(context: Context):
+    return lambda: context.database.add_books(
+        Book(f'new title {next(context.numbers)}', 'author') for _ in range(1000))
+
+
+@benchmark(repeat=1000)
+def has_book(context: Context):
+    return lambda: context.database.has_book(context.books[0])
+
+
+@benchmark(repeat=5)
+def get_books_ids(context: Context):
+    return context.database.get_books_ids
+
+
+@benchmark(repeat=5)
+def get_all_books(context: Context):
+    return context.database.get_all_books
+
+
+@benchmark()
+def get_books_by_id(context: Context):
+    return lambda: context.database.get_books_by_id(*context.ids)
+
+
+@benchmark()
+def get_books_by_author(context: Context):
+    return lambda: context.database.get_books_by_author(*(book.author for book in context.books))
+
+
+@benchmark(repeat=10)
+def get_books_by_titles(context: Context):
+    return lambda: context.database.get_books_by_titles(*(book.title for book in context.books[:10]))
+
+
+@benchmark(repeat=100)
+def search_books(context: Context):
+    return lambda: context.database.search_books(context.books[0].title[:-2])
+
+
+# users
+
+@benchmark()
+def add_user(context: Context):
+    return lambda: context.database.add_user(User(f'new user {next(context.numbers)}', 'new@mail.com'))
+
+
+@benchmark(repeat=10)
+def add_users(context: Context):
+    return lambda: context.database.add_users(
+        User(f'new user {next(context.numbers)}', 'new@mail.com') for _ in range(1000))
+
+
+@benchmark(repeat=1000)
+def has_user(context: Context):
+    return lambda: context.database.has_user(context.users[0])
+
+
+@benchmark(repeat=5)
+def get_users_ids(context: Context):
+    return context.database.get_users_ids
+
+
+@benchmark(repeat=5)
+def get_all_users(context: Context):
+    return context.database.get_all_users
+
+
+@benchmark()
+def get_users_by_id(context: Context):
+    return lambda: context.database.get_users_by_id(*context.ids)
+
+
+@benchmark(repeat=10)
+def get_users_by_name(context: Context):
+    return lambda: context.database.get_users_by_name(*(user.name for user in context.users[:10]))
+
+
+@benchmark(repeat=100)
+def search_users(context: Context):
+    return lambda: context.database.search_users(context.users[0].name[:-2])
+
+
+@benchmark(repeat=1000)
+def validate_emails(context: Context):
+    return context.database.validate_emails
+
+
+# hirings
+
+@benchmark()
+def add_hiring(context: Context):
+    return lambda: context.database.add_hiring(Hiring(
+        context.users[0], Book(f'new title {next(context.numbers)}', 'author'), context.as_of))
+
+
+@benchmark(repeat=10)
+def add_hirings_by_ids(context: Context):
+    return lambda: context.database.add_hirings_by_ids(
+        (user_id, user_id, context.as_of + timedelta(days=30)) for user_id in context.ids * 10)
+
+
+@benchmark(repeat=5)
+def get_all_hirings(context: Context):
+    return context.database.get_all_hirings
+
+
+@benchmark()
+def get_hirings_by_id(context: Context):
+    return lambda: context.database.get_hirings_by_id(*context.ids)
+
+
+@benchmark(repeat=5)
+def get_overdue_hirings(context: Context):
+    return lambda: list(context.database.get_overdue_hirings(context.as_of))
+
+
+@benchmark(repeat=5)
+def get_hirings_ids(context: Context):
+    return context.database.get_hirings_ids
+
+
+# pages
+
+@benchmark(repeat=1000)
+def get_users_page(context: Context):
+    return lambda: context.database.get_users_page(after_id=context.rows // 2)
+
+
+@benchmark(repeat=1000)
+def get_books_page(context: Context):
+    return lambda: context.database.get_books_page(after_id=context.rows // 2)
+
+
+@benchmark(repeat=1000)
+def get_hirings_page(context: Context):
+    return lambda: context.database.get_hirings_page(after_id=context.rows // 2)
+
+
+@benchmark(repeat=5)
+def iter_pages(context: Context):
+    return lambda: sum(len(page) for page in context.database.iter_pages(context.database.get_hirings_page))
+
+
+# reports
+
+@benchmark(repeat=5)
+def reports(context: Context):
+    return lambda: sum(sum(1 for _ in run_report(context.database, name, context.as_of)) for name in REPORTS)
+
+
+# rendering and sending
+
+@benchmark(repeat=10_000)
+def render_reminder(context: Context):
+    renderer = MessageRenderer('Sender', 'sender@mail.com')
+    return lambda: renderer.reminder(context.hirings[0])
+
+
+@benchmark(repeat=10_000)
+def render_digest(context: Context):
+    renderer = MessageRenderer('Sender', 'sender@mail.com')
+    return lambda: renderer.digest(context.users[0], context.hirings[:5])
+
+
+@benchmark(repeat=5)
+def dispatch_reminders(context: Context):
+    dispatcher = ReminderDispatcher(lambda: StubEmailSender(context.stub), concurrency=4)
+    return lambda: dispatcher.run(context.hirings)
+
+
+@benchmark(repeat=5)
+def dispatch_digests(context: Context):
+    digests = [(user, context.hirings[:5]) for user in context.users]
+    dispatcher = DigestDispatcher(lambda: StubEmailSender(context.stub), concurrency=4)
+    return lambda: dispatcher.run(digests)
+
+
+# reminders
+
+@benchmark(repeat=1000)
+def get_last_reminder_run(context: Context):
+    return context.database.get_last_reminder_run
+
+
+@benchmark(repeat=5)
+def get_pending_reminders(context: Context):
+    return lambda: list(context.database.get_pending_reminders(context.as_of))
+
+
+@benchmark(repeat=5)
+def get_pending_reminders_by_user(context: Context):
+    return lambda: list(context.database.get_pending_reminders_by_user(context.as_of))
+
+
+@benchmark(repeat=10)
+def record_reminder_run(context: Context):
+    hirings_until = context.database.get_last_hiring_id()
+    return lambda: context.database.record_reminder_run(
+        context.as_of, context.ids * 10, [], interval=timedelta(days=7), hirings_until=hirings_until)
+
+
+@benchmark(repeat=100)
+def mark_reminder_run(context: Context):
+    hirings_until = context.database.get_last_hiring_id()
+    return lambda: context.database.mark_reminder_run(context.as_of, 0, 0, hirings_until)
+
+
+def run_benchmark(setup: Callable, repeat: int, context: Context) -> float:
+    """ returns median time of one call in microseconds (first call is warm-up) """
+    function = setup(context)
+    function()
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return median(times) * 1e6
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=10_000, help='rows per table')
+    parser.add_argument('-k', '--keyword', default='', help='run only benchmarks containing keyword')
+    parser.add_argument('--overdue-ratio', type=float, default=0.1)
+    parser.add_argument('--save', help='save results to JSON file')
+    parser.add_argument('--compare', help='compare with results saved in JSON file')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='benchmark is slower when time > threshold * saved time')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, mode='r', encoding='utf8') as file:
+            baseline = load(file)
+
+    results = {}
+    regressions = []
+    with TemporaryDirectory() as directory, SMTPStub() as stub:
+        database = Database(path.join(directory, 'bench.db'))
+        create_schema(database.connection)
+        populate(database, args.rows, args.rows, args.rows, args.overdue_ratio, seed=1)
+        context = Context(database, stub, args.rows)
+
+        print(f'{args.rows} rows per table, median time of one call [us]')
+        for name, (setup, repeat) in BENCHMARKS.items():
+            if args.keyword not in name:
+                continue
+            result = results[name] = run_benchmark(setup, repeat, context)
+            line = f'{name:>30}: {result:12.1f}'
+            if name in baseline:
+                ratio = result / baseline[name]
+                line += f'  ({ratio:5.2f}x)'
+                if ratio > args.threshold:
+                    regressions.append(name)
+                    line += '  SLOWER'
+            print(line, flush=True)
+        database.close_connection()
+
+    if args.save:
+        with open(args.save, mode='w', encoding='utf8') as file:
+            dump(results, file, indent=2)
+    if regressions:
+        print(f'\nSlower than saved results: {", ".join(regressions)}')
+        sys_exit(1)
+
+
+if __name__ == '__main__':
+    main()
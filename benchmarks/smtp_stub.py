@@ -0,0 +1,105 @@
+""" Local SMTP stand-in used by benchmarks
+
+Server speaks just enough plain SMTP (EHLO, AUTH, MAIL, RCPT, DATA, QUIT) for smtplib.
+Messages are counted and dropped.
+"""
+from smtplib import SMTP
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from threading import Lock, Thread
+from time import sleep
+
+from mailer import EmailSender
+
+
+class _SMTPHandler(StreamRequestHandler):
+    def _reply(self, *lines: str) -> None:
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode('ascii'))
+
+    def handle(self) -> None:
+        stub = self.server.stub
+        stub.count('connections')
+        self._reply('220 localhost SMTP stub')
+        messages_on_connection = 0
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+
+            if command == b'EHLO':
+                self._reply('250-localhost', '250-AUTH PLAIN LOGIN', '250 8BITMIME')
+            elif command == b'AUTH':
+                stub.count('logins')
+                self._reply('235 Authentication successful')
+            elif command == b'MAIL' and 0 < stub.drop_after <= messages_on_connection:
+                self._reply('421 Too many messages on this connection')
+                return
+            elif command == b'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                if stub.latency:
+                    sleep(stub.latency)
+                messages_on_connection += 1
+                stub.count('messages')
+                self._reply('250 OK')
+            elif command == b'QUIT':
+                self._reply('221 Bye')
+                return
+            elif command in (b'HELO', b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self._reply('250 OK')
+            else:
+                self._reply('502 Command not implemented')
+
+
+class SMTPStub:
+    """ threaded SMTP server listening on localhost (random port)
+
+    Args:
+        latency (float): seconds to wait before accepting each message
+        drop_after (int): server answers 421 after so many messages on one connection (0 - never)
+    """
+    def __init__(self, latency: float = 0.0, drop_after: int = 0) -> None:
+        self.latency = latency
+        self.drop_after = drop_after
+        self.stats = {'connections': 0, 'logins': 0, 'messages': 0}
+        self._lock = Lock()
+
+        self._server = ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.host, self.port = self._server.server_address
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def __enter__(self) -> 'SMTPStub':
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class StubEmailSender(EmailSender):
+    """ EmailSender talking plain SMTP to SMTPStub instead of SMTP over SSL """
+    def __init__(self, stub: SMTPStub, max_messages_per_connection: int = 100) -> None:
+        super().__init__(env_path='example.env', max_messages_per_connection=max_messages_per_connection)
+        self.smtp_server = stub.host
+        self.smtp_port = stub.port
+
+    def _open_connection(self) -> SMTP:
+        return SMTP(self.smtp_server, self.smtp_port)
+
+
+class StubSenderFactory:
+    """ picklable factory of StubEmailSender (for worker processes, which can't get SMTPStub itself) """
+    def __init__(self, stub: SMTPStub) -> None:
+        self.host = stub.host
+        self.port = stub.port
+
+    def __call__(self) -> StubEmailSender:
+        return StubEmailSender(self)
@@ -0,0 +1,162 @@
+""" Read-through cache in front of Database """
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Iterable
+
+import metrics
+from controllers import DATABASE_METRIC, DATABASE_METRIC_HELP, Database
+from models import Book, User
+
+_MISSING = object()
+
+CACHE_HITS_METRIC = 'cache_hits_total'
+CACHE_MISSES_METRIC = 'cache_misses_total'
+
+
+class LRUCache:
+    """ dict-like (thread-safe) cache evicting least recently used entries above `maxsize`
+
+    Args:
+        maxsize (int): max number of entries
+        name (str): label `cache` of hits/misses counters in metrics, None - not exported
+    """
+
+    def __init__(self, maxsize: int = 1024, name: str = None) -> None:
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default=None):
+        """ method returns cached value (and counts hit or miss) """
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if self.name is not None:
+            if value is _MISSING:
+                metrics.inc(CACHE_MISSES_METRIC, 1, 'Lookups not found in cache', cache=self.name)
+            else:
+                metrics.inc(CACHE_HITS_METRIC, 1, 'Lookups served from cache', cache=self.name)
+        return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """ method removes given keys """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+
+@metrics.instrument_methods(DATABASE_METRIC, DATABASE_METRIC_HELP)
+class CachedDatabase(Database):
+    """ Database caching ids of users and books and lists of all users and books
+
+    Cached entries are invalidated by writes done through this object
+    (add_user, add_users, add_book, add_books, validate_emails).
+
+    Args:
+        name (str): path to db file
+        maxsize (int): max number of cached ids (separately for users and books)
+    """
+
+    def __init__(self, name: str, maxsize: int = 10_000) -> None:
+        super().__init__(name)
+        self.users_ids_cache = LRUCache(maxsize, 'users_ids')
+        self.books_ids_cache = LRUCache(maxsize, 'books_ids')
+        self.lists_cache = LRUCache(2, 'lists')
+
+    def cache_stats(self) -> dict:
+        """ method returns hit/miss counters of all caches (also exported by metrics module
+            as `cache_hits_total` and `cache_misses_total` with label `cache`)
+
+        Returns:
+            dict: key is cache name, item is dict with counters
+        """
+        return {
+            'users_ids': self.users_ids_cache.stats(),
+            'books_ids': self.books_ids_cache.stats(),
+            'lists': self.lists_cache.stats(),
+        }
+
+    def _get_user_id(self, user: User) -> int:
+        key = (user.name, user.email)
+        user_id = self.users_ids_cache.get(key)
+        if user_id is None:
+            user_id = super()._get_user_id(user)
+            if user_id is not None:
+                self.users_ids_cache.set(key, user_id)
+        return user_id
+
+    def _get_book_id(self, book: Book) -> int:
+        key = (book.author, book.title)
+        book_id = self.books_ids_cache.get(key)
+        if book_id is None:
+            book_id = super()._get_book_id(book)
+            if book_id is not None:
+                self.books_ids_cache.set(key, book_id)
+        return book_id
+
+    def get_all_users(self) -> list:
+        users = self.lists_cache.get('users', _MISSING)
+        if users is _MISSING:
+            users = super().get_all_users()
+            self.lists_cache.set('users', users)
+        return list(users)
+
+    def get_all_books(self) -> list:
+        books = self.lists_cache.get('books', _MISSING)
+        if books is _MISSING:
+            books = super().get_all_books()
+            self.lists_cache.set('books', books)
+        return list(books)
+
+    def add_user(self, user: User) -> None:
+        super().add_user(user)
+        self.users_ids_cache.invalidate((user.name, user.email))
+        self.lists_cache.invalidate('users')
+
+    def add_users(self, users: Iterable[User], commit: bool = True) -> None:
+        users = list(users)
+        super().add_users(users, commit)
+        self.users_ids_cache.invalidate(*((user.name, user.email) for user in users))
+        self.lists_cache.invalidate('users')
+
+    def validate_emails(self, revalidate: bool = False) -> int:
+        changed = super().validate_emails(revalidate)
+        # emails may have been normalized - cached lists and ids (keyed by email) are stale
+        self.users_ids_cache.clear()
+        self.lists_cache.invalidate('users')
+        return changed
+
+    def add_book(self, book: Book) -> None:
+        super().add_book(book)
+        self.books_ids_cache.invalidate((book.author, book.title))
+        self.lists_cache.invalidate('books')
+
+    def add_books(self, books: Iterable[Book], commit: bool = True) -> None:
+        books = list(books)
+        super().add_books(books, commit)
+        self.books_ids_cache.invalidate(*((book.author, book.title) for book in books))
+        self.lists_cache.invalidate('books')
@@ -0,0 +1,75 @@
+import pytest
+
+from cache import CachedDatabase
+from controllers import Database
+from migrations import migrate
+
+
+class FakeSender:
+    """ EmailSender replacement collecting sent emails as (recipient, titles of hirings)
+
+    Picklable (when `failures` are), so it can be used by worker processes too.
+
+    Args:
+        failures (dict): email: (exception raised instead of sending, number of failures
+            or None - every time), counters are decremented in the given dict
+    """
+
+    def __init__(self, failures: dict = None):
+        self.failures = failures if failures is not None else {}
+        self.sent = []
+
+    def open_session(self):
+        pass
+
+    def close_session(self):
+        pass
+
+    def send_reminder_email(self, hiring):
+        self.send_digest_email(hiring.user, [hiring])
+
+    def send_digest_email(self, user, hirings):
+        failure = self.failures.get(user.email)
+        if failure is not None:
+            error, times = failure
+            if times is None:
+                raise error
+            if times:
+                self.failures[user.email] = (error, times - 1)
+                raise error
+        self.sent.append((user.email, [hiring.book.title for hiring in hirings]))
+
+
+def _with_schema(database: Database) -> Database:
+    migrate(database.connection)
+    return database
+
+
+@pytest.fixture
+def database():
+    """ in-memory db with schema created by scripts from Database dir """
+    database = _with_schema(Database(':memory:'))
+    yield database
+    database.close_connection()
+
+
+@pytest.fixture
+def file_database(tmp_path):
+    """ like `database`, but in file - other connections and processes can open it by `file_database.name` """
+    database = _with_schema(Database(str(tmp_path / 'database.db')))
+    yield database
+    database.close_connection()
+
+
+@pytest.fixture
+def cached_database():
+    """ like `database`, but with small (2 entries) caches """
+    database = _with_schema(CachedDatabase(':memory:', maxsize=2))
+    yield database
+    database.close_connection()
+
+
+@pytest.fixture
+def sender():
+    """ FakeSender which doesn't fail, tests pass it as sender factory: `lambda: sender` """
+    return FakeSender()
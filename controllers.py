@@ -1,41 +1,287 @@
 """ Controllers """
-from datetime import datetime
-from sqlite3 import connect
-from ssl import create_default_context
-from smtplib import SMTP_SSL
-from typing import Union
-from dotenv import get_key
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from json import loads
+from re import findall
+from operator import itemgetter
+from sqlite3 import Connection, Cursor, connect
+from threading import Lock, local
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
 
-from models import Book, User, Hiring
+import metrics
+from models import Book, User, Hiring, is_valid_email, normalize_email
 
+# below SQLITE_MAX_VARIABLE_NUMBER of every SQLite build (999 before 3.32)
+SQLITE_MAX_VARIABLES = 900
+LOOKUP_TEMP_TABLE_THRESHOLD = 10 * SQLITE_MAX_VARIABLES
 
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+# reminders are sent only to users which email wasn't found invalid (see Database.validate_emails)
+VALID_RECIPIENT_CONDITION = 'h.user_id NOT IN (SELECT id FROM users WHERE email_valid = 0)'
+
+# columns of hirings which reminder runs can be split by (see sharding.py)
+SHARD_KEYS = ('id', 'user_id')
+
+DATABASE_METRIC = 'database_call_seconds'
+DATABASE_METRIC_HELP = 'Duration of Database method calls'
+
+# hirings with their books and users, rows are converted by Database._hirings_from_rows
+HIRINGS_QUERY = '''
+        SELECT
+            h.id,
+            b.title, b.author,
+            u.name, u.email,
+            h.returned_to
+        FROM hirings h
+        LEFT JOIN books b ON h.book_id=b.id
+        LEFT JOIN users u ON h.user_id=u.id
+'''
+
+
+def pending_reminders_cte(since: datetime = None, shard_key: str = None) -> str:
+    """ function returns `WITH pending (id)` clause selecting ids of hirings which need reminder
+        (see Database.get_pending_reminders), query must bind `:as_of` and `:since`
+        converted by `to_timestamp`
+
+    High-water mark of previous run has two parts: hirings which returned_to is
+    after `since` and hirings added after the last run (`reminder_runs.hirings_until`),
+    e.g. imported with returned_to already in the past.
+
+    Args:
+        since (datetime): high-water mark of previous run, None - no lower bound
+        shard_key (str): column of hirings ('id' or 'user_id') limited to range
+            `:shard_low`..`:shard_high` (both included), None - all hirings
+    """
+    shard_condition = ''
+    if shard_key is not None:
+        if shard_key not in SHARD_KEYS:
+            raise ValueError(f'Hirings can be sharded only by: {", ".join(SHARD_KEYS)}')
+        shard_condition = f'AND h.{shard_key} BETWEEN :shard_low AND :shard_high'
+    not_reminded = f'''{shard_condition}
+                AND {VALID_RECIPIENT_CONDITION}
+                AND NOT EXISTS (SELECT 1 FROM reminders r WHERE r.hiring_id = h.id)'''
+    if since is None:
+        new_hirings = f'''
+            SELECT h.id FROM hirings h
+            WHERE h.returned_to < :as_of {not_reminded}'''
+    else:
+        # two branches - each of them uses index (returned_to, rowid)
+        new_hirings = f'''
+            SELECT h.id FROM hirings h
+            WHERE h.returned_to < :as_of AND h.returned_to >= :since {not_reminded}
+            UNION ALL
+            SELECT h.id FROM hirings h
+            WHERE h.id > (SELECT hirings_until FROM reminder_runs ORDER BY id DESC LIMIT 1)
+                AND h.returned_to < :since AND h.returned_to < :as_of {not_reminded}'''
+    return f'''
+        WITH pending (id) AS ({new_hirings}
+            UNION ALL
+            SELECT r.hiring_id FROM reminders r
+            JOIN hirings h ON h.id = r.hiring_id
+            WHERE r.next_reminder_at <= :as_of {shard_condition}
+                AND {VALID_RECIPIENT_CONDITION}
+        )
+        '''
+
+
+def match_expression(phrase: str) -> str:
+    """ function converts phrase typed by user into FTS5 query matching rows containing
+        all words of phrase, the last word may be unfinished (e.g. 'henryk sienk' -> '"henryk" "sienk"*')
+
+    Only the last word is a prefix - a short prefix of a common word expands to thousands
+    of terms, so matching every word by prefix would be much slower.
+
+    Returns:
+        str: MATCH expression, empty when phrase has no words
+    """
+    words = [f'"{word}"' for word in findall(r'\w+', phrase)]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+def to_timestamp(date: datetime) -> int:
+    """ function converts datetime to value stored in db (None stays None)
+
+    Dates (hirings.returned_to, reminders and reminder_runs times) are stored as
+    integer seconds since 1970-01-01 of naive (local) time - like SQLite
+    strftime('%s') - so SQLite compares them numerically.
+    """
+    return (date - _EPOCH) // _SECOND if date is not None else None
+
+
+def from_timestamp(value: int) -> datetime:
+    """ function converts value stored in db (see `to_timestamp`) to datetime """
+    return _EPOCH + timedelta(seconds=value)
+
+
+def _timed_parse_date(value: int) -> datetime:
+    """ from_timestamp measured by metrics (used by hydration only when metrics are enabled) """
+    start = perf_counter()
+    date = from_timestamp(value)
+    metrics.inc('date_parse_seconds_total', perf_counter() - start, 'Time spent on parsing dates of hirings')
+    metrics.inc('dates_parsed_total', 1, 'Dates parsed during hydration of hirings')
+    return date
+
+
+@metrics.instrument_methods(DATABASE_METRIC, DATABASE_METRIC_HELP)
 class Database:
     """ class to manage db (sqlite)
 
     classes Book, User & Hiring are defined in module models.py
+
+    Every thread gets its own connection (created on first use), so one object
+    can be shared by worker threads. File databases work in WAL mode - readers
+    don't block writer and writer doesn't block readers. In-memory db exists
+    only inside one connection, so it is shared by all threads.
+
+    Args:
+        name (str): path to db file
+        timeout (float): seconds to wait for lock held by other connection
     """
 
-    def __init__(self, name: str) -> None:
+    PRAGMAS = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA cache_size=-65536',
+        'PRAGMA mmap_size=268435456',
+    )
+
+    def __init__(self, name: str, timeout: float = 30.0) -> None:
         self.name = name
-        self.connection = connect(self.name)
-        self.cursor = self.connection.cursor()
+        self.timeout = timeout
+        self._pool_lock = Lock()
+        self._pool = []
+        self._local = local()
+        self._shared_connection = None
+        if name == ':memory:':
+            self._shared_connection = self._connect()
+
+    def _connect(self) -> Connection:
+        connection = connect(self.name, timeout=self.timeout, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            connection.execute(pragma)
+        # used by validate_emails - the same rules as when users are added
+        connection.create_function('normalize_email', 1, normalize_email, deterministic=True)
+        connection.create_function('is_valid_email', 1, is_valid_email, deterministic=True)
+        with self._pool_lock:
+            self._pool.append(connection)
+        return connection
+
+    @property
+    def connection(self) -> Connection:
+        """ connection of current thread """
+        if self._shared_connection is not None:
+            return self._shared_connection
+        try:
+            return self._local.connection
+        except AttributeError:
+            self._local.connection = self._connect()
+            return self._local.connection
+
+    @property
+    def cursor(self) -> Cursor:
+        """ cursor of current thread """
+        try:
+            return self._local.cursor
+        except AttributeError:
+            self._local.cursor = self.connection.cursor()
+            return self._local.cursor
 
     def close_connection(self) -> None:
-        """ method closes connection to db """
-        self.cursor.close()
+        """ method closes connections to db of all threads """
+        with self._pool_lock:
+            for connection in self._pool:
+                connection.close()
+            self._pool.clear()
+        self._local = local()
+        self._shared_connection = None
+
+    @contextmanager
+    def _lookup_keys(self, keys: Iterable) -> Iterator[None]:
+        """ context manager fills temporary table `lookup_keys` (column `value`) with keys
+
+        Used for key sets too big for `IN (...)` and for joins (e.g. LIKE) with many keys.
+        Keys are added and removed inside savepoint - transaction opened by caller
+        (e.g. import with `commit=False`) stays open and uncommitted.
+        """
+        self.cursor.execute('SAVEPOINT lookup_keys')
+        try:
+            self.cursor.execute('CREATE TEMP TABLE IF NOT EXISTS lookup_keys (value PRIMARY KEY)')
+            self.cursor.executemany(
+                'INSERT OR IGNORE INTO temp.lookup_keys (value) VALUES (?)', ((key,) for key in keys))
+            yield
+        finally:
+            self.cursor.execute('DELETE FROM temp.lookup_keys')
+            self.cursor.execute('RELEASE lookup_keys')
+
+    def _select_by_keys(self, query: str, keys: Iterable) -> list:
+        """ method runs query for many keys in constant number of queries
+
+        Keys are sent in chunks of `IN (...)` smaller than SQLite variables limit
+        or, for very large key sets, joined from temporary table.
+
+        Args:
+            query (str): query with `{keys}` in place of key set, e.g. 'SELECT ... WHERE id IN {keys}'
+            keys (Iterable): searched keys
+
+        Returns:
+            list: rows returned by all queries
+        """
+        keys = list(dict.fromkeys(keys))
+        if len(keys) > LOOKUP_TEMP_TABLE_THRESHOLD:
+            with self._lookup_keys(keys):
+                self.cursor.execute(query.format(keys='(SELECT value FROM temp.lookup_keys)'))
+                return self.cursor.fetchall()
+
+        rows = []
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            chunk = keys[start:start + SQLITE_MAX_VARIABLES]
+            self.cursor.execute(query.format(keys=f'({", ".join("?" * len(chunk))})'), chunk)
+            rows += self.cursor.fetchall()
+        return rows
 
     def add_book(self, book: Book) -> None:
-        """ method adds book to db
+        """ method adds book to db (book already existing in db is skipped)
 
         Args:
             book (Book): class Book
         """
         data_to_add = (book.author, book.title, datetime.now())
         self.cursor.execute('''
-            INSERT INTO books (author, title, created_at) VALUES (?, ?, ?)
+            INSERT OR IGNORE INTO books (author, title, created_at) VALUES (?, ?, ?)
         ''', data_to_add)
         self.connection.commit()
 
+    def add_books(self, books: Iterable[Book], commit: bool = True) -> None:
+        """ method adds many books in one transaction (books already existing in db are skipped)
+
+        Args:
+            books (Iterable[Book]): objects type Book
+            commit (bool): commit transaction, False if caller commits it
+        """
+        now = datetime.now().isoformat(' ')  # adapted once instead of for every row
+        self.cursor.executemany('''
+            INSERT OR IGNORE INTO books (author, title, created_at) VALUES (?, ?, ?)
+        ''', ((book.author, book.title, now) for book in books))
+        if commit:
+            self.connection.commit()
+
+    def get_books_ids(self, min_id: int = 0) -> dict:
+        """ method returns ids of books
+
+        Args:
+            min_id (int): only books with greater id are returned
+
+        Returns:
+            dict: key is tuple (author, title), item is book id
+        """
+        self.cursor.execute('SELECT author, title, id FROM books WHERE id > ?', (min_id,))
+        return {(author, title): book_id for author, title, book_id in self.cursor}
+
     def get_all_books(self) -> list:
         """ method returns all books from db
 
@@ -53,16 +299,11 @@ class Database:
         """ method returns books
 
         Returns:
-            dict: key is searched id, item is object type Book
+            dict: key is searched id, item is object type Book (ids missing in db are skipped)
         """
-        result = {}
-        for arg in books_ids:
-            self.cursor.execute('''
-                SELECT title, author FROM books WHERE id=?
-            ''', (arg,))
-            title, author = self.cursor.fetchone()
-            result[arg] = Book(title, author)
-        return result
+        rows = self._select_by_keys(
+            'SELECT id, title, author FROM books WHERE id IN {keys}', books_ids)
+        return {book_id: Book(title, author) for book_id, title, author in rows}
 
     def get_books_by_author(self, *authors) -> dict:
         """ method returns books
@@ -70,16 +311,11 @@ class Database:
         Returns:
             dict: key is searched author, item is list of objects type Book
         """
-        result = {}
-        for author in authors:
-            self.cursor.execute('''
-                SELECT title, author FROM books WHERE author LIKE ?
-            ''', (author,))
-            data = self.cursor.fetchall()
-            book_list = []
-            for row in data:
-                book_list.append(Book(row[0], row[1]))
-            result[author] = book_list
+        result = {author: [] for author in authors}
+        rows = self._select_by_keys(
+            'SELECT author, title FROM books WHERE author IN {keys}', authors)
+        for author, title in rows:
+            result[author].append(Book(title, author))
         return result
 
     def get_books_by_titles(self, *titles) -> dict:
@@ -88,18 +324,39 @@ class Database:
         Returns:
             dict: key is searched title, item is list of objects type Book
         """
-        result = {}
-        for title in titles:
+        result = {title: [] for title in titles}
+        with self._lookup_keys(titles):
             self.cursor.execute('''
-                SELECT title, author FROM books WHERE title LIKE ?
-            ''', (f'%{title}%',))
-            data = self.cursor.fetchall()
-            book_list = []
-            for row in data:
-                book_list.append(Book(row[0], row[1]))
-            result[title] = book_list
+                SELECT k.value, b.title, b.author FROM temp.lookup_keys k
+                JOIN books b ON b.title LIKE '%' || k.value || '%'
+            ''')
+            for searched, title, author in self.cursor.fetchall():
+                result[searched].append(Book(title, author))
         return result
 
+    def search_books(self, phrase: str, limit: int = 20) -> list:
+        """ method returns books which title or author contain all words of phrase (see match_expression)
+
+        Uses full-text index books_fts (case and diacritics are ignored), the best matches first.
+
+        Args:
+            phrase (str): searched words, e.g. 'henryk sienk'
+            limit (int): max number of returned books
+
+        Returns:
+            list: list of objects type Book
+        """
+        query = match_expression(phrase)
+        if not query:
+            return []
+        self.cursor.execute('''
+            SELECT b.title, b.author FROM books_fts
+            JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY bm25(books_fts) LIMIT ?
+        ''', (query, limit))
+        return [Book(title, author) for title, author in self.cursor.fetchall()]
+
     def _get_book_id(self, book: Book) -> int:
         """ method returns book id
 
@@ -110,25 +367,64 @@ class Database:
             int: searched book id, if book don't exist in db returns None
         """
         self.cursor.execute('''
-            SELECT id FROM books WHERE author LIKE ? AND title LIKE ?
+            SELECT id FROM books WHERE author = ? AND title = ?
         ''', (book.author, book.title))
         try:
             return self.cursor.fetchone()[0]
         except TypeError:
             return None
 
+    def has_book(self, book: Book) -> bool:
+        """ method checks if book exists in db
+
+        Args:
+            book (Book): searched book (author and title must match exactly)
+
+        Returns:
+            bool
+        """
+        return self._get_book_id(book) is not None
+
     def add_user(self, user: User) -> None:
-        """ method adds user to db
+        """ method adds user to db (email is normalized and validated, see models.normalize_email)
 
         Args:
             user (User): object type User
         """
-        data_to_add = (user.name, user.email, datetime.now())
+        email = normalize_email(user.email)
+        data_to_add = (user.name, email, is_valid_email(email), datetime.now())
         self.cursor.execute('''
-            INSERT INTO users (name, email, created_at) VALUES (?, ?, ?)
+            INSERT INTO users (name, email, email_valid, created_at) VALUES (?, ?, ?, ?)
         ''', data_to_add)
         self.connection.commit()
 
+    def add_users(self, users: Iterable[User], commit: bool = True) -> None:
+        """ method adds many users in one transaction (emails are normalized and validated)
+
+        Args:
+            users (Iterable[User]): objects type User
+            commit (bool): commit transaction, False if caller commits it
+        """
+        now = datetime.now().isoformat(' ')  # adapted once instead of for every row
+        emails = ((user.name, normalize_email(user.email)) for user in users)
+        self.cursor.executemany('''
+            INSERT INTO users (name, email, email_valid, created_at) VALUES (?, ?, ?, ?)
+        ''', ((name, email, is_valid_email(email), now) for name, email in emails))
+        if commit:
+            self.connection.commit()
+
+    def get_users_ids(self, min_id: int = 0) -> dict:
+        """ method returns ids of users
+
+        Args:
+            min_id (int): only users with greater id are returned
+
+        Returns:
+            dict: key is tuple (name, email), item is user id
+        """
+        self.cursor.execute('SELECT name, email, id FROM users WHERE id > ?', (min_id,))
+        return {(name, email): user_id for name, email, user_id in self.cursor}
+
     def get_all_users(self) -> list:
         """ method returns all users from db
 
@@ -146,16 +442,11 @@ class Database:
         """ method returns users
 
         Returns:
-            dict: key is searched id, item is list of objects type User
+            dict: key is searched id, item is object type User (ids missing in db are skipped)
         """
-        result = {}
-        for arg in users_ids:
-            self.cursor.execute('''
-                SELECT name, email FROM users WHERE id=?
-            ''', (arg,))
-            name, email = self.cursor.fetchone()
-            result[arg] = User(name, email)
-        return result
+        rows = self._select_by_keys(
+            'SELECT id, name, email FROM users WHERE id IN {keys}', users_ids)
+        return {user_id: User(name, email) for user_id, name, email in rows}
 
     def get_users_by_name(self, *users_names) -> dict:
         """ method returns users
@@ -163,18 +454,39 @@ class Database:
         Returns:
             dict: key is searched name, item is list of objects type User
         """
-        result = {}
-        for name in users_names:
+        result = {name: [] for name in users_names}
+        with self._lookup_keys(users_names):
             self.cursor.execute('''
-                SELECT name, email FROM users WHERE name LIKE ?
-            ''', (f'%{name}%',))
-            data = self.cursor.fetchall()
-            user_list = []
-            for row in data:
-                user_list.append(User(row[0], row[1]))
-            result[name] = user_list
+                SELECT k.value, u.name, u.email FROM temp.lookup_keys k
+                JOIN users u ON u.name LIKE '%' || k.value || '%'
+            ''')
+            for searched, name, email in self.cursor.fetchall():
+                result[searched].append(User(name, email))
         return result
 
+    def search_users(self, phrase: str, limit: int = 20) -> list:
+        """ method returns users which name or email contain all words of phrase (see match_expression)
+
+        Uses full-text index users_fts (case and diacritics are ignored), the best matches first.
+
+        Args:
+            phrase (str): searched words, e.g. 'jan kowal'
+            limit (int): max number of returned users
+
+        Returns:
+            list: list of objects type User
+        """
+        query = match_expression(phrase)
+        if not query:
+            return []
+        self.cursor.execute('''
+            SELECT u.name, u.email FROM users_fts
+            JOIN users u ON u.id = users_fts.rowid
+            WHERE users_fts MATCH ?
+            ORDER BY bm25(users_fts) LIMIT ?
+        ''', (query, limit))
+        return [User(name, email) for name, email in self.cursor.fetchall()]
+
     def _get_user_id(self, user: User) -> int:
         """ method returns user id
 
@@ -185,113 +497,406 @@ class Database:
             int: searched user id, if user don't exist in db returns None
         """
         self.cursor.execute('''
-            SELECT id FROM users WHERE name LIKE ? AND email LIKE ?
-        ''', (user.name, user.email))
+            SELECT id FROM users WHERE email = ? AND name = ?
+        ''', (normalize_email(user.email), user.name))
         try:
             return self.cursor.fetchone()[0]
         except TypeError:
             return None
 
+    def has_user(self, user: User) -> bool:
+        """ method checks if user exists in db
+
+        Args:
+            user (User): searched user (name and email must match exactly)
+
+        Returns:
+            bool
+        """
+        return self._get_user_id(user) is not None
+
+    def validate_emails(self, revalidate: bool = False) -> int:
+        """ method normalizes and validates emails of users saved without validation
+            (e.g. before users.email_valid existed or by direct INSERT)
+
+        Only changed rows are written, so call on up-to-date db costs one index lookup.
+
+        Overdue hirings of users which email becomes valid get reminder by the next run -
+        runs skipped them (see VALID_RECIPIENT_CONDITION) and moved high-water mark past them.
+
+        Args:
+            revalidate (bool): check all users again (e.g. after validation rules changed)
+
+        Returns:
+            int: number of users which validation result was set or changed
+        """
+        unchecked = '' if revalidate else 'AND email_valid IS NULL'
+        with self.connection:
+            self.cursor.execute(f'''
+                UPDATE users SET email = normalize_email(email)
+                WHERE email != normalize_email(email) {unchecked}
+            ''')
+            self.cursor.execute(f'''
+                INSERT INTO reminders (hiring_id, next_reminder_at)
+                SELECT h.id, :now FROM hirings h
+                WHERE h.returned_to < :now AND h.user_id IN (
+                    SELECT id FROM users WHERE email_valid IS NOT 1 AND is_valid_email(email) {unchecked}
+                )
+                ON CONFLICT (hiring_id) DO NOTHING
+            ''', {'now': to_timestamp(datetime.now())})
+            self.cursor.execute(f'''
+                UPDATE users SET email_valid = is_valid_email(email)
+                WHERE email_valid IS NOT is_valid_email(email) {unchecked}
+            ''')
+            return self.cursor.rowcount
+
     def add_hiring(self, hiring: Hiring) -> None:
-        """ method adds hiring to db
+        """ method adds hiring to db (user and book are added if don't exist)
 
         Args:
             hiring (Hiring): object type Hiring
         """
-        existing_hirings = self._get_all_hirings_id()
-
         user_id = self._get_user_id(hiring.user)
-        book_id = self._get_book_id(hiring.book)
+        if user_id is None:
+            self.add_user(hiring.user)
+            user_id = self._get_user_id(hiring.user)
 
-        if (book_id, user_id) not in existing_hirings:
-            if user_id is None:
-                self.add_user(hiring.user)
-            if book_id is None:
-                self.add_book(hiring.book)
+        book_id = self._get_book_id(hiring.book)
+        if book_id is None:
+            self.add_book(hiring.book)
+            book_id = self._get_book_id(hiring.book)
 
-            data_to_add = (user_id, book_id, datetime.now(), hiring.returned_to)
+        if not self._hiring_exists(user_id, book_id):
+            data_to_add = (user_id, book_id, datetime.now(), to_timestamp(hiring.returned_to))
 
             self.cursor.execute('''
                 INSERT INTO hirings (user_id, book_id, created_at, returned_to) VALUES (?, ?, ?, ?)
             ''', data_to_add)
             self.connection.commit()
 
+    def add_hirings_by_ids(self, hirings: Iterable[tuple], commit: bool = True) -> None:
+        """ method adds many hirings of existing users and books in one transaction
+
+        Args:
+            hirings (Iterable[tuple]): tuples (user_id, book_id, returned_to)
+            commit (bool): commit transaction, False if caller commits it
+        """
+        now = datetime.now().isoformat(' ')  # adapted once instead of for every row
+        self.cursor.executemany('''
+            INSERT INTO hirings (user_id, book_id, created_at, returned_to) VALUES (?, ?, ?, ?)
+        ''', ((user_id, book_id, now, to_timestamp(returned_to))
+            for user_id, book_id, returned_to in hirings))
+        if commit:
+            self.connection.commit()
+
+    def _hiring_exists(self, user_id: int, book_id: int) -> bool:
+        self.cursor.execute('''
+            SELECT 1 FROM hirings WHERE user_id = ? AND book_id = ?
+        ''', (user_id, book_id))
+        return self.cursor.fetchone() is not None
+
     def get_all_hirings(self) -> list:
         """ method returns all hirings from db
 
         Returns:
             list: list of objects type Hiring
         """
-        self.cursor.execute('''
-        SELECT
-            b.title, b.author,
-            u.name, u.email,
-            h.returned_to 
-        FROM hirings h
-        LEFT JOIN books b ON h.book_id=b.id
-        LEFT JOIN users u ON h.user_id=u.id
-        ''')
+        self.cursor.execute(HIRINGS_QUERY)
 
-        data = self.cursor.fetchall()
-        result = []
+        return list(self._hirings_from_rows(self.cursor.fetchall()))
 
-        for row in data:
-            book = Book(row[0], row[1])
-            user = User(row[2], row[3])
-            returned_to = datetime.strptime(row[4], '%Y-%m-%d %H:%M:%S')
-            result.append(Hiring(user, book, returned_to))
+    @staticmethod
+    def _hirings_from_rows(rows: Iterable[tuple]) -> Iterator[Hiring]:
+        """ method creates hirings from rows selected by HIRINGS_QUERY
 
-        return result
+        Equal users, books and dates are created (and dates parsed) once and shared
+        by all hirings of the query.
+        """
+        users, books, dates = {}, {}, {}
+        parse_date = _timed_parse_date if metrics.is_enabled() else from_timestamp
+        hydrated = 0
+
+        try:
+            for hiring_id, title, author, name, email, returned_to in rows:
+                user = users.get((name, email))
+                if user is None:
+                    user = users[name, email] = User(name, email)
+                book = books.get((title, author))
+                if book is None:
+                    book = books[title, author] = Book(title, author)
+                date = dates.get(returned_to)
+                if date is None:
+                    date = dates[returned_to] = parse_date(returned_to)
+                hydrated += 1
+                yield Hiring(user, book, date, hiring_id)
+        finally:
+            metrics.inc('hirings_hydrated_total', hydrated, 'Hirings created from db rows')
+
+    def get_hirings_by_id(self, *hirings_ids) -> dict:
+        """ method returns hirings
+
+        Returns:
+            dict: key is searched id, item is object type Hiring (ids missing in db are skipped)
+        """
+        rows = self._select_by_keys(HIRINGS_QUERY + 'WHERE h.id IN {keys}', hirings_ids)
+        return {hiring.hiring_id: hiring for hiring in self._hirings_from_rows(rows)}
 
-    def _get_all_hirings_id(self) -> list:
-        self.cursor.execute('SELECT book_id, user_id FROM hirings')
+    def get_overdue_hirings(self, as_of: datetime = None) -> Iterator[Hiring]:
+        """ method yields hirings which should have been returned before `as_of`
+
+        Filtering is done by SQLite (using index on hirings.returned_to) and rows
+        are streamed, so memory usage doesn't depend on size of hirings table.
+
+        Args:
+            as_of (datetime): point in time to compare with, default now
+
+        Yields:
+            Hiring: overdue hiring
+        """
+        if as_of is None:
+            as_of = datetime.now()
 
+        cursor = self.connection.execute(HIRINGS_QUERY + '''
+        WHERE h.returned_to < ?
+        ORDER BY h.returned_to
+        ''', (to_timestamp(as_of),))
+
+        try:
+            yield from self._hirings_from_rows(cursor)
+        finally:
+            cursor.close()
+
+    def _get_page(self, query: str, after_id: int, before_id: int, limit: int) -> list:
+        """ method returns page of rows using keyset pagination (by id)
+
+        Args:
+            query (str): query selecting id as first column, with `{where}` and `{order}`
+                in place of id condition and sort direction
+            after_id (int): page starts after this id
+            before_id (int): if given, page ends before this id (previous page)
+            limit (int): page size
+
+        Returns:
+            list: rows sorted by id
+        """
+        if before_id is not None:
+            self.cursor.execute(query.format(where='< ?', order='DESC'), (before_id, limit))
+            return self.cursor.fetchall()[::-1]
+        self.cursor.execute(query.format(where='> ?', order='ASC'), (after_id, limit))
         return self.cursor.fetchall()
 
+    def get_users_page(self, after_id: int = 0, before_id: int = None, limit: int = 20) -> list:
+        """ method returns one page of users (sorted by id)
 
-class EmailSender:
-    """ class to manage sending emails """
-    def __init__(self, env_path: str = '.env') -> None:
-        self.env_path = env_path
+        Returns:
+            list: list of tuples (id, User)
+        """
+        rows = self._get_page(
+            'SELECT id, name, email FROM users WHERE id {where} ORDER BY id {order} LIMIT ?',
+            after_id, before_id, limit)
+        return [(user_id, User(name, email)) for user_id, name, email in rows]
 
-        self.context = create_default_context()
+    def get_books_page(self, after_id: int = 0, before_id: int = None, limit: int = 20) -> list:
+        """ method returns one page of books (sorted by id)
 
-        self.sender_name = get_key(self.env_path, 'sender_name')
-        self.email = get_key(self.env_path, 'email')
-        self.password = get_key(self.env_path, 'password')
+        Returns:
+            list: list of tuples (id, Book)
+        """
+        rows = self._get_page(
+            'SELECT id, title, author FROM books WHERE id {where} ORDER BY id {order} LIMIT ?',
+            after_id, before_id, limit)
+        return [(book_id, Book(title, author)) for book_id, title, author in rows]
 
-        self.smtp_server = get_key(self.env_path, 'smtp_server')
-        self.smtp_port = get_key(self.env_path, 'smtp_port')
+    def get_hirings_page(self, after_id: int = 0, before_id: int = None, limit: int = 20) -> list:
+        """ method returns one page of hirings (sorted by id)
+
+        Returns:
+            list: list of tuples (id, Hiring)
+        """
+        rows = self._get_page(HIRINGS_QUERY + '''
+        WHERE h.id {where}
+        ORDER BY h.id {order}
+        LIMIT ?
+        ''', after_id, before_id, limit)
+        return [(hiring.hiring_id, hiring) for hiring in self._hirings_from_rows(rows)]
+
+    @staticmethod
+    def iter_pages(get_page: Callable, page_size: int = 1000) -> Iterator[list]:
+        """ method yields all pages returned by `get_page` (e.g. Database.get_users_page)
+
+        Every page is fetched only when needed, so memory usage is limited to one page.
+
+        Yields:
+            list: list of tuples (id, object)
+        """
+        page = get_page(limit=page_size)
+        while page:
+            yield page
+            page = get_page(after_id=page[-1][0], limit=page_size)
+
+    def get_last_reminder_run(self) -> datetime:
+        """ method returns high-water mark of last reminder run
+
+        Returns:
+            datetime: `as_of` of last run (hirings overdue before it were handled), None if no run was done
+        """
+        self.cursor.execute('SELECT overdue_until FROM reminder_runs ORDER BY id DESC LIMIT 1')
+        row = self.cursor.fetchone()
+        return from_timestamp(row[0]) if row is not None else None
 
-    def send_email(self, reciver: str, message: Union[bytes, str]) -> None:
-        """ method send email
+    def get_pending_reminders(self, as_of: datetime = None, since: datetime = None,
+                              shard: tuple = None) -> Iterator[Hiring]:
+        """ method yields hirings which reminder should be sent for:
+            - hirings which became overdue between `since` and `as_of` (and weren't reminded yet)
+            - hirings which next reminder time (see `record_reminder_run`) passed
+
+        Both parts use indexes, so cost depends on amount of new work only.
 
         Args:
-            reciver (str): email address of reciver
-            message (Union[bytes, str]): message to send
+            as_of (datetime): point in time to compare with, default now
+            since (datetime): high-water mark of previous run (see `get_last_reminder_run`),
+                None - all overdue hirings without reminder
+            shard (tuple): (column, low, high) - only hirings which column ('id' or 'user_id')
+                is between low and high (both included), None - all hirings
+
+        Yields:
+            Hiring: hiring (with hiring_id) which needs reminder
         """
-        with SMTP_SSL(self.smtp_server, self.smtp_port, context=self.context) as server:
-            server.login(self.email, self.password)
-            server.sendmail(from_addr=self.email, to_addrs=reciver, msg=message)
+        query, parameters = self._pending_reminders_query(as_of, since, shard)
+        cursor = self.connection.execute(
+            query + HIRINGS_QUERY + 'JOIN pending p ON p.id = h.id', parameters)
+
+        try:
+            yield from self._hirings_from_rows(cursor)
+        finally:
+            cursor.close()
+
+    def get_pending_reminders_by_user(self, as_of: datetime = None, since: datetime = None,
+                                      shard: tuple = None) -> Iterator[tuple]:
+        """ method yields hirings which reminder should be sent for (see `get_pending_reminders`)
+            grouped by user (grouping is done by SQLite)
+
+        Args:
+            as_of (datetime): point in time to compare with, default now
+            since (datetime): high-water mark of previous run, None - all overdue hirings without reminder
+            shard (tuple): (column, low, high), see `get_pending_reminders`
+
+        Yields:
+            tuple: (User, list of user's hirings sorted by returned_to)
+        """
+        query, parameters = self._pending_reminders_query(as_of, since, shard)
+        cursor = self.connection.execute(query + '''
+        SELECT
+            u.name, u.email,
+            json_group_array(json_array(h.id, b.title, b.author, h.returned_to))
+        FROM pending p
+        JOIN hirings h ON h.id = p.id
+        LEFT JOIN books b ON h.book_id=b.id
+        LEFT JOIN users u ON h.user_id=u.id
+        GROUP BY h.user_id
+        ''', parameters)
+
+        try:
+            for name, email, hirings in cursor:
+                rows = sorted(loads(hirings), key=itemgetter(3))
+                hirings = self._hirings_from_rows(
+                    (hiring_id, title, author, name, email, returned_to)
+                    for hiring_id, title, author, returned_to in rows)
+                hirings = list(hirings)
+                yield hirings[0].user, hirings
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _pending_reminders_query(as_of: datetime, since: datetime, shard: tuple) -> tuple:
+        """ returns (`WITH pending` clause, parameters) for get_pending_reminders* """
+        parameters = {
+            'as_of': to_timestamp(as_of if as_of is not None else datetime.now()),
+            'since': to_timestamp(since),
+        }
+        if shard is None:
+            return pending_reminders_cte(since), parameters
+        shard_key, parameters['shard_low'], parameters['shard_high'] = shard
+        return pending_reminders_cte(since, shard_key), parameters
+
+    def record_reminder_run(self, as_of: datetime, sent: Iterable[int], failed: Iterable[int],
+                            interval: timedelta = None, mark_run: bool = True,
+                            hirings_until: int = None) -> None:
+        """ method saves results of reminder run (in one transaction)
 
-    def send_reminder_email(self, hiring: Hiring) -> None:
-        """ method send reminder email
+        Args:
+            as_of (datetime): `as_of` used to select pending reminders, becomes new high-water mark
+            sent (Iterable[int]): ids of hirings which reminder was sent for
+            failed (Iterable[int]): ids of hirings which reminder failed, they are retried by next run
+            interval (timedelta): time after reminder is repeated, None - never repeated
+            mark_run (bool): False - save only state of hirings, without moving high-water mark
+                (used by shards of one run, see `mark_reminder_run`)
+            hirings_until (int): `get_last_hiring_id()` read before pending reminders were selected,
+                required when run is marked - hirings added while reminders were sent must stay
+                above the mark
+
+        Raises:
+            ValueError: run is marked without `hirings_until`
+        """
+        if mark_run and hirings_until is None:
+            raise ValueError('hirings_until is required to mark reminder run')
+        sent, failed = list(sent), list(failed)
+        next_reminder_at = to_timestamp(as_of + interval) if interval is not None else None
+        as_of = to_timestamp(as_of)
+
+        with self.connection:
+            self.cursor.executemany('''
+                INSERT INTO reminders (hiring_id, last_sent_at, next_reminder_at, sent_count)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT (hiring_id) DO UPDATE SET
+                    last_sent_at = excluded.last_sent_at,
+                    next_reminder_at = excluded.next_reminder_at,
+                    sent_count = sent_count + 1
+            ''', ((hiring_id, as_of, next_reminder_at) for hiring_id in sent))
+            self.cursor.executemany('''
+                INSERT INTO reminders (hiring_id, next_reminder_at) VALUES (?, ?)
+                ON CONFLICT (hiring_id) DO UPDATE SET next_reminder_at = excluded.next_reminder_at
+            ''', ((hiring_id, as_of) for hiring_id in failed))
+            if mark_run:
+                self._insert_reminder_run(as_of, len(sent), len(failed), hirings_until)
+
+    def mark_reminder_run(self, as_of: datetime, sent: int, failed: int, hirings_until: int) -> None:
+        """ method saves run which hirings were recorded with `record_reminder_run(..., mark_run=False)`
+            (moves high-water mark)
 
         Args:
-            hiring (Hiring): object type Hiring which email is sended for
+            as_of (datetime): `as_of` used to select pending reminders
+            sent (int): number of sent reminders
+            failed (int): number of failed reminders
+            hirings_until (int): `get_last_hiring_id()` read before pending reminders were selected
         """
-        message = bytes(f'''
-        From: {self.sender_name} <{self.email}>
-        To: {hiring.user.name} <{hiring.user.email}>
-        Subject: Czas zwrócić moją książkę
+        with self.connection:
+            self._insert_reminder_run(to_timestamp(as_of), sent, failed, hirings_until)
 
-        Hej {hiring.user.name}!
-        Może Ci umkneło, ale {hiring.returned_to.strftime('%d.%m.%Y')} powinieneś zwrócić moją książkę {hiring.book.title} (autorstwa {hiring.book.author})
-        
-        Będę wdzięczny za zwrot.
+    def _insert_reminder_run(self, overdue_until: int, sent: int, failed: int, hirings_until: int) -> None:
+        self.cursor.execute('''
+            INSERT INTO reminder_runs (overdue_until, sent, failed, hirings_until) VALUES (?, ?, ?, ?)
+        ''', (overdue_until, sent, failed, hirings_until))
+
+    def get_last_hiring_id(self) -> int:
+        """ method returns the highest id of hirings (0 - no hirings), part of high-water mark of run """
+        self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM hirings')
+        return self.cursor.fetchone()[0]
+
+    def get_hirings_ids(self) -> set:
+        """ method returns users and books ids of all hirings
+
+        Returns:
+            set: set of tuples (user_id, book_id)
+        """
+        self.cursor.execute('SELECT user_id, book_id FROM hirings')
+        return set(self.cursor)
 
-        Pozdrawiam,
-        {self.sender_name}
-        ''', encoding='utf8')
 
-        self.send_email(hiring.user.email, message)
+def __getattr__(name: str):
+    # EmailSender lives in mailer.py, imported on first use - commands which only
+    # touch db don't pay for loading smtplib, ssl and .env parser
+    if name == 'EmailSender':
+        from mailer import EmailSender
+        return EmailSender
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
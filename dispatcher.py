@@ -0,0 +1,171 @@
+""" Concurrent (asyncio based) dispatching of reminder emails """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from smtplib import SMTPException, SMTPResponseException, SMTPServerDisconnected
+from time import monotonic
+from typing import Callable, Iterable, Optional
+
+from models import Hiring
+
+
+def is_transient(error: Exception) -> bool:
+    """ function checks if sending can succeed when repeated - 4xx replies of server,
+        lost connection and network errors (5xx replies and refused recipients are permanent)
+    """
+    if isinstance(error, SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, SMTPException):
+        return isinstance(error, SMTPServerDisconnected)
+    return isinstance(error, OSError)
+
+
+class TokenBucket:
+    """ rate limiter - allows `rate` messages per second with bursts up to `capacity` """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """ method waits until one token is available and takes it """
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+@dataclass
+class DispatchReport:
+    """ summary of dispatching run """
+    sent: int = 0
+    failed: int = 0
+    failures: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def __repr__(self) -> str:
+        return f'wysłano: {self.sent}, błędy: {self.failed} ({self.elapsed:.2f} s)'
+
+
+class ReminderDispatcher:
+    """ class sends reminder emails concurrently over several SMTP sessions
+
+    Every worker owns one EmailSender (created by `sender_factory`) with open
+    session, so `concurrency` is also the number of SMTP connections to relay.
+
+    Args:
+        sender_factory (Callable): returns new EmailSender
+        concurrency (int): number of parallel SMTP sessions
+        rate (float): max messages per second sent to relay (None - unlimited)
+        retries (int): number of retries of single message after transient error (see `is_transient`)
+        backoff (float): delay before first retry, doubled by every next retry
+    """
+
+    def __init__(self, sender_factory: Callable, concurrency: int = 4,
+                 rate: Optional[float] = None, retries: int = 3, backoff: float = 0.5) -> None:
+        self.sender_factory = sender_factory
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+
+    @staticmethod
+    def _send(sender, hiring: Hiring) -> None:
+        sender.send_reminder_email(hiring)
+
+    def run(self, hirings: Iterable[Hiring], callback: Optional[Callable] = None) -> DispatchReport:
+        """ method sends reminders for all hirings and waits for the end
+
+        Args:
+            hirings (Iterable[Hiring]): hirings which reminders are sent for
+            callback (Callable): called as callback(hiring, error) after every message,
+                error is None when message was sent
+
+        Returns:
+            DispatchReport: sent/failed counters
+        """
+        return asyncio.run(self.dispatch(hirings, callback))
+
+    async def dispatch(self, hirings: Iterable[Hiring],
+                       callback: Optional[Callable] = None) -> DispatchReport:
+        """ coroutine version of `run` """
+        report = DispatchReport()
+        start = monotonic()
+        bucket = TokenBucket(self.rate) if self.rate else None
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            tasks = [asyncio.create_task(self._produce(hirings, queue))]
+            tasks += [
+                asyncio.create_task(self._worker(queue, executor, bucket, report, callback))
+                for _ in range(self.concurrency)
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        report.elapsed = monotonic() - start
+        return report
+
+    async def _produce(self, hirings: Iterable[Hiring], queue: asyncio.Queue) -> None:
+        for hiring in hirings:
+            await queue.put(hiring)
+        for _ in range(self.concurrency):
+            await queue.put(None)
+
+    async def _worker(self, queue: asyncio.Queue, executor: ThreadPoolExecutor,
+                      bucket: Optional[TokenBucket], report: DispatchReport,
+                      callback: Optional[Callable]) -> None:
+        loop = asyncio.get_running_loop()
+        sender = self.sender_factory()
+        await loop.run_in_executor(executor, sender.open_session)
+        try:
+            while (hiring := await queue.get()) is not None:
+                error = await self._send_with_retries(loop, executor, bucket, sender, hiring)
+                if error is None:
+                    report.sent += 1
+                else:
+                    report.failed += 1
+                    report.failures.append((hiring, error))
+                if callback is not None:
+                    callback(hiring, error)
+        finally:
+            await loop.run_in_executor(executor, sender.close_session)
+
+    async def _send_with_retries(self, loop, executor, bucket, sender, hiring) -> Optional[Exception]:
+        for attempt in range(self.retries + 1):
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                await loop.run_in_executor(executor, self._send, sender, hiring)
+                return None
+            except Exception as error:
+                # permanent errors (e.g. 5xx reply, message which can't be rendered) aren't retried
+                if not is_transient(error) or attempt == self.retries:
+                    return error
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        return None
+
+
+class DigestDispatcher(ReminderDispatcher):
+    """ ReminderDispatcher sending one email per user
+
+    Items passed to `run` are tuples (User, list of user's hirings),
+    e.g. from Database.get_pending_reminders_by_user.
+    """
+
+    @staticmethod
+    def _send(sender, digest: tuple) -> None:
+        sender.send_digest_email(*digest)
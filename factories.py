@@ -1,10 +1,192 @@
+""" Factories of synthetic books, users and hirings (for benchmarks and manual testing)
+
+Faker needs microseconds per value, so every factory draws small pools of fake
+values once and combines them with row number - rows stay unique and one row
+costs well under a microsecond. Rows are inserted by executemany in batches
+(one transaction per batch), so even 10M rows take minutes, not hours.
+"""
+from abc import ABC, abstractmethod
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from random import Random
+from time import perf_counter
+from typing import Callable, Iterator
+
 from faker import Faker
-from controllers import Database
 
-class BooksFactory:
-    fake = Faker()
+from controllers import Database, to_timestamp
+from importer import batched
+from models import Book, Hiring, User, is_valid_email
+
+
+class Factory(ABC):
+    """ base class of factories
+
+    Args:
+        database (Database): db filled by `create` (not needed by generate_* methods)
+        seed (int): seed of Faker and random generator, same seed - same data
+        pool_size (int): number of distinct values drawn from Faker for every field
+        locale (str): locale of Faker
+    """
+    TABLE = None
+    COLUMNS = ()
+
+    def __init__(self, database: Database = None, seed: int = None,
+                 pool_size: int = 1000, locale: str = 'pl_PL') -> None:
+        self.database = database
+        self.fake = Faker(locale)
+        self.fake.seed_instance(seed)
+        self.random = Random(seed)
+        self.pool_size = pool_size
+        self.now = datetime.now()
+        self._pools = {}
+
+    def _pool(self, name: str, provider: Callable) -> list:
+        """ returns list of `pool_size` values of Faker provider (drawn once) """
+        pool = self._pools.get(name)
+        if pool is None:
+            pool = self._pools[name] = [provider() for _ in range(self.pool_size)]
+        return pool
+
+    @abstractmethod
+    def rows(self, quantity: int, start: int = 0) -> Iterator[tuple]:
+        """ method yields `quantity` rows of TABLE (values of COLUMNS), `start` - number of first row """
+
+    def create(self, quantity: int, batch_size: int = 100_000) -> int:
+        """ method inserts `quantity` rows into db (numbering continues after rows already in table)
+
+        Returns:
+            int: number of inserted rows
+        """
+        connection = self.database.connection
+        start = connection.execute(f'SELECT COALESCE(MAX(id), 0) FROM {self.TABLE}').fetchone()[0]
+        query = (f'INSERT INTO {self.TABLE} ({", ".join(self.COLUMNS)}) '
+                 f'VALUES ({", ".join("?" * len(self.COLUMNS))})')
+        for batch in batched(self.rows(quantity, start), batch_size):
+            with connection:
+                connection.executemany(query, batch)
+        return quantity
+
+
+class BooksFactory(Factory):
+    """ factory of books (author, title) - titles are unique """
+    TABLE = 'books'
+    COLUMNS = ('author', 'title', 'created_at')
+
+    def rows(self, quantity: int, start: int = 0) -> Iterator[tuple]:
+        authors = self._pool('authors', self.fake.name)
+        titles = self._pool('titles', lambda: self.fake.sentence(nb_words=3).rstrip('.'))
+        pool_size, now = self.pool_size, self.now.isoformat(' ')
+        for number in range(start, start + quantity):
+            yield authors[number * 7 % pool_size], f'{titles[number % pool_size]} {number}', now
+
+    def generate_books(self, quantity: int = 1) -> list:
+        """ method returns list of objects type Book (without saving them) """
+        return [Book(title, author) for author, title, _ in self.rows(quantity)]
+
+
+class UsersFactory(Factory):
+    """ factory of users (name, email) - emails are unique """
+    TABLE = 'users'
+    COLUMNS = ('name', 'email', 'email_valid', 'created_at')
+
+    def rows(self, quantity: int, start: int = 0) -> Iterator[tuple]:
+        names = self._pool('names', lambda: f'{self.fake.first_name()} {self.fake.last_name()}')
+        logins = self._pool('logins', self.fake.user_name)
+        domains = self._pool('domains', self.fake.free_email_domain)
+        pool_size, now = self.pool_size, self.now.isoformat(' ')
+        for number in range(start, start + quantity):
+            index = number % pool_size
+            email = f'{logins[index]}{number}@{domains[number * 7 % pool_size]}'
+            yield names[index], email, is_valid_email(email), now
+
+    def generate_users(self, quantity: int = 1) -> list:
+        """ method returns list of objects type User (without saving them) """
+        return [User(name, email) for name, email, _, _ in self.rows(quantity)]
+
+
+class HiringsFactory(Factory):
+    """ factory of hirings of random users and books
+
+    Args:
+        database (Database): db filled by `create`
+        users (int): hirings use users with ids 1..users (default - all users in db)
+        books (int): hirings use books with ids 1..books (default - all books in db)
+        overdue_ratio (float): part of hirings which returned_to is before `as_of`
+        as_of (datetime): point in time which decides if hiring is overdue, default now
+        max_days (int): returned_to is up to max_days before or after `as_of`
+        seed (int): seed of random generator
+    """
+    TABLE = 'hirings'
+    COLUMNS = ('user_id', 'book_id', 'created_at', 'returned_to')
+
+    def __init__(self, database: Database = None, users: int = None, books: int = None,
+                 overdue_ratio: float = 0.1, as_of: datetime = None, max_days: int = 60,
+                 seed: int = None, **kwargs) -> None:
+        super().__init__(database, seed, **kwargs)
+        self.users = users
+        self.books = books
+        self.overdue_ratio = overdue_ratio
+        self.as_of = as_of if as_of is not None else self.now
+        self.max_days = max_days
+
+    def _count(self, table: str) -> int:
+        return self.database.connection.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+
+    def _dates(self) -> tuple:
+        """ returns (overdue dates, not overdue dates) """
+        overdue = [self.as_of - timedelta(days=days, hours=1) for days in range(self.max_days)]
+        not_overdue = [self.as_of + timedelta(days=days, hours=1) for days in range(self.max_days)]
+        return overdue, not_overdue
+
+    def rows(self, quantity: int, start: int = 0) -> Iterator[tuple]:
+        users = self.users if self.users is not None else self._count('users')
+        books = self.books if self.books is not None else self._count('books')
+        if not users or not books:
+            raise ValueError('Hirings need users and books')
+        # dates are converted once
+        overdue, not_overdue = ([to_timestamp(date) for date in dates] for dates in self._dates())
+        now = self.now.isoformat(' ')
+        randrange, random, ratio = self.random.randrange, self.random.random, self.overdue_ratio
+        for _ in range(quantity):
+            dates = overdue if random() < ratio else not_overdue
+            yield randrange(users) + 1, randrange(books) + 1, now, dates[randrange(len(dates))]
+
+    def generate_hirings(self, users: list, books: list, quantity: int = 1) -> list:
+        """ method returns list of objects type Hiring of given users and books (without saving them) """
+        overdue, not_overdue = self._dates()
+        hirings = []
+        for _ in range(quantity):
+            dates = overdue if self.random.random() < self.overdue_ratio else not_overdue
+            hirings.append(Hiring(self.random.choice(users), self.random.choice(books), self.random.choice(dates)))
+        return hirings
+
+
+def populate(database: Database, books: int, users: int, hirings: int,
+             overdue_ratio: float = 0.1, seed: int = None, batch_size: int = 100_000) -> None:
+    """ function fills db with synthetic books, users and hirings """
+    BooksFactory(database, seed).create(books, batch_size)
+    UsersFactory(database, seed).create(users, batch_size)
+    HiringsFactory(database, overdue_ratio=overdue_ratio, seed=seed).create(hirings, batch_size)
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Fills db with synthetic books, users and hirings')
+    parser.add_argument('--database', default='database.db')
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--hirings', type=int, default=1000)
+    parser.add_argument('--overdue-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    database = Database(args.database)
+    start = perf_counter()
+    populate(database, args.books, args.users, args.hirings, args.overdue_ratio, args.seed)
+    database.close_connection()
+    rows = args.books + args.users + args.hirings
+    print(f'Dodano {rows} wierszy w {perf_counter() - start:.1f} s')
+
 
-    def generate_books(self, quantity: int = 1):
-        fake_data = []
-        db = Database('database.db')
-        
+if __name__ == '__main__':
+    main()
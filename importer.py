@@ -0,0 +1,218 @@
+""" Bulk import of books, users and hirings from CSV / JSONL files
+
+Usage:
+    python importer.py books books.csv
+    python importer.py hirings hirings.jsonl --database database.db
+
+Expected columns (CSV header or JSONL keys):
+    books:   title, author
+    users:   name, email
+    hirings: name, email, title, author, returned_to (YYYY-MM-DD[ HH:MM:SS])
+"""
+from argparse import ArgumentParser
+from csv import reader
+from datetime import datetime
+from itertools import islice
+from json import loads
+from operator import itemgetter
+from sys import stdin
+from typing import IO, Iterable, Iterator
+
+from controllers import Database
+from models import Book, Hiring, User, normalize_email
+
+
+def read_csv(file: IO, columns: tuple) -> Iterator[tuple]:
+    """ yields values of given columns from csv file (with header) """
+    rows = reader(file)
+    header = next(rows, ())
+    select = itemgetter(*(header.index(column) for column in columns))
+    return map(select, rows)
+
+
+def read_jsonl(file: IO, columns: tuple) -> Iterator[tuple]:
+    """ yields values of given keys from JSON Lines file """
+    select = itemgetter(*columns)
+    for line in file:
+        if line.strip():
+            yield select(loads(line))
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def rows_to_books(rows: Iterable[tuple]) -> Iterator[Book]:
+    for title, author in rows:
+        yield Book(title, author)
+
+
+def rows_to_users(rows: Iterable[tuple]) -> Iterator[User]:
+    for name, email in rows:
+        yield User(name, normalize_email(email))
+
+
+def rows_to_hirings(rows: Iterable[tuple]) -> Iterator[Hiring]:
+    for name, email, title, author, returned_to in rows:
+        yield Hiring(User(name, normalize_email(email)), Book(title, author), datetime.fromisoformat(returned_to))
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class BulkImporter:
+    """ class loads large streams of books, users and hirings
+
+    Foreign keys are resolved through in-memory maps (loaded once from db),
+    every batch is written with executemany in one transaction.
+    """
+
+    def __init__(self, database: Database, batch_size: int = 50_000) -> None:
+        self.database = database
+        self.batch_size = batch_size
+        self._books_ids = None
+        self._users_ids = None
+        self._hirings_ids = None
+
+    @property
+    def books_ids(self) -> dict:
+        if self._books_ids is None:
+            self._books_ids = self.database.get_books_ids()
+        return self._books_ids
+
+    @property
+    def users_ids(self) -> dict:
+        if self._users_ids is None:
+            self._users_ids = self.database.get_users_ids()
+        return self._users_ids
+
+    def _add_missing_books(self, books: Iterable[Book]) -> int:
+        missing = {
+            (book.author, book.title): book for book in books
+            if (book.author, book.title) not in self.books_ids
+        }
+        if missing:
+            last_id = max(self.books_ids.values(), default=0)
+            self.database.add_books(missing.values(), commit=False)
+            self.books_ids.update(self.database.get_books_ids(min_id=last_id))
+        return len(missing)
+
+    def _add_missing_users(self, users: Iterable[User]) -> int:
+        missing = {
+            (user.name, user.email): user for user in users
+            if (user.name, user.email) not in self.users_ids
+        }
+        if missing:
+            last_id = max(self.users_ids.values(), default=0)
+            self.database.add_users(missing.values(), commit=False)
+            self.users_ids.update(self.database.get_users_ids(min_id=last_id))
+        return len(missing)
+
+    def import_books(self, books: Iterable[Book]) -> int:
+        """ method adds books which don't exist in db
+
+        Returns:
+            int: number of added books
+        """
+        added = 0
+        for batch in batched(books, self.batch_size):
+            with self.database.connection:
+                added += self._add_missing_books(batch)
+        return added
+
+    def import_users(self, users: Iterable[User]) -> int:
+        """ method adds users which don't exist in db
+
+        Returns:
+            int: number of added users
+        """
+        added = 0
+        for batch in batched(users, self.batch_size):
+            with self.database.connection:
+                added += self._add_missing_users(batch)
+        return added
+
+    def import_hirings(self, hirings: Iterable[Hiring]) -> int:
+        """ method adds hirings (and their users and books if don't exist in db)
+
+        Hirings of the same book by the same user as existing one are skipped.
+
+        Returns:
+            int: number of added hirings
+        """
+        if self._hirings_ids is None:
+            self._hirings_ids = self.database.get_hirings_ids()
+
+        added = 0
+        for batch in batched(hirings, self.batch_size):
+            with self.database.connection:
+                self._add_missing_users(hiring.user for hiring in batch)
+                self._add_missing_books(hiring.book for hiring in batch)
+
+                users_ids, books_ids, hirings_ids = self.users_ids, self.books_ids, self._hirings_ids
+                rows = []
+                for hiring in batch:
+                    user, book = hiring.user, hiring.book
+                    key = (users_ids[user.name, user.email], books_ids[book.author, book.title])
+                    if key not in hirings_ids:
+                        hirings_ids.add(key)
+                        rows.append((*key, hiring.returned_to))
+                self.database.add_hirings_by_ids(rows, commit=False)
+            added += len(rows)
+        return added
+
+
+IMPORTS = {
+    'books': (('title', 'author'), rows_to_books, BulkImporter.import_books),
+    'users': (('name', 'email'), rows_to_users, BulkImporter.import_users),
+    'hirings': (
+        ('name', 'email', 'title', 'author', 'returned_to'),
+        rows_to_hirings, BulkImporter.import_hirings),
+}
+
+
+def import_file(database: Database, kind: str, filename: str,
+                file_format: str = None, batch_size: int = 50_000) -> int:
+    """ function imports file with books, users or hirings
+
+    Args:
+        database (Database): target db
+        kind (str): 'books', 'users' or 'hirings'
+        filename (str): path to CSV or JSONL file ('-' - stdin)
+        file_format (str): 'csv' or 'jsonl', default taken from file extension (csv for stdin)
+        batch_size (int): rows written in one transaction
+
+    Returns:
+        int: number of added rows
+    """
+    columns, to_models, import_models = IMPORTS[kind]
+    importer = BulkImporter(database, batch_size)
+
+    if filename == '-':
+        rows = READERS[file_format or 'csv'](stdin, columns)
+        return import_models(importer, to_models(rows))
+
+    file_format = file_format or filename.rsplit('.', 1)[-1].lower()
+    with open(filename, mode='r', encoding='utf8', newline='') as file:
+        return import_models(importer, to_models(READERS[file_format](file, columns)))
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Bulk import of books, users and hirings')
+    parser.add_argument('kind', choices=IMPORTS)
+    parser.add_argument('file', help="CSV or JSONL file, '-' for stdin")
+    parser.add_argument('--format', choices=READERS, dest='file_format')
+    parser.add_argument('--database', default='database.db')
+    parser.add_argument('--batch-size', type=int, default=50_000)
+    args = parser.parse_args()
+
+    database = Database(args.database)
+    added = import_file(database, args.kind, args.file, args.file_format, args.batch_size)
+    database.close_connection()
+    print(f'Zaimportowano: {added}')
+
+
+if __name__ == '__main__':
+    main()
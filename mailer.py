@@ -0,0 +1,157 @@
+""" Sending emails over SMTP (imported only by commands which send emails) """
+from ssl import create_default_context
+from smtplib import SMTP, SMTP_SSL, SMTPException, SMTPResponseException, SMTPServerDisconnected
+from typing import Union
+
+import metrics
+from models import Hiring, User
+from settings import load_settings
+from templates import DEFAULT_LOCALE, encode_address, get_renderer
+
+SMTP_METRIC_HELP = 'Duration of SMTP operations (connect, login, send)'
+
+
+class EmailSender:
+    """ class to manage sending emails
+
+    used as context manager sender keeps one authenticated SMTP session open
+    and reuses it for all sent messages; session is reopened after
+    `max_messages_per_connection` messages or when server drops connection
+    """
+    def __init__(self, env_path: str = '.env', max_messages_per_connection: int = 100) -> None:
+        self.env_path = env_path
+        settings = load_settings(env_path)
+
+        self.context = create_default_context()
+
+        self.sender_name = settings.sender_name
+        self.email = settings.email
+        self.password = settings.password
+
+        self.smtp_server = settings.smtp_server
+        self.smtp_port = settings.smtp_port
+
+        self.locale = settings.locale or DEFAULT_LOCALE
+        self.renderer = get_renderer(self.sender_name, self.email, self.locale)
+
+        self.max_messages_per_connection = max_messages_per_connection
+        self._server = None
+        self._sent_on_connection = 0
+        self._keep_session = False
+
+    def __enter__(self) -> 'EmailSender':
+        self.open_session()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close_session()
+
+    def open_session(self) -> None:
+        """ method switches sender to batch mode - SMTP session is reused between messages """
+        self._keep_session = True
+
+    def close_session(self) -> None:
+        """ method ends batch mode and closes opened SMTP session """
+        self._keep_session = False
+        self._disconnect()
+
+    def _open_connection(self) -> SMTP:
+        """ method opens new SMTP connection (not logged in yet) """
+        return SMTP_SSL(self.smtp_server, self.smtp_port, context=self.context)
+
+    def _connect(self) -> SMTP:
+        """ method opens new SMTP connection and logs in
+
+        Returns:
+            SMTP: authenticated SMTP session
+        """
+        with metrics.timer('smtp_seconds', SMTP_METRIC_HELP, operation='connect'):
+            server = self._open_connection()
+        with metrics.timer('smtp_seconds', SMTP_METRIC_HELP, operation='login'):
+            server.login(self.email, self.password)
+        return server
+
+    def _disconnect(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (SMTPServerDisconnected, OSError):
+            pass
+        self._drop_connection()
+
+    def _drop_connection(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        self._server = None
+        self._sent_on_connection = 0
+
+    def _get_server(self) -> SMTP:
+        if self._sent_on_connection >= self.max_messages_per_connection:
+            self._disconnect()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send_email(self, reciver: str, message: Union[bytes, str]) -> None:
+        """ method send email
+
+        Outside of session (see `open_session`) every message uses its own connection.
+
+        Args:
+            reciver (str): email address of reciver
+            message (Union[bytes, str]): message to send
+        """
+        if not self._keep_session:
+            with self._connect() as server:
+                self._sendmail(server, reciver, message)
+            return
+
+        try:
+            self._send_in_session(reciver, message)
+        except (SMTPServerDisconnected, SMTPResponseException) as error:
+            # 421 means server closes connection (e.g. idle timeout or too many messages)
+            if isinstance(error, SMTPResponseException) and error.smtp_code != 421:
+                raise
+            metrics.inc('smtp_reconnects_total', 1, 'SMTP sessions reopened after server closed them')
+            self._send_in_session(reciver, message)
+        self._sent_on_connection += 1
+
+    def _send_in_session(self, reciver: str, message: Union[bytes, str]) -> None:
+        """ method sends message over session connection, broken connection is dropped
+            (next message or retry opens new one)
+        """
+        try:
+            self._sendmail(self._get_server(), reciver, message)
+        except OSError as error:
+            # other SMTP errors are answers of server - connection still works
+            if (not isinstance(error, SMTPException) or isinstance(error, SMTPServerDisconnected)
+                    or getattr(error, 'smtp_code', None) == 421):
+                self._drop_connection()
+            raise
+
+    def _sendmail(self, server: SMTP, reciver: str, message: Union[bytes, str]) -> None:
+        reciver = encode_address(reciver)
+        options = {}
+        if not reciver.isascii():
+            # non-ASCII local part of address needs SMTPUTF8 (server without it refuses message)
+            options['mail_options'] = ('SMTPUTF8',)
+        with metrics.timer('smtp_seconds', SMTP_METRIC_HELP, operation='send'):
+            server.sendmail(from_addr=self.email, to_addrs=reciver, msg=message, **options)
+
+    def send_reminder_email(self, hiring: Hiring) -> None:
+        """ method send reminder email
+
+        Args:
+            hiring (Hiring): object type Hiring which email is sended for
+        """
+        self.send_email(hiring.user.email, self.renderer.reminder(hiring))
+
+    def send_digest_email(self, user: User, hirings: list) -> None:
+        """ method send one reminder email listing all overdue hirings of user
+
+        Args:
+            user (User): reciver
+            hirings (list): list of objects type Hiring which email is sended for
+        """
+        self.send_email(user.email, self.renderer.digest(user, hirings))
@@ -1,6 +1,163 @@
-""" Start the app"""
+""" Start the app
+
+Without command interactive menu is started, commands run one operation
+without any prompts (for scripts and cron jobs):
+
+    python main.py list hirings > hirings.csv
+    python main.py add user 'Jan Kowalski' jan@mail.com
+    python main.py add hiring 'Jan Kowalski' jan@mail.com Lalka 'Bolesław Prus' 2022-01-31
+    python main.py import books books.csv
+    python main.py remind --digest
+    python main.py validate --all
+    python main.py report overdue_by_user --format csv --output overdue.csv
+"""
+import sys
+from argparse import ArgumentParser, Namespace
+from csv import writer
+from datetime import datetime
+
+from importer import IMPORTS, READERS, import_file
+from models import Book, Hiring, User
+from reports import REPORTS, WRITERS, export_report
 from views import Application
 
+# columns of listed rows are the same as columns expected by importer
+LISTS = {
+    'users': ('get_users_page', lambda user: (user.name, user.email)),
+    'books': ('get_books_page', lambda book: (book.title, book.author)),
+    'hirings': ('get_hirings_page', lambda hiring: (
+        hiring.user.name, hiring.user.email, hiring.book.title, hiring.book.author,
+        hiring.returned_to.isoformat(' '))),
+}
+
+
+def list_rows(app: Application, args: Namespace) -> None:
+    """ writes all users, books or hirings to stdout as CSV (page by page) """
+    method, to_row = LISTS[args.kind]
+    columns = IMPORTS[args.kind][0]
+    csv = writer(sys.stdout)
+    csv.writerow(columns)
+    for page in app.database.iter_pages(getattr(app.database, method)):
+        csv.writerows(to_row(item) for _, item in page)
+
+
+def add(app: Application, args: Namespace) -> None:
+    """ adds one user, book or hiring (existing users and books are skipped) """
+    if args.kind == 'user':
+        user = User(args.name, args.email)
+        if not app.database.has_user(user):
+            app.database.add_user(user)
+    elif args.kind == 'book':
+        book = Book(args.title, args.author)
+        if not app.database.has_book(book):
+            app.database.add_book(book)
+    else:
+        app.database.add_hiring(Hiring(
+            User(args.name, args.email), Book(args.title, args.author),
+            datetime.fromisoformat(args.returned_to)))
+
+
+def import_rows(app: Application, args: Namespace) -> None:
+    added = import_file(app.database, args.kind, args.file, args.file_format, args.batch_size)
+    print(f'Zaimportowano: {added}')
+
+
+def remind(app: Application, args: Namespace) -> None:
+    """ queues reminders and sends them in this process (or in background worker) """
+    print(f'Dodano do kolejki maili: {app.enqueue_reminders(args.digest)}')
+    if args.background:
+        if app.outbox.stats()['pending']:
+            app.start_worker()
+            print(f'Maile są wysyłane w tle (postęp w pliku {app.worker_log})')
+        return
+    # sending modules are loaded only by this command
+    from mailer import EmailSender
+    from worker import run_worker
+
+    report = run_worker(app.database, app.outbox, EmailSender, concurrency=app.reminder_concurrency,
+                        rate=app.reminder_rate_limit, drain=True)
+    print(f'Podsumowanie - {report}')
+
+
+def validate(app: Application, args: Namespace) -> None:
+    """ validates emails of users (only not validated yet, all with --all) """
+    print(f'Zmieniono wynik walidacji adresów: {app.database.validate_emails(revalidate=args.all)}')
+
+
+def report(app: Application, args: Namespace) -> None:
+    """ streams report (see reports.py) to stdout or file """
+    as_of = datetime.fromisoformat(args.as_of) if args.as_of else None
+    if args.output is None:
+        export_report(app.database, args.name, sys.stdout, args.file_format, as_of, args.limit)
+        return
+    with open(args.output, 'w', encoding='utf8', newline='') as file:
+        count = export_report(app.database, args.name, file, args.file_format, as_of, args.limit)
+    print(f'Zapisano wierszy: {count}')
+
+
+def parse_args(argv: list = None) -> Namespace:
+    parser = ArgumentParser(description='Manager of books hirings')
+    parser.add_argument('--database', default='database.db')
+    commands = parser.add_subparsers(dest='command')
+
+    command = commands.add_parser('list', help='write users, books or hirings as CSV to stdout')
+    command.add_argument('kind', choices=LISTS)
+    command.set_defaults(function=list_rows)
+
+    command = commands.add_parser('add', help='add user, book or hiring')
+    kinds = command.add_subparsers(dest='kind', required=True)
+    kind = kinds.add_parser('user')
+    kind.add_argument('name')
+    kind.add_argument('email')
+    kind = kinds.add_parser('book')
+    kind.add_argument('title')
+    kind.add_argument('author')
+    kind = kinds.add_parser('hiring')
+    kind.add_argument('name')
+    kind.add_argument('email')
+    kind.add_argument('title')
+    kind.add_argument('author')
+    kind.add_argument('returned_to', help='YYYY-MM-DD[ HH:MM:SS]')
+    command.set_defaults(function=add)
+
+    command = commands.add_parser('import', help='import CSV or JSONL file (see importer.py)')
+    command.add_argument('kind', choices=IMPORTS)
+    command.add_argument('file', help="CSV or JSONL file, '-' for stdin")
+    command.add_argument('--format', choices=READERS, dest='file_format')
+    command.add_argument('--batch-size', type=int, default=50_000)
+    command.set_defaults(function=import_rows)
+
+    command = commands.add_parser('remind', help='send reminders of overdue hirings')
+    command.add_argument('--digest', action='store_true', help='one email per user')
+    command.add_argument('--background', action='store_true', help='send by worker.py in background')
+    command.set_defaults(function=remind)
+
+    command = commands.add_parser('validate', help='validate emails of users')
+    command.add_argument('--all', action='store_true', help='check again users validated before')
+    command.set_defaults(function=validate)
+
+    command = commands.add_parser('report', help='write statistics of hirings (see reports.py)')
+    command.add_argument('name', choices=REPORTS)
+    command.add_argument('--format', choices=WRITERS, default='text', dest='file_format')
+    command.add_argument('--output', help='file path, stdout by default')
+    command.add_argument('--as-of', help='YYYY-MM-DD[ HH:MM:SS], hirings due before are overdue (default now)')
+    command.add_argument('--limit', type=int, help='max number of rows')
+    command.set_defaults(function=report)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> None:
+    args = parse_args(argv)
+    app = Application(args.database)
+    try:
+        if args.command is None:
+            app.run()
+        else:
+            args.function(app, args)
+    finally:
+        app.database.close_connection()
+
+
 if __name__ == '__main__':
-    app = Application()
-    app.run()
+    main()
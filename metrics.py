@@ -0,0 +1,316 @@
+""" Instrumentation: counters, histograms and timers of hot paths
+
+Metrics are collected only after `enable()` - disabled instrumented call costs
+one flag check. Collected metrics can be exported as Prometheus text format or
+JSON; `profile` runs cProfile around any block (e.g. whole reminder run).
+
+    import metrics
+    metrics.enable()
+    ...
+    print(metrics.REGISTRY.to_prometheus())
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from json import dumps
+from threading import Lock, local
+from time import perf_counter
+from types import FunctionType
+from typing import Callable, Iterator
+
+# upper bounds of histogram buckets in seconds (+Inf is added on export)
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# inspect.CO_GENERATOR - inspect itself is too slow to import for metrics used at startup
+_CO_GENERATOR = 0x20
+
+
+def _format_labels(labels: tuple, extra: str = '') -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    """ monotonically increasing value """
+    TYPE = 'counter'
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.value = 0
+
+    def samples(self, name: str, labels: tuple) -> Iterator[str]:
+        yield f'{name}{_format_labels(labels)} {self.value}'
+
+    def to_dict(self) -> dict:
+        return {'value': self.value}
+
+
+class Histogram:
+    """ distribution of observed values (e.g. durations in seconds) in cumulative buckets """
+    TYPE = 'histogram'
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if index < len(self.counts):
+                self.counts[index] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * len(self.buckets)
+            self.count = 0
+            self.sum = 0.0
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """ observes duration of block """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start)
+
+    def samples(self, name: str, labels: tuple) -> Iterator[str]:
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            bucket_labels = _format_labels(labels, f'le="{bound}"')
+            yield f'{name}_bucket{bucket_labels} {cumulative}'
+        bucket_labels = _format_labels(labels, 'le="+Inf"')
+        yield f'{name}_bucket{bucket_labels} {self.count}'
+        yield f'{name}_sum{_format_labels(labels)} {self.sum}'
+        yield f'{name}_count{_format_labels(labels)} {self.count}'
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip(map(str, self.buckets), self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """ registry of metrics identified by name and labels """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._metrics = {}
+        self._help = {}
+        self._lock = Lock()
+
+    def _get(self, metric_class: type, name: str, help_text: str, labels: dict, **kwargs):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = metric_class(**kwargs)
+                    if help_text:
+                        self._help[name] = help_text
+        return metric
+
+    def counter(self, name: str, help_text: str = '', **labels) -> Counter:
+        """ method returns (created on first use) counter of given name and labels """
+        return self._get(Counter, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = '', buckets: tuple = DEFAULT_BUCKETS,
+                  **labels) -> Histogram:
+        """ method returns (created on first use) histogram of given name and labels """
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def reset(self) -> None:
+        """ method sets all metrics to zero (metrics objects stay registered) """
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def to_prometheus(self) -> str:
+        """ method returns all metrics in Prometheus text exposition format """
+        lines = []
+        described = set()
+        for (name, labels), metric in sorted(self._metrics.items(), key=lambda item: item[0]):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {metric.TYPE}')
+            lines.extend(metric.samples(name, labels))
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> dict:
+        """ method returns all metrics as dict: {name: [{'labels': {...}, 'type': ..., ...values}]} """
+        result = {}
+        for (name, labels), metric in sorted(self._metrics.items(), key=lambda item: item[0]):
+            result.setdefault(name, []).append({'labels': dict(labels), 'type': metric.TYPE, **metric.to_dict()})
+        return result
+
+    def to_json(self) -> str:
+        return dumps(self.to_dict(), indent=2)
+
+    def export(self, filename: str) -> None:
+        """ method saves metrics to file - JSON if filename ends with '.json', Prometheus text otherwise """
+        content = self.to_json() if filename.endswith('.json') else self.to_prometheus()
+        with open(filename, mode='w', encoding='utf8') as file:
+            file.write(content)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def enable() -> None:
+    REGISTRY.enabled = True
+
+
+def disable() -> None:
+    REGISTRY.enabled = False
+
+
+def is_enabled() -> bool:
+    return REGISTRY.enabled
+
+
+@contextmanager
+def timer(name: str, help_text: str = '', **labels) -> Iterator[None]:
+    """ observes duration of block in histogram (does nothing when metrics are disabled) """
+    if not REGISTRY.enabled:
+        yield
+        return
+    with REGISTRY.histogram(name, help_text, **labels).time():
+        yield
+
+
+def inc(name: str, amount: float = 1, help_text: str = '', **labels) -> None:
+    """ increases counter (does nothing when metrics are disabled) """
+    if REGISTRY.enabled:
+        REGISTRY.counter(name, help_text, **labels).inc(amount)
+
+
+def timed(name: str, help_text: str = '', **labels) -> Callable:
+    """ decorator observing duration of every call in histogram
+
+    For generator functions the whole iteration is measured (query and hydration
+    of all rows), not only creation of generator.
+    """
+    histograms = []
+
+    def get_histogram() -> Histogram:
+        # registered on first measured call, then reused without lookup in registry
+        if not histograms:
+            histograms.append(REGISTRY.histogram(name, help_text, **labels))
+        return histograms[0]
+
+    def decorator(function: Callable) -> Callable:
+        if function.__code__.co_flags & _CO_GENERATOR:
+            def timed_iteration(iterator: Iterator) -> Iterator:
+                histogram = get_histogram()
+                start = perf_counter()
+                try:
+                    yield from iterator
+                finally:
+                    histogram.observe(perf_counter() - start)
+
+            @wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                if not REGISTRY.enabled:
+                    return function(*args, **kwargs)
+                return timed_iteration(function(*args, **kwargs))
+            return generator_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return function(*args, **kwargs)
+            histogram = get_histogram()
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+_measured_calls = local()
+
+
+def _outermost(function: Callable, timed_function: Callable, key: tuple) -> Callable:
+    """ returns wrapper calling `timed_function`, or plain `function` when call with the same
+        `key` is already measured in this thread (e.g. subclass method calling overridden one by super())
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if not REGISTRY.enabled:
+            return function(*args, **kwargs)
+        active = _measured_calls.__dict__.setdefault('keys', set())
+        if key in active:
+            return function(*args, **kwargs)
+        active.add(key)
+        try:
+            return timed_function(*args, **kwargs)
+        finally:
+            active.discard(key)
+    return wrapper
+
+
+def instrument_methods(name: str, help_text: str = '', label: str = 'method') -> Callable:
+    """ class decorator applying `timed` to all public methods defined in class body
+        (method name is the value of `label`)
+
+    Subclass overriding instrumented methods has to be decorated too - overriding method
+    and overridden one called by super() are measured once.
+    """
+    def decorator(cls: type) -> type:
+        for attribute, value in list(vars(cls).items()):
+            # static/class methods and properties are left as they are
+            if attribute.startswith('_') or not isinstance(value, FunctionType):
+                continue
+            timed_method = timed(name, help_text, **{label: attribute})(value)
+            setattr(cls, attribute, _outermost(value, timed_method, (name, attribute)))
+        return cls
+    return decorator
+
+
+@contextmanager
+def profile(filename: str = None, sort: str = 'cumulative', limit: int = 30) -> Iterator:
+    """ runs cProfile around block
+
+    Args:
+        filename (str): file for raw stats (pstats/snakeviz), None - top `limit` functions are printed
+        sort (str): sort key of printed stats
+        limit (int): number of printed functions
+    """
+    from cProfile import Profile
+    from io import StringIO
+    from pstats import Stats
+
+    profiler = Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if filename is not None:
+            profiler.dump_stats(filename)
+        else:
+            output = StringIO()
+            Stats(profiler, stream=output).sort_stats(sort).print_stats(limit)
+            print(output.getvalue())
@@ -0,0 +1,145 @@
+""" Versioned schema migrations from sql scripts in Database dir
+
+Script `NN_description.sql` is migration of version NN. Applied versions are
+recorded in table schema_version, every pending script runs in one transaction
+together with its record, so failed script leaves no changes behind.
+
+Usage:
+    python migrations.py --database database.db
+"""
+from argparse import ArgumentParser
+from os import listdir, path
+from re import fullmatch
+from sqlite3 import Connection, OperationalError, connect
+from typing import NamedTuple
+
+MIGRATIONS_DIR = path.join(path.dirname(path.abspath(__file__)), 'Database')
+
+# dbs created before schema_version existed: queries returning a row when changes
+# of the (not re-runnable) script are already in db, other scripts are simply re-run
+LEGACY_CHECKS = {
+    1: "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books'",
+    2: "SELECT 1 FROM pragma_foreign_key_list('hirings')",
+}
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    filename: str
+
+
+def find_migrations(directory: str = MIGRATIONS_DIR) -> list:
+    """ function returns migrations from directory sorted by version
+
+    Returns:
+        list: list of objects type Migration (files not named NN_description.sql are skipped)
+    """
+    migrations = []
+    for filename in listdir(directory):
+        match = fullmatch(r'(\d+)_\w+\.sql', filename)
+        if match:
+            migrations.append(Migration(int(match[1]), filename, path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def current_version(connection: Connection) -> int:
+    """ function returns the highest applied version (one lookup of primary key)
+
+    Returns:
+        int: version, 0 if nothing was applied, None if db has no schema_version table
+    """
+    try:
+        return connection.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+    except OperationalError:
+        return None
+
+
+def _create_schema_version(connection: Connection, migrations: list) -> None:
+    """ function creates schema_version table, in legacy db records scripts which were already run """
+    legacy = connection.execute(LEGACY_CHECKS[1]).fetchone() is not None
+    with connection:
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        if legacy:
+            connection.executemany(
+                'INSERT OR IGNORE INTO schema_version (version, name) VALUES (?, ?)',
+                ((migration.version, migration.name) for migration in migrations
+                 if migration.version in LEGACY_CHECKS
+                 and connection.execute(LEGACY_CHECKS[migration.version]).fetchone() is not None))
+
+
+def apply_migration(connection: Connection, migration: Migration) -> bool:
+    """ function runs script of migration and records it in one transaction
+
+    Returns:
+        bool: True if applied, False if other process applied it in the meantime
+    """
+    with open(migration.filename, mode='r', encoding='utf8') as sql_script:
+        script = sql_script.read()
+    connection.commit()
+    try:
+        # record goes first - other process applying the same version fails at once
+        connection.executescript(
+            'BEGIN IMMEDIATE;\n'
+            f"INSERT INTO schema_version (version, name) VALUES ({migration.version}, '{migration.name}');\n"
+            f'{script}\n;')
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        applied = connection.execute(
+            'SELECT 1 FROM schema_version WHERE version = ?', (migration.version,)).fetchone()
+        if applied is None:
+            raise
+        return False
+    return True
+
+
+def migrate(connection: Connection, directory: str = MIGRATIONS_DIR, until: int = None) -> list:
+    """ function applies pending migrations
+
+    Up-to-date db is recognized by one query, scripts are read only when they are pending.
+
+    Args:
+        connection (Connection): connection to db
+        directory (str): directory with sql scripts
+        until (int): only migrations with lower version are applied
+
+    Returns:
+        list: applied migrations
+    """
+    migrations = find_migrations(directory)
+    if until is not None:
+        migrations = [migration for migration in migrations if migration.version < until]
+    version = current_version(connection)
+    if not migrations or (version is not None and version >= migrations[-1].version):
+        return []
+
+    if version is None:
+        _create_schema_version(connection, migrations)
+    applied_versions = {row[0] for row in connection.execute('SELECT version FROM schema_version')}
+    return [
+        migration for migration in migrations
+        if migration.version not in applied_versions and apply_migration(connection, migration)
+    ]
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Applies pending migrations from Database dir')
+    parser.add_argument('--database', default='database.db')
+    args = parser.parse_args()
+
+    connection = connect(args.database)
+    for migration in migrate(connection):
+        print(f'Zastosowano: {migration.name}')
+    print(f'Wersja schematu: {current_version(connection)}')
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
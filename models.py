@@ -1,9 +1,34 @@
-""" definition of all models used in app """
+""" definition of all models used in app
+
+models use __slots__ (no per-instance __dict__) and compare by value,
+so equal objects can be shared (interned) between many query results
+"""
 from datetime import datetime
 
 
+def normalize_email(email: str) -> str:
+    """ function returns email without surrounding whitespace and with lowercase domain
+        (local part before '@' may be case sensitive, so it is left as it is)
+    """
+    local_part, at, domain = email.strip().rpartition('@')
+    return f'{local_part}@{domain.lower()}' if at else domain
+
+
+def is_valid_email(email: str) -> bool:
+    """ function checks if email is valid:
+        - contains '@'
+        - contains '.' on 3rd or 4th position from the end
+
+    Returns:
+        bool
+    """
+    return '@' in email and '.' in email[-4:-2]
+
+
 class User:
     """ class defines user (including name and email)"""
+    __slots__ = ('name', 'email')
+
     def __init__(self, name: str, email: str) -> None:
         self.name = name
         self.email = email
@@ -11,22 +36,29 @@ class User:
     def __repr__(self) -> str:
         return f'{self.name} ({self.email})'
 
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, User):
+            return NotImplemented
+        return self.name == other.name and self.email == other.email
+
+    def __hash__(self) -> int:
+        return hash((self.name, self.email))
+
     def is_valid_email(self) -> bool:
-        """ method checks if email is valid:
-            - contains '@'
-            - contains '.' on 3rd or 4th position from the end
+        """ method checks if email is valid (see is_valid_email function)
+
+        Users read from db were validated when they were saved - use users.email_valid instead.
 
         Returns:
             bool
         """
-        has_at = bool('@' in self.email)
-        has_dot_in_domain = bool('.' in self.email[-4:-2])
-
-        return all([has_at, has_dot_in_domain])
+        return is_valid_email(self.email)
 
 
 class Book:
     """ class defines book (including title and author)"""
+    __slots__ = ('title', 'author')
+
     def __init__(self, title: str, author: str) -> None:
         self.title = title
         self.author = author
@@ -34,13 +66,40 @@ class Book:
     def __repr__(self) -> str:
         return f'{self.author}: "{self.title}"'
 
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Book):
+            return NotImplemented
+        return self.title == other.title and self.author == other.author
+
+    def __hash__(self) -> int:
+        return hash((self.title, self.author))
+
 
 class Hiring:
-    """ class defines hiring (including user, book and time to returned)"""
-    def __init__(self, user: User, book: Book, returned_to: datetime) -> None:
+    """ class defines hiring (including user, book and time to returned)
+
+    `hiring_id` is set for hirings read from db, it isn't compared by __eq__
+    """
+    __slots__ = ('user', 'book', 'returned_to', 'hiring_id')
+
+    def __init__(self, user: User, book: Book, returned_to: datetime, hiring_id: int = None) -> None:
         self.user = user
         self.book = book
         self.returned_to = returned_to
+        self.hiring_id = hiring_id
+
+    def __repr__(self) -> str:
+        return f'{self.user} - {self.book} ({self.returned_to})'
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Hiring):
+            return NotImplemented
+        return (self.user == other.user
+                and self.book == other.book
+                and self.returned_to == other.returned_to)
+
+    def __hash__(self) -> int:
+        return hash((self.user, self.book, self.returned_to))
 
     def is_out_of_date(self) -> bool:
         """ method checks if book is out of date
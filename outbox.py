@@ -0,0 +1,204 @@
+""" Durable queue (SQLite table `outbox`) of reminder emails
+
+Reminders are enqueued in one transaction by `Outbox.enqueue_reminders` and
+sent by separate process (worker.py). Delivery is at-least-once: claimed
+message becomes invisible for `visibility_timeout` seconds and returns to
+queue if worker doesn't acknowledge it (e.g. crashes); after `max_attempts`
+failures message is moved to dead letters (status 'dead').
+"""
+from datetime import datetime, timedelta
+from json import loads
+from time import time
+from typing import Iterable, NamedTuple
+
+from controllers import Database, pending_reminders_cte, to_timestamp
+
+PENDING = 'pending'
+DEAD = 'dead'
+
+
+class OutboxMessage(NamedTuple):
+    """ message claimed from outbox """
+    id: int
+    kind: str
+    recipient: str
+    hirings_ids: list
+    attempts: int
+
+
+class Outbox:
+    """ class manages outbox table
+
+    Args:
+        database (Database): db with outbox table
+        visibility_timeout (float): seconds for which claimed message is hidden from other workers
+        max_attempts (int): failed attempts after which message becomes dead letter
+        retry_delay (float): delay before first retry, doubled by every next retry
+    """
+
+    def __init__(self, database: Database, visibility_timeout: float = 300,
+                 max_attempts: int = 5, retry_delay: float = 60) -> None:
+        self.database = database
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def enqueue_reminders(self, as_of: datetime = None, since: datetime = None,
+                          digest: bool = False, interval: timedelta = None) -> int:
+        """ method enqueues reminders for all pending hirings (see Database.get_pending_reminders)
+
+        Everything is done by SQLite in one transaction: messages are added to outbox,
+        hirings are marked as reminded and reminder run is saved.
+
+        Args:
+            as_of (datetime): point in time to compare with, default now
+            since (datetime): high-water mark of previous run
+            digest (bool): one message per user instead of one message per hiring
+            interval (timedelta): time after reminder is repeated, None - never repeated
+
+        Returns:
+            int: number of enqueued messages
+        """
+        if as_of is None:
+            as_of = datetime.now()
+        parameters = {
+            'as_of': to_timestamp(as_of),
+            'since': to_timestamp(since),
+            'now': time(),
+            'created_at': datetime.now(),
+            'next_reminder_at': to_timestamp(as_of + interval) if interval is not None else None,
+        }
+        if digest:
+            select_messages = '''
+                SELECT 'digest', email, json_group_array(id), :now, :created_at
+                FROM temp.pending_reminders GROUP BY user_id
+            '''
+        else:
+            select_messages = '''
+                SELECT 'reminder', email, json_array(id), :now, :created_at
+                FROM temp.pending_reminders
+            '''
+
+        connection = self.database.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DROP TABLE IF EXISTS temp.pending_reminders')
+            connection.execute('CREATE TEMP TABLE pending_reminders AS ' + pending_reminders_cte(since) + '''
+                SELECT p.id, h.user_id, u.email
+                FROM pending p
+                JOIN hirings h ON h.id = p.id
+                JOIN users u ON u.id = h.user_id
+            ''', parameters)
+            cursor = connection.execute('''
+                INSERT INTO outbox (kind, recipient, hirings_ids, available_at, created_at)
+            ''' + select_messages, parameters)
+            enqueued = cursor.rowcount
+            connection.execute('''
+                INSERT INTO reminders (hiring_id, last_sent_at, next_reminder_at, sent_count)
+                SELECT id, :as_of, :next_reminder_at, 1 FROM temp.pending_reminders WHERE true
+                ON CONFLICT (hiring_id) DO UPDATE SET
+                    last_sent_at = excluded.last_sent_at,
+                    next_reminder_at = excluded.next_reminder_at,
+                    sent_count = sent_count + 1
+            ''', parameters)
+            # `sent` of run counts enqueued hirings, actual delivery is tracked in outbox
+            connection.execute('''
+                INSERT INTO reminder_runs (overdue_until, sent, failed, hirings_until)
+                SELECT :as_of, COUNT(*), 0, (SELECT COALESCE(MAX(id), 0) FROM hirings) FROM temp.pending_reminders
+            ''', parameters)
+            connection.execute('DROP TABLE temp.pending_reminders')
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        return enqueued
+
+    def claim(self, limit: int = 100) -> list:
+        """ method takes up to `limit` available messages and hides them for `visibility_timeout`
+
+        Available messages already claimed `max_attempts` times are moved to dead letters.
+
+        Returns:
+            list: list of objects type OutboxMessage
+        """
+        now = time()
+        with self.database.connection as connection:
+            # claimed `max_attempts` times, but never acknowledged nor failed (e.g. worker crashed on it)
+            connection.execute('''
+                UPDATE outbox SET status = ?, last_error = COALESCE(last_error, 'max attempts exceeded')
+                WHERE status = ? AND available_at <= ? AND attempts >= ?
+            ''', (DEAD, PENDING, now, self.max_attempts))
+            rows = connection.execute('''
+                UPDATE outbox SET available_at = ?, claimed_at = ?, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM outbox
+                    WHERE status = ? AND available_at <= ?
+                    ORDER BY available_at
+                    LIMIT ?
+                )
+                RETURNING id, kind, recipient, hirings_ids, attempts
+            ''', (now + self.visibility_timeout, now, PENDING, now, limit)).fetchall()
+        return [
+            OutboxMessage(message_id, kind, recipient, loads(hirings_ids), attempts)
+            for message_id, kind, recipient, hirings_ids, attempts in rows
+        ]
+
+    def ack(self, messages_ids: Iterable[int]) -> None:
+        """ method removes sent messages """
+        with self.database.connection as connection:
+            connection.executemany(
+                'DELETE FROM outbox WHERE id = ?', ((message_id,) for message_id in messages_ids))
+
+    def fail(self, failures: Iterable[tuple], retry: bool = True) -> None:
+        """ method returns failed messages to queue (with backoff) or moves them to dead letters
+
+        Args:
+            failures (Iterable[tuple]): tuples (OutboxMessage, error)
+            retry (bool): False - move to dead letters regardless of attempts (permanent errors)
+        """
+        now = time()
+        rows = []
+        for message, error in failures:
+            status = DEAD if not retry or message.attempts >= self.max_attempts else PENDING
+            available_at = now + self.retry_delay * 2 ** (message.attempts - 1)
+            rows.append((status, available_at, str(error), message.id))
+        with self.database.connection as connection:
+            connection.executemany('''
+                UPDATE outbox SET status = ?, available_at = ?, claimed_at = NULL, last_error = ? WHERE id = ?
+            ''', rows)
+
+    def requeue_dead(self) -> int:
+        """ method moves dead letters back to queue
+
+        Returns:
+            int: number of requeued messages
+        """
+        with self.database.connection as connection:
+            cursor = connection.execute('''
+                UPDATE outbox SET status = ?, attempts = 0, available_at = ?, claimed_at = NULL WHERE status = ?
+            ''', (PENDING, time(), DEAD))
+        return cursor.rowcount
+
+    def next_available_at(self) -> float:
+        """ method returns time (like `time.time()`) when the earliest pending message can be claimed
+
+        Returns:
+            float: the earliest `available_at`, None when no message is pending
+        """
+        row = self.database.connection.execute(
+            'SELECT MIN(available_at) FROM outbox WHERE status = ?', (PENDING,)).fetchone()
+        return row[0]
+
+    def stats(self) -> dict:
+        """ method returns number of messages by status ('pending' - available now, 'in_flight' -
+            claimed, not acknowledged yet, 'delayed' - failed, waiting for retry)
+        """
+        row = self.database.connection.execute('''
+            SELECT
+                COUNT(*) FILTER (WHERE status = :pending AND available_at <= :now),
+                COUNT(*) FILTER (WHERE status = :pending AND available_at > :now AND claimed_at IS NOT NULL),
+                COUNT(*) FILTER (WHERE status = :pending AND available_at > :now AND claimed_at IS NULL),
+                COUNT(*) FILTER (WHERE status = :dead)
+            FROM outbox
+        ''', {'pending': PENDING, 'dead': DEAD, 'now': time()}).fetchone()
+        return dict(zip(('pending', 'in_flight', 'delayed', 'dead'), row))
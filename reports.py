@@ -0,0 +1,174 @@
+""" Statistics of hirings computed by SQLite and streamed row by row
+
+Aggregates are computed in SQL (GROUP BY, window functions), rows are written
+as soon as SQLite returns them - memory usage doesn't depend on number of hirings.
+
+    python main.py report overdue_by_user --format csv --output overdue.csv
+"""
+from csv import writer
+from datetime import datetime
+from json import dumps
+from typing import IO, Iterable, Iterator, NamedTuple
+
+from controllers import Database, to_timestamp
+
+
+class Report(NamedTuple):
+    description: str
+    columns: tuple
+    # binds `:as_of` (timestamp) and `:limit` (-1 - no limit)
+    query: str
+
+
+REPORTS = {
+    'overdue_by_user': Report(
+        'przetrzymane wypożyczenia według wypożyczających',
+        ('name', 'email', 'overdue', 'avg_days_late', 'max_days_late'),
+        '''
+        SELECT u.name, u.email, COUNT(*),
+            ROUND(AVG(:as_of - h.returned_to) / 86400.0, 1),
+            (:as_of - MIN(h.returned_to)) / 86400
+        FROM hirings h
+        JOIN users u ON u.id = h.user_id
+        WHERE h.returned_to < :as_of
+        GROUP BY h.user_id
+        ORDER BY COUNT(*) DESC, MIN(h.returned_to)
+        LIMIT :limit
+        '''),
+    'overdue_by_author': Report(
+        'wypożyczenia i przetrzymania według autorów',
+        ('author', 'hirings', 'overdue', 'overdue_percent', 'avg_days_late'),
+        '''
+        SELECT b.author, COUNT(*), SUM(h.returned_to < :as_of),
+            ROUND(100.0 * SUM(h.returned_to < :as_of) / COUNT(*), 1),
+            ROUND(AVG(CASE WHEN h.returned_to < :as_of THEN :as_of - h.returned_to END) / 86400.0, 1)
+        FROM hirings h
+        JOIN books b ON b.id = h.book_id
+        GROUP BY b.author
+        ORDER BY SUM(h.returned_to < :as_of) DESC, b.author
+        LIMIT :limit
+        '''),
+    'days_late': Report(
+        'opóźnienia według miesiąca terminu zwrotu',
+        ('month', 'overdue', 'avg_days_late', 'max_days_late', 'overdue_total'),
+        '''
+        SELECT month, overdue, avg_days_late, max_days_late,
+            SUM(overdue) OVER (ORDER BY month)
+        FROM (
+            SELECT strftime('%Y-%m', h.returned_to, 'unixepoch') AS month, COUNT(*) AS overdue,
+                ROUND(AVG(:as_of - h.returned_to) / 86400.0, 1) AS avg_days_late,
+                (:as_of - MIN(h.returned_to)) / 86400 AS max_days_late
+            FROM hirings h
+            WHERE h.returned_to < :as_of
+            GROUP BY month
+        )
+        ORDER BY month
+        LIMIT :limit
+        '''),
+    'loans_per_month': Report(
+        'wypożyczenia według miesiąca wypożyczenia',
+        ('month', 'loans', 'change', 'loans_total'),
+        '''
+        SELECT month, loans,
+            loans - LAG(loans, 1, 0) OVER (ORDER BY month),
+            SUM(loans) OVER (ORDER BY month)
+        FROM (
+            SELECT substr(created_at, 1, 7) AS month, COUNT(*) AS loans
+            FROM hirings
+            GROUP BY month
+        )
+        ORDER BY month
+        LIMIT :limit
+        '''),
+    'top_books': Report(
+        'najczęściej wypożyczane książki',
+        ('rank', 'title', 'author', 'loans'),
+        '''
+        SELECT RANK() OVER (ORDER BY loans DESC), b.title, b.author, loans
+        FROM (SELECT book_id, COUNT(*) AS loans FROM hirings GROUP BY book_id) h
+        JOIN books b ON b.id = h.book_id
+        ORDER BY loans DESC, b.id
+        LIMIT :limit
+        '''),
+}
+
+
+def run_report(database: Database, name: str, as_of: datetime = None, limit: int = None) -> Iterator[tuple]:
+    """ function yields rows of report (see REPORTS) fetched one by one from db
+
+    Args:
+        database (Database): db with hirings
+        name (str): key of REPORTS
+        as_of (datetime): hirings with returned_to before this point are overdue, default now
+        limit (int): max number of rows, None - all rows
+
+    Yields:
+        tuple: values of report columns
+    """
+    params = {
+        'as_of': to_timestamp(as_of if as_of is not None else datetime.now()),
+        'limit': limit if limit is not None else -1,
+    }
+    cursor = database.connection.execute(REPORTS[name].query, params)
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def write_csv(rows: Iterable[tuple], columns: tuple, file: IO) -> int:
+    """ function writes header and rows as CSV
+
+    Returns:
+        int: number of written rows
+    """
+    csv = writer(file)
+    csv.writerow(columns)
+    count = 0
+    for count, row in enumerate(rows, 1):
+        csv.writerow(row)
+    return count
+
+
+def write_jsonl(rows: Iterable[tuple], columns: tuple, file: IO) -> int:
+    """ function writes every row as JSON object in separate line
+
+    Returns:
+        int: number of written rows
+    """
+    count = 0
+    for count, row in enumerate(rows, 1):
+        file.write(dumps(dict(zip(columns, row)), ensure_ascii=False))
+        file.write('\n')
+    return count
+
+
+def write_text(rows: Iterable[tuple], columns: tuple, file: IO, width: int = 16) -> int:
+    """ function writes rows as columns of fixed width (unlike tabulate it doesn't need
+        all rows to compute widths, so rows are printed as they come)
+
+    Returns:
+        int: number of written rows
+    """
+    widths = [max(width, len(column)) for column in columns]
+    file.write('  '.join(column.ljust(size) for column, size in zip(columns, widths)).rstrip() + '\n')
+    file.write('  '.join('-' * size for size in widths) + '\n')
+    count = 0
+    for count, row in enumerate(rows, 1):
+        cells = ('' if value is None else str(value) for value in row)
+        file.write('  '.join(cell[:size].ljust(size) for cell, size in zip(cells, widths)).rstrip() + '\n')
+    return count
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'text': write_text}
+
+
+def export_report(database: Database, name: str, file: IO, file_format: str = 'text',
+                  as_of: datetime = None, limit: int = None) -> int:
+    """ function streams report to file in given format ('csv', 'jsonl' or 'text')
+
+    Returns:
+        int: number of written rows
+    """
+    rows = run_report(database, name, as_of, limit)
+    return WRITERS[file_format](rows, REPORTS[name].columns, file)
@@ -0,0 +1,228 @@
+""" Daemon sending reminders as soon as hirings become overdue
+
+Instead of rescanning hirings periodically, scheduler keeps a min-heap of upcoming
+deadlines (`hirings.returned_to` and `reminders.next_reminder_at`) and sleeps until
+the earliest one passes. Deadlines are loaded incrementally:
+    - by time window - deadlines from the next `lookahead` are read by index range,
+    - by change marker - `PRAGMA data_version` changes only when another connection
+      commits to db, then only hirings with id above high-water mark are read.
+
+Heap only decides when to wake up - due reminders are selected by
+`Outbox.enqueue_reminders` (the same query as menu option 7), so heap may hold
+stale deadlines. Hirings are never updated by app, so new ids cover all changes.
+
+Usage:
+    python scheduler.py --database database.db --digest
+"""
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from heapq import heappop, heappush
+from threading import Event
+from time import time
+from typing import Callable
+
+from controllers import Database, from_timestamp, to_timestamp
+from dispatcher import DispatchReport
+from mailer import EmailSender
+from outbox import Outbox
+from worker import run_worker
+
+
+class Scheduler:
+    """ class enqueues reminders of hirings at their deadlines and sends them
+
+    Args:
+        database (Database): db with hirings
+        outbox (Outbox): queue of reminders, drained after every enqueue
+        sender_factory (Callable): returns new EmailSender
+        digest (bool): one message per user instead of one message per hiring
+        interval (timedelta): time after reminder is repeated, None - never repeated
+        lookahead (timedelta): length of time window which deadlines are kept in heap
+        check_interval (float): max seconds between checks of change marker (delay of
+            hirings added by other processes which are already overdue)
+        concurrency (int): number of parallel SMTP sessions
+        rate (float): max messages per second (None - unlimited)
+        max_backoff (float): max seconds of waiting after failed tick (wait is doubled by every failure)
+    """
+
+    def __init__(self, database: Database, outbox: Outbox, sender_factory: Callable = EmailSender,
+                 digest: bool = False, interval: timedelta = timedelta(days=7),
+                 lookahead: timedelta = timedelta(days=1), check_interval: float = 1.0,
+                 concurrency: int = 4, rate: float = None, max_backoff: float = 60.0) -> None:
+        self.database = database
+        self.outbox = outbox
+        self.sender_factory = sender_factory
+        self.digest = digest
+        self.interval = interval
+        self.lookahead = lookahead
+        self.check_interval = check_interval
+        self.concurrency = concurrency
+        self.rate = rate
+        self.max_backoff = max_backoff
+        self.report = DispatchReport()
+        self.deadlines = []
+        self.loaded_until = None
+        self.last_id = 0
+        self.data_version = None
+        self.retry_at = None
+        self._stopped = Event()
+
+    def _data_changed(self) -> bool:
+        """ method checks if other connection committed to db since last call """
+        data_version, = self.database.connection.execute('PRAGMA data_version').fetchone()
+        changed = data_version != self.data_version
+        self.data_version = data_version
+        return changed
+
+    def _load_window(self, until: int) -> None:
+        """ method pushes distinct deadlines from `loaded_until` to `until` (excluded) to heap """
+        rows = self.database.connection.execute('''
+            SELECT returned_to FROM hirings WHERE returned_to >= :low AND returned_to < :high
+            UNION
+            SELECT next_reminder_at FROM reminders WHERE next_reminder_at >= :low AND next_reminder_at < :high
+        ''', {'low': self.loaded_until, 'high': until})
+        for deadline, in rows:
+            heappush(self.deadlines, deadline)
+        self.loaded_until = until
+
+    def _load_new_hirings(self) -> None:
+        """ method pushes deadlines of hirings added after high-water mark (later ones come with window) """
+        rows = self.database.connection.execute(
+            'SELECT id, returned_to FROM hirings WHERE id > ? ORDER BY id', (self.last_id,))
+        for hiring_id, returned_to in rows:
+            self.last_id = hiring_id
+            if returned_to < self.loaded_until:
+                heappush(self.deadlines, returned_to)
+
+    def _send(self) -> None:
+        """ method sends all available messages of outbox """
+        # when sending fails, next tick tries again
+        self.retry_at = time()
+        report = run_worker(self.database, self.outbox, self.sender_factory,
+                            concurrency=self.concurrency, rate=self.rate, drain=True)
+        self.report.sent += report.sent
+        self.report.failed += report.failed
+        self.report.elapsed += report.elapsed
+        self.retry_at = self.outbox.next_available_at()
+
+    def _enqueue(self, as_of: datetime, since: datetime) -> int:
+        enqueued = self.outbox.enqueue_reminders(as_of, since, digest=self.digest, interval=self.interval)
+        if enqueued and self.interval is not None:
+            next_reminder_at = to_timestamp(as_of + self.interval)
+            if next_reminder_at < self.loaded_until:
+                heappush(self.deadlines, next_reminder_at)
+        return enqueued
+
+    def start(self, now: datetime = None) -> int:
+        """ method loads deadlines and enqueues reminders missed while scheduler wasn't running
+
+        Returns:
+            int: number of enqueued messages
+        """
+        if now is None:
+            now = datetime.now()
+        self._data_changed()
+        # high-water mark is read first - hirings added meanwhile are loaded by the next tick
+        self.last_id, = self.database.connection.execute('SELECT COALESCE(MAX(id), 0) FROM hirings').fetchone()
+        self.loaded_until = to_timestamp(now)
+        self._load_window(to_timestamp(now + self.lookahead))
+        enqueued = self._enqueue(now, self.database.get_last_reminder_run())
+        self._send()
+        return enqueued
+
+    def tick(self, now: datetime = None) -> float:
+        """ method enqueues and sends reminders of deadlines which passed
+
+        Returns:
+            float: seconds to wait before next tick
+        """
+        if now is None:
+            now = datetime.now()
+        as_of = to_timestamp(now)
+        if self._data_changed():
+            self._load_new_hirings()
+            self.retry_at = self.outbox.next_available_at()
+        if as_of >= self.loaded_until:
+            self._load_window(to_timestamp(now + self.lookahead))
+
+        # hiring is overdue when returned_to < as_of, so deadline is due one second after it
+        due = []
+        while self.deadlines and self.deadlines[0] < as_of:
+            due.append(heappop(self.deadlines))
+        if due:
+            try:
+                # hirings added with returned_to before last run are found by id (see pending_reminders_cte)
+                self._enqueue(now, self.database.get_last_reminder_run())
+            except BaseException:
+                for deadline in due:
+                    heappush(self.deadlines, deadline)
+                raise
+        if due or (self.retry_at is not None and self.retry_at <= time()):
+            self._send()
+
+        wake_at = self.loaded_until
+        if self.deadlines:
+            wake_at = min(wake_at, self.deadlines[0] + 1)
+        delay = (from_timestamp(wake_at) - now).total_seconds()
+        if self.retry_at is not None:
+            delay = min(delay, self.retry_at - time())
+        return max(min(delay, self.check_interval), 0)
+
+    def run(self) -> DispatchReport:
+        """ method ticks until `stop` is called
+
+        Errors of single tick (e.g. locked db) are printed and tick is repeated after
+        backoff, so daemon keeps running.
+
+        Returns:
+            DispatchReport: counters of all sent messages
+        """
+        started = False
+        failures = 0
+        while not self._stopped.is_set():
+            try:
+                if started:
+                    delay = self.tick()
+                else:
+                    self.start()
+                    started, delay = True, 0
+                failures = 0
+            except Exception as error:
+                failures += 1
+                delay = min(self.check_interval * 2 ** failures, self.max_backoff)
+                print(f'Błąd schedulera ({failures} z rzędu): {error!r}, '
+                      f'ponowna próba za {delay:.1f} s', flush=True)
+            self._stopped.wait(delay)
+        return self.report
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Sends reminders when hirings become overdue')
+    parser.add_argument('--database', default='database.db')
+    parser.add_argument('--digest', action='store_true', help='one email per user')
+    parser.add_argument('--interval-days', type=float, default=7, help='0 - reminder is never repeated')
+    parser.add_argument('--lookahead-hours', type=float, default=24)
+    parser.add_argument('--check-interval', type=float, default=1.0)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=None, help='max messages per second')
+    args = parser.parse_args()
+
+    database = Database(args.database)
+    scheduler = Scheduler(
+        database, Outbox(database), EmailSender, args.digest,
+        timedelta(days=args.interval_days) if args.interval_days else None,
+        timedelta(hours=args.lookahead_hours), args.check_interval, args.concurrency, args.rate)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f'Podsumowanie - {scheduler.report}')
+        database.close_connection()
+
+
+if __name__ == '__main__':
+    main()
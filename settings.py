@@ -0,0 +1,37 @@
+""" Configuration of app read from .env file (see example.env) """
+from functools import lru_cache
+from typing import NamedTuple
+
+from dotenv import dotenv_values
+
+
+class Settings(NamedTuple):
+    sender_name: str = None
+    email: str = None
+    password: str = None
+    smtp_server: str = None
+    smtp_port: int = None
+    locale: str = None
+
+
+@lru_cache(maxsize=None)
+def load_settings(env_path: str = '.env') -> Settings:
+    """ function parses .env file once, next calls with the same path return cached settings
+        (`load_settings.cache_clear()` makes next call read file again)
+
+    Args:
+        env_path (str): path to .env file (missing file or keys give None values)
+
+    Returns:
+        Settings: values of file
+    """
+    values = dotenv_values(env_path)
+    smtp_port = values.get('smtp_port')
+    return Settings(
+        sender_name=values.get('sender_name'),
+        email=values.get('email'),
+        password=values.get('password'),
+        smtp_server=values.get('smtp_server'),
+        smtp_port=int(smtp_port) if smtp_port else None,
+        locale=values.get('locale'),
+    )
@@ -0,0 +1,224 @@
+""" Reminder run split into shards processed by pool of processes
+
+Pending hirings are divided into ranges of `hirings.id` or `hirings.user_id`
+(with similar number of hirings each). Every shard is handled by separate
+process with its own Database connection and its own SMTP sessions
+(dispatcher.py), so rendering and sending scale over CPU cores. Shards save
+state of their hirings themselves; high-water mark of the run is moved only
+when all shards finished.
+
+Usage:
+    python sharding.py --database database.db --shards 8 --by user_id --digest
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from time import monotonic
+from typing import Callable
+
+from controllers import Database, SHARD_KEYS, pending_reminders_cte, to_timestamp
+from dispatcher import DigestDispatcher, DispatchReport, ReminderDispatcher
+from mailer import EmailSender
+
+SQLITE_MAX_INTEGER = 2 ** 63 - 1
+
+
+@dataclass(repr=False)
+class ShardedReport(DispatchReport):
+    """ DispatchReport merged from all shards (`shards` - list of tuples (shard, DispatchReport)) """
+    shards: list = field(default_factory=list)
+
+    def add(self, shard: tuple, report: DispatchReport) -> None:
+        self.shards.append((shard, report))
+        self.sent += report.sent
+        self.failed += report.failed
+        self.failures += report.failures
+
+
+def get_shards(database: Database, shards: int, shard_key: str = 'id',
+               as_of: datetime = None, since: datetime = None) -> list:
+    """ function splits pending hirings into ranges of `shard_key` with similar number of hirings
+
+    Args:
+        database (Database): db
+        shards (int): max number of shards
+        shard_key (str): 'id' or 'user_id' (digests need 'user_id', so user isn't split between shards)
+        as_of (datetime): point in time to compare with, default now
+        since (datetime): high-water mark of previous run
+
+    Returns:
+        list: tuples (shard_key, low, high) for Database.get_pending_reminders (empty if nothing is pending)
+    """
+    if shard_key not in SHARD_KEYS:
+        raise ValueError(f'Hirings can be sharded only by: {", ".join(SHARD_KEYS)}')
+    if as_of is None:
+        as_of = datetime.now()
+
+    rows = database.connection.execute(pending_reminders_cte(since) + f'''
+        SELECT MAX(key) FROM (
+            SELECT h.{shard_key} AS key, NTILE(:shards) OVER (ORDER BY h.{shard_key}) AS tile
+            FROM pending p
+            JOIN hirings h ON h.id = p.id
+        )
+        GROUP BY tile
+    ''', {'as_of': to_timestamp(as_of), 'since': to_timestamp(since), 'shards': shards}).fetchall()
+
+    # tiles can end on the same key (e.g. user with many hirings), ranges mustn't overlap;
+    # outer ranges are open, so no pending hiring is left out
+    highs = sorted({high for (high,) in rows})
+    ranges = []
+    low = 0
+    for high in highs[:-1]:
+        ranges.append((shard_key, low, high))
+        low = high + 1
+    if highs:
+        ranges.append((shard_key, low, SQLITE_MAX_INTEGER))
+    return ranges
+
+
+def run_shard(database_name: str, shard: tuple, as_of: datetime, since: datetime = None,
+              digest: bool = False, interval: timedelta = None, sender_factory: Callable = EmailSender,
+              concurrency: int = 2, rate: float = None) -> DispatchReport:
+    """ function sends reminders of one shard and saves state of its hirings (runs in worker process)
+
+    Returns:
+        DispatchReport: counters of shard (failures as tuples (hiring_id, error message))
+    """
+    database = Database(database_name)
+    sent, failed, failures = [], [], []
+
+    def hirings_ids(item) -> list:
+        hirings = item[1] if digest else [item]
+        return [hiring.hiring_id for hiring in hirings]
+
+    def collect(item, error):
+        if error is None:
+            sent.extend(hirings_ids(item))
+        else:
+            failed.extend(hirings_ids(item))
+            failures.extend((hiring_id, str(error)) for hiring_id in hirings_ids(item))
+
+    try:
+        if digest:
+            dispatcher_class = DigestDispatcher
+            items = database.get_pending_reminders_by_user(as_of, since, shard)
+        else:
+            dispatcher_class = ReminderDispatcher
+            items = database.get_pending_reminders(as_of, since, shard)
+        dispatcher = dispatcher_class(sender_factory, concurrency=concurrency, rate=rate)
+        report = dispatcher.run(items, callback=collect)
+    finally:
+        # reminders sent before shard crashed are saved too, so they aren't sent again
+        try:
+            database.record_reminder_run(as_of, sent, failed, interval, mark_run=False)
+        finally:
+            database.close_connection()
+
+    # exceptions and models are replaced by plain values - report is sent back to parent process
+    return DispatchReport(len(sent), len(failed), failures, report.elapsed)
+
+
+def fail_shard(database_name: str, shard: tuple, as_of: datetime, since: datetime,
+               error: Exception) -> DispatchReport:
+    """ function records hirings of crashed shard which are still pending as failed
+        (they are retried by next run, like failed reminders)
+
+    Returns:
+        DispatchReport: failures of shard
+    """
+    database = Database(database_name)
+    try:
+        failed = [hiring.hiring_id for hiring in database.get_pending_reminders(as_of, since, shard)]
+        database.record_reminder_run(as_of, [], failed, mark_run=False)
+    finally:
+        database.close_connection()
+    return DispatchReport(0, len(failed), [(hiring_id, str(error)) for hiring_id in failed])
+
+
+def run_sharded(database_name: str, shards: int = 4, shard_key: str = 'id', digest: bool = False,
+                interval: timedelta = None, sender_factory: Callable = EmailSender,
+                concurrency: int = 2, rate: float = None, callback: Callable = None) -> ShardedReport:
+    """ function runs reminder job split into shards processed in parallel processes
+
+    Args:
+        database_name (str): path to db file (every process opens own connection)
+        shards (int): number of shards (and processes)
+        shard_key (str): 'id' or 'user_id' ('user_id' is forced for digests)
+        digest (bool): one email per user instead of one email per hiring
+        interval (timedelta): time after reminder is repeated, None - never repeated
+        sender_factory (Callable): returns new EmailSender (must be picklable)
+        concurrency (int): SMTP sessions per process
+        rate (float): max messages per second of whole run (split between shards)
+        callback (Callable): called as callback(shard, report) after every finished shard
+
+    Shard which crashed (e.g. lost db connection) doesn't stop the run - its hirings
+    still pending are recorded as failed and the run is marked as for any other failures.
+
+    Returns:
+        ShardedReport: counters merged from all shards
+    """
+    if digest:
+        shard_key = 'user_id'
+    database = Database(database_name)
+    try:
+        as_of = datetime.now()
+        since = database.get_last_reminder_run()
+        hirings_until = database.get_last_hiring_id()
+        ranges = get_shards(database, shards, shard_key, as_of, since)
+    finally:
+        database.close_connection()
+
+    report = ShardedReport()
+    start = monotonic()
+    if ranges:
+        shard_rate = rate / len(ranges) if rate else None
+        # spawn - SQLite connections mustn't be inherited by forked processes
+        with ProcessPoolExecutor(len(ranges), mp_context=get_context('spawn')) as executor:
+            futures = {
+                executor.submit(run_shard, database_name, shard, as_of, since, digest, interval,
+                                sender_factory, concurrency, shard_rate): shard
+                for shard in ranges
+            }
+            for future in as_completed(futures):
+                try:
+                    shard_report = future.result()
+                except Exception as error:
+                    shard_report = fail_shard(database_name, futures[future], as_of, since, error)
+                report.add(futures[future], shard_report)
+                if callback is not None:
+                    callback(futures[future], shard_report)
+    report.elapsed = monotonic() - start
+
+    database = Database(database_name)
+    try:
+        database.mark_reminder_run(as_of, report.sent, report.failed, hirings_until)
+    finally:
+        database.close_connection()
+    return report
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Reminder run split into shards processed by pool of processes')
+    parser.add_argument('--database', default='database.db')
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--by', choices=SHARD_KEYS, default='id', dest='shard_key')
+    parser.add_argument('--digest', action='store_true', help='one email per user (implies --by user_id)')
+    parser.add_argument('--interval-days', type=float, default=7, help='0 - reminders are not repeated')
+    parser.add_argument('--concurrency', type=int, default=2, help='SMTP sessions per process')
+    parser.add_argument('--rate', type=float, default=None, help='max messages per second')
+    args = parser.parse_args()
+
+    def show_shard(shard, shard_report):
+        shard_key, low, high = shard
+        print(f'{shard_key} {low}-{high}: {shard_report}', flush=True)
+
+    interval = timedelta(days=args.interval_days) if args.interval_days else None
+    report = run_sharded(args.database, args.shards, args.shard_key, args.digest, interval,
+                         EmailSender, args.concurrency, args.rate, callback=show_shard)
+    print(f'Podsumowanie ({len(report.shards)} shardów) - {report}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+""" Templates of reminder emails
+
+Templates use `$name` placeholders (like string.Template). Every template is
+compiled once (to str.format pattern with CRLF line endings) and cached;
+MessageRenderer additionally prepares encoded headers common for all messages
+of one sender, so rendering single message is mostly one format_map call.
+"""
+from email.charset import Charset
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import formataddr, formatdate
+from functools import lru_cache
+from itertools import count
+from os import getpid
+from random import getrandbits
+from re import compile as compile_regex
+from string import Template
+from time import time
+from typing import Iterable, NamedTuple
+
+from models import Hiring, User
+
+DEFAULT_LOCALE = 'pl'
+
+_SPECIALS = compile_regex(r'[][\\()<>@,:;".]')
+_LINE_BREAKS = compile_regex(r'[\r\n]+')
+
+DATE_FORMATS = {
+    'pl': '%d.%m.%Y',
+    'en': '%Y-%m-%d',
+}
+
+# (name, locale): (subject, body, item) - item is used for every hiring listed in body as $items
+TEMPLATES = {
+    ('reminder', 'pl'): (
+        'Czas zwrócić moją książkę',
+        '''Hej $name!
+Może Ci umkneło, ale $returned_to powinieneś zwrócić moją książkę $title (autorstwa $author)
+
+Będę wdzięczny za zwrot.
+
+Pozdrawiam,
+$sender_name
+''',
+        ''),
+    ('reminder', 'en'): (
+        'Time to return my book',
+        '''Hi $name!
+You may have missed it, but you should have returned my book $title (by $author) on $returned_to.
+
+I will be grateful for returning it.
+
+Best regards,
+$sender_name
+''',
+        ''),
+    ('digest', 'pl'): (
+        'Czas zwrócić moje książki',
+        '''Hej $name!
+Może Ci umkneło, ale minął termin zwrotu moich książek:
+$items
+Będę wdzięczny za zwrot.
+
+Pozdrawiam,
+$sender_name
+''',
+        '- $title (autorstwa $author), termin zwrotu: $returned_to\n'),
+    ('digest', 'en'): (
+        'Time to return my books',
+        '''Hi $name!
+You may have missed it, but these books of mine are overdue:
+$items
+I will be grateful for returning them.
+
+Best regards,
+$sender_name
+''',
+        '- $title (by $author), due: $returned_to\n'),
+}
+
+
+def compile_template(source: str) -> str:
+    """ function converts `$name` template to str.format pattern with CRLF line endings
+
+    Args:
+        source (str): template in string.Template syntax
+
+    Returns:
+        str: pattern for str.format_map
+    """
+    parts = []
+    position = 0
+    for match in Template.pattern.finditer(source):
+        parts.append(source[position:match.start()].replace('{', '{{').replace('}', '}}'))
+        position = match.end()
+        if match.group('escaped') is not None:
+            parts.append('$')
+            continue
+        name = match.group('named') or match.group('braced')
+        if name is None:
+            raise ValueError(f'Invalid placeholder in template: {source!r}')
+        parts.append(f'{{{name}}}')
+    parts.append(source[position:].replace('{', '{{').replace('}', '}}'))
+    return ''.join(parts).replace('\r\n', '\n').replace('\n', '\r\n')
+
+
+def encode_address(email: str) -> str:
+    """ function returns email with IDNA encoded domain (e.g. 'józef@łódź.pl' -> 'józef@xn--d-uga0v4h.pl')
+
+    Non-ASCII local part stays in UTF-8 - such address can be sent only with SMTPUTF8
+    extension (see EmailSender._sendmail).
+    """
+    if email.isascii():
+        return email
+    local_part, at, domain = email.rpartition('@')
+    try:
+        domain = domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    return f'{local_part}{at}{domain}'
+
+
+def format_address(name: str, email: str) -> str:
+    """ function returns address for header (like email.utils.formataddr, fast for plain names)
+
+    Name is encoded as RFC 2047 word when needed, domain of email by IDNA (see `encode_address`).
+    Line breaks are replaced by spaces - name and email come from user input and
+    CR/LF would end the header (header injection).
+    """
+    name = _LINE_BREAKS.sub(' ', name)
+    email = encode_address(_LINE_BREAKS.sub('', email))
+    if name.isascii() and not _SPECIALS.search(name):
+        return f'{name} <{email}>'
+    if email.isascii():
+        return formataddr((name, email), charset='utf-8')
+    # formataddr accepts only ASCII addresses
+    return f'{Charset("utf-8").header_encode(name)} <{email}>'
+
+
+@lru_cache(maxsize=1024)
+def _format_date(date, date_format: str) -> str:
+    """ function formats returned_to (bounded cache - many hirings share the same date) """
+    return date.strftime(date_format)
+
+
+class EmailTemplate(NamedTuple):
+    """ compiled template """
+    subject: str
+    body: str
+    item: str
+
+
+def register_template(name: str, locale: str, subject: str, body: str, item: str = '') -> None:
+    """ function adds (or replaces) template and drops compiled templates from cache """
+    TEMPLATES[name, locale] = (subject, body, item)
+    get_template.cache_clear()
+    get_renderer.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str, locale: str = DEFAULT_LOCALE) -> EmailTemplate:
+    """ function returns compiled template (compiled once, then cached)
+
+    Raises:
+        KeyError: template doesn't exist
+    """
+    subject, body, item = TEMPLATES[name, locale]
+    return EmailTemplate(subject, compile_template(body), compile_template(item))
+
+
+class MessageRenderer:
+    """ class renders complete reminder messages (bytes ready for SMTP.sendmail)
+
+    Headers which are the same for all messages (From, Subject, MIME headers)
+    are encoded once per template, per message only To, Date, Message-ID
+    and body are rendered.
+
+    Args:
+        sender_name (str): name of sender
+        email (str): email address of sender
+        locale (str): language of templates ('pl', 'en')
+    """
+
+    def __init__(self, sender_name: str, email: str, locale: str = DEFAULT_LOCALE) -> None:
+        self.sender_name = sender_name or ''
+        self.email = email or ''
+        self.locale = locale
+        self.date_format = DATE_FORMATS.get(locale, DATE_FORMATS[DEFAULT_LOCALE])
+        domain = self.email.rpartition('@')[2] or 'localhost'
+        self._message_id = f'{int(time())}.{getpid()}.{getrandbits(32)}.{{}}@{domain}'
+        self._message_numbers = count()
+        self._date_header = (0, '')
+        self._prepared = {}
+
+    def _prepare(self, name: str) -> tuple:
+        """ method returns (encoded static headers, body pattern, item pattern) of template """
+        prepared = self._prepared.get(name)
+        if prepared is None:
+            template = get_template(name, self.locale)
+            message = EmailMessage(policy=SMTP)
+            message['Subject'] = template.subject
+            message['MIME-Version'] = '1.0'
+            message['Content-Type'] = 'text/plain; charset="utf-8"'
+            message['Content-Transfer-Encoding'] = '8bit'
+            # From is already encoded by format_address - policy would decode and refold it
+            # without quoting specials of name
+            headers = (
+                f'From: {format_address(self.sender_name, self.email)}\r\n'.encode('utf8')
+                + message.as_bytes()[:-2]  # without empty line ending headers
+            )
+
+            sender_name = self.sender_name.replace('{', '{{').replace('}', '}}')
+            body = template.body.replace('{sender_name}', sender_name)
+            prepared = self._prepared[name] = (headers, body, template.item)
+        return prepared
+
+    def _format_date(self, date) -> str:
+        return _format_date(date, self.date_format)
+
+    def _headers(self, user: User) -> bytes:
+        now = int(time())
+        if self._date_header[0] != now:
+            self._date_header = (now, formatdate(now, localtime=True))
+        return (
+            f'To: {format_address(user.name, user.email)}\r\n'
+            f'Date: {self._date_header[1]}\r\n'
+            f'Message-ID: <{self._message_id.format(next(self._message_numbers))}>\r\n\r\n'
+        ).encode('utf8')  # ASCII unless local part of address isn't (RFC 6532)
+
+    def reminder(self, hiring: Hiring) -> bytes:
+        """ method renders reminder about one hiring
+
+        Returns:
+            bytes: complete message
+        """
+        headers, body, _ = self._prepare('reminder')
+        user, book = hiring.user, hiring.book
+        return headers + self._headers(user) + body.format_map({
+            'name': user.name,
+            'title': book.title,
+            'author': book.author,
+            'returned_to': self._format_date(hiring.returned_to),
+        }).encode('utf8')
+
+    def digest(self, user: User, hirings: Iterable[Hiring]) -> bytes:
+        """ method renders one reminder listing all given hirings of user
+
+        Returns:
+            bytes: complete message
+        """
+        headers, body, item = self._prepare('digest')
+        items = ''.join(
+            item.format_map({
+                'title': hiring.book.title,
+                'author': hiring.book.author,
+                'returned_to': self._format_date(hiring.returned_to),
+            })
+            for hiring in hirings)
+        return headers + self._headers(user) + body.format_map({
+            'name': user.name,
+            'items': items,
+        }).encode('utf8')
+
+
+@lru_cache(maxsize=32)
+def get_renderer(sender_name: str, email: str, locale: str = DEFAULT_LOCALE) -> MessageRenderer:
+    """ function returns (cached) renderer of given sender """
+    return MessageRenderer(sender_name, email, locale)
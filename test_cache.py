@@ -0,0 +1,49 @@
+from cache import LRUCache
+from models import Book, User
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'size': 2, 'maxsize': 2}
+
+
+def test_cached_ids(cached_database):
+    user = User('Adam', 'adam@mail.com')
+    assert not cached_database.has_user(user)
+    cached_database.add_user(user)
+
+    assert cached_database.has_user(user)
+    assert cached_database._get_user_id(user) == 1
+    assert cached_database.cache_stats()['users_ids']['hits'] == 1
+
+    for number in range(3):
+        cached_database.has_book(Book(f'title {number}', 'author'))
+    assert cached_database.cache_stats()['books_ids']['size'] == 0
+
+
+def test_lists_are_invalidated_by_writes(cached_database):
+    cached_database.add_book(Book('Lalka', 'Bolesław Prus'))
+    assert cached_database.get_all_books() == [Book('Lalka', 'Bolesław Prus')]
+    assert len(cached_database.get_all_books()) == 1
+    assert cached_database.cache_stats()['lists']['hits'] == 1
+
+    cached_database.add_books([Book('Faraon', 'Bolesław Prus')])
+    assert len(cached_database.get_all_books()) == 2
+
+    cached_database.add_users([User('Adam', 'adam@mail.com')])
+    assert cached_database.get_all_users() == [User('Adam', 'adam@mail.com')]
+
+
+def test_cache_is_invalidated_by_validate_emails(cached_database):
+    cached_database.connection.execute("INSERT INTO users (name, email) VALUES ('Adam', 'adam@MAIL.com')")
+    assert cached_database.get_all_users() == [User('Adam', 'adam@MAIL.com')]
+
+    cached_database.validate_emails()
+    assert cached_database.get_all_users() == [User('Adam', 'adam@mail.com')]
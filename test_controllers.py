@@ -1,5 +1,16 @@
-import pytest
 import sqlite3
+from datetime import datetime, timedelta
+from smtplib import SMTPResponseException, SMTPServerDisconnected
+from threading import Thread
+
+import pytest
+
+import controllers
+import mailer
+import metrics
+from migrations import migrate
+from models import Book, Hiring, User
+from outbox import Outbox
 
 
 """ Tests created by Adam Wójciński """
@@ -19,4 +30,396 @@ def create_database():
     return cursor
 
 def test_get_data(create_database):
-    pass
\ No newline at end of file
+    pass
+
+class FakeSMTP:
+    """ records calls instead of talking to SMTP server """
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.sent = []
+        self.closed = False
+        self.fail_next = None
+        FakeSMTP.instances.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def login(self, email, password):
+        pass
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        if self.fail_next is not None:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        self.sent.append(to_addrs)
+
+    def quit(self):
+        self.close()
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def email_sender(monkeypatch, tmp_path):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(mailer, 'SMTP_SSL', FakeSMTP)
+    env_file = tmp_path / '.env'
+    env_file.write_text("email='mail@mail.com'\nsmtp_server='localhost'\nsmtp_port=465\n")
+    return mailer.EmailSender(str(env_file), max_messages_per_connection=3)
+
+
+def test_send_email_without_session_connects_per_message(email_sender):
+    for _ in range(4):
+        email_sender.send_email('user@mail.com', b'msg')
+
+    assert len(FakeSMTP.instances) == 4
+    assert all(server.closed for server in FakeSMTP.instances)
+
+
+def test_session_reuses_connection_up_to_limit(email_sender):
+    with email_sender:
+        for _ in range(7):
+            email_sender.send_email('user@mail.com', b'msg')
+
+    assert [len(server.sent) for server in FakeSMTP.instances] == [3, 3, 1]
+    assert all(server.closed for server in FakeSMTP.instances)
+
+
+def test_session_reconnects_after_disconnect(email_sender):
+    with email_sender:
+        email_sender.send_email('user@mail.com', b'msg')
+        FakeSMTP.instances[0].fail_next = SMTPServerDisconnected()
+        email_sender.send_email('user@mail.com', b'msg')
+
+        FakeSMTP.instances[1].fail_next = SMTPResponseException(421, b'closing')
+        email_sender.send_email('user@mail.com', b'msg')
+
+        FakeSMTP.instances[2].fail_next = SMTPResponseException(550, b'rejected')
+        with pytest.raises(SMTPResponseException):
+            email_sender.send_email('user@mail.com', b'msg')
+
+    assert [len(server.sent) for server in FakeSMTP.instances] == [1, 1, 1]
+
+
+def test_session_drops_broken_connection(email_sender):
+    with email_sender:
+        email_sender.send_email('user@mail.com', b'msg')
+        FakeSMTP.instances[0].fail_next = ConnectionResetError()
+        with pytest.raises(ConnectionResetError):
+            email_sender.send_email('user@mail.com', b'msg')
+        assert FakeSMTP.instances[0].closed
+
+        email_sender.send_email('user@mail.com', b'msg')
+        # rejected message doesn't break connection
+        FakeSMTP.instances[1].fail_next = SMTPResponseException(550, b'rejected')
+        with pytest.raises(SMTPResponseException):
+            email_sender.send_email('user@mail.com', b'msg')
+        email_sender.send_email('user@mail.com', b'msg')
+
+    assert [len(server.sent) for server in FakeSMTP.instances] == [1, 2]
+
+
+def test_smtp_operations_are_measured(email_sender):
+    metrics.REGISTRY.reset()
+    metrics.enable()
+    try:
+        with email_sender:
+            for _ in range(4):
+                email_sender.send_email('user@mail.com', b'msg')
+    finally:
+        metrics.disable()
+
+    smtp_seconds = metrics.REGISTRY.to_dict()['smtp_seconds']
+    assert {item['labels']['operation']: item['count'] for item in smtp_seconds} == {
+        'connect': 2, 'login': 2, 'send': 4}
+    metrics.REGISTRY.reset()
+
+
+def test_get_overdue_hirings(database):
+    user = User('user', 'user@mail.com')
+    database.add_user(user)
+    for day in (5, 1, 20, 10):
+        database.add_book(Book(f'book {day}', 'author'))
+        database.add_hiring(Hiring(user, Book(f'book {day}', 'author'), datetime(2022, 1, day)))
+
+    overdue = database.get_overdue_hirings(as_of=datetime(2022, 1, 10))
+
+    assert [hiring.book.title for hiring in overdue] == ['book 1', 'book 5']
+    assert list(database.get_overdue_hirings(as_of=datetime(2021, 1, 1))) == []
+
+
+def test_lookups_use_exact_match(database):
+    database.add_book(Book('Lalka', 'Bolesław Prus'))
+    database.add_book(Book('Lalka', 'Bolesław Prus'))
+    database.add_user(User('Adam', 'adam@mail.com'))
+
+    assert len(database.get_all_books()) == 1
+    assert database._get_book_id(Book('Lalka', 'Bolesław Prus')) == 1
+    assert database._get_book_id(Book('lalka', 'Bolesław Prus')) is None
+    assert database._get_user_id(User('Adam', 'adam@mail.com')) == 1
+    assert database._get_user_id(User('Adam', 'adam@mail')) is None
+
+
+def test_get_by_many_keys(database, monkeypatch):
+    for number in range(30):
+        database.add_book(Book(f'title {number}', f'author {number % 3}'))
+        database.add_user(User(f'user {number}', f'user{number}@mail.com'))
+
+    books = database.get_books_by_id(1, 2, 30, 1000)
+    assert sorted(books) == [1, 2, 30]
+    assert books[30].title == 'title 29'
+    assert sorted(database.get_users_by_id(*range(1, 40))) == list(range(1, 31))
+
+    monkeypatch.setattr(controllers, 'SQLITE_MAX_VARIABLES', 4)
+    monkeypatch.setattr(controllers, 'LOOKUP_TEMP_TABLE_THRESHOLD', 8)
+    assert len(database.get_books_by_id(*range(1, 8))) == 7
+    assert len(database.get_books_by_id(*range(1, 100))) == 30
+
+    by_author = database.get_books_by_author('author 1', 'nobody')
+    assert len(by_author['author 1']) == 10
+    assert by_author['nobody'] == []
+
+    by_title = database.get_books_by_titles('title 2', 'missing')
+    assert len(by_title['title 2']) == 11
+    assert by_title['missing'] == []
+    assert len(database.get_users_by_name('user 1')['user 1']) == 11
+
+
+def test_lookups_dont_commit_open_transaction(database):
+    database.add_books([Book('Lalka', 'Bolesław Prus')], commit=False)
+
+    assert database.get_books_by_titles('Lalka')['Lalka'] == [Book('Lalka', 'Bolesław Prus')]
+    database.connection.rollback()
+
+    assert database.get_books_ids() == {}
+
+
+def test_add_hiring_adds_missing_user_and_book(database):
+    hiring = Hiring(User('Adam', 'adam@mail.com'), Book('Lalka', 'Bolesław Prus'), datetime(2022, 1, 1))
+    database.add_hiring(hiring)
+    database.add_hiring(hiring)
+
+    assert database.get_hirings_ids() == {(1, 1)}
+    assert database.get_users_ids() == {('Adam', 'adam@mail.com'): 1}
+    assert database.get_books_ids() == {('Bolesław Prus', 'Lalka'): 1}
+
+
+def test_get_all_hirings_shares_equal_objects(database):
+    user = User('Adam', 'adam@mail.com')
+    for title in ('Lalka', 'Faraon'):
+        database.add_hiring(Hiring(user, Book(title, 'Bolesław Prus'), datetime(2022, 1, 1)))
+
+    first, second = database.get_all_hirings()
+
+    assert first.user is second.user
+    assert first.returned_to is second.returned_to
+    assert first.book != second.book
+
+
+def test_keyset_pagination(database):
+    database.add_users(User(f'user {number}', f'user{number}@mail.com') for number in range(1, 8))
+
+    first = database.get_users_page(limit=3)
+    assert [user_id for user_id, _ in first] == [1, 2, 3]
+    second = database.get_users_page(after_id=first[-1][0], limit=3)
+    assert [user.name for _, user in second] == ['user 4', 'user 5', 'user 6']
+    assert database.get_users_page(before_id=second[0][0], limit=3) == first
+
+    pages = list(database.iter_pages(database.get_users_page, page_size=3))
+    assert [len(page) for page in pages] == [3, 3, 1]
+
+
+def test_hirings_page(database):
+    for day in (3, 1, 2):
+        database.add_hiring(Hiring(User('Adam', 'adam@mail.com'), Book(f'book {day}', 'author'), datetime(2022, 1, day)))
+
+    page = database.get_hirings_page(after_id=1, limit=5)
+
+    assert [(hiring_id, hiring.book.title) for hiring_id, hiring in page] == [(2, 'book 1'), (3, 'book 2')]
+
+
+def test_connection_per_thread_in_wal_mode(tmp_path):
+    filename = str(tmp_path / 'test.db')
+    database = controllers.Database(filename)
+    database.connection.execute('CREATE TABLE users (id integer primary key, name text, email text, email_valid integer, created_at datetime)')
+    connections = []
+
+    def add_users(number):
+        connections.append(database.connection)
+        for user_number in range(20):
+            database.add_user(User(f'user {number}-{user_number}', 'user@mail.com'))
+
+    threads = [Thread(target=add_users, args=(number,)) for number in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, connections))) == 4
+    assert database.connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+    assert len(database.get_all_users()) == 80
+    database.close_connection()
+
+
+def test_pending_reminders_only_return_new_work(database):
+    user = User('Adam', 'adam@mail.com')
+    for day in (1, 5, 9):
+        database.add_hiring(Hiring(user, Book(f'book {day}', 'author'), datetime(2022, 1, day)))
+
+    def run(as_of):
+        since = database.get_last_reminder_run()
+        hirings_until = database.get_last_hiring_id()
+        pending = [hiring.hiring_id for hiring in database.get_pending_reminders(as_of, since)]
+        sent, failed = [hiring_id for hiring_id in pending if hiring_id != 2], [2]
+        database.record_reminder_run(as_of, sent, failed, interval=timedelta(days=7), hirings_until=hirings_until)
+        return sorted(pending)
+
+    assert database.get_last_reminder_run() is None
+    assert run(datetime(2022, 1, 6)) == [1, 2]
+    assert database.get_last_reminder_run() == datetime(2022, 1, 6)
+    assert run(datetime(2022, 1, 7)) == [2]
+    assert run(datetime(2022, 1, 10)) == [2, 3]
+    assert run(datetime(2022, 1, 13)) == [1, 2]
+    assert database.connection.execute(
+        'SELECT sent_count FROM reminders WHERE hiring_id = 1').fetchone() == (2,)
+
+
+def test_hirings_added_after_run_with_past_returned_to_are_pending(database):
+    user = User('Adam', 'adam@mail.com')
+    database.add_hiring(Hiring(user, Book('Lalka', 'author'), datetime(2022, 1, 5)))
+    outbox = Outbox(database)
+    assert outbox.enqueue_reminders(datetime(2022, 1, 10)) == 1
+
+    # e.g. imported after the run - its returned_to is before high-water mark
+    database.add_hiring(Hiring(user, Book('Potop', 'author'), datetime(2022, 1, 3)))
+    since = database.get_last_reminder_run()
+    assert [hiring.book.title for hiring in database.get_pending_reminders(datetime(2022, 1, 11), since)] == ['Potop']
+    assert outbox.enqueue_reminders(datetime(2022, 1, 11), since) == 1
+    assert list(database.get_pending_reminders(datetime(2022, 1, 12), database.get_last_reminder_run())) == []
+
+
+def test_pending_reminders_by_user(database):
+    adam, ewa = User('Adam', 'adam@mail.com'), User('Ewa', 'ewa@mail.com')
+    for user, title, day in ((adam, 'Lalka', 3), (ewa, 'Lalka', 2), (adam, 'Faraon', 1), (adam, 'Potop', 20)):
+        database.add_hiring(Hiring(user, Book(title, 'author'), datetime(2022, 1, day)))
+
+    digests = dict(database.get_pending_reminders_by_user(as_of=datetime(2022, 1, 10)))
+
+    assert [hiring.book.title for hiring in digests[adam]] == ['Faraon', 'Lalka']
+    assert [hiring.hiring_id for hiring in digests[ewa]] == [2]
+    assert digests[adam][0].returned_to == datetime(2022, 1, 1)
+
+
+def test_send_digest_email(email_sender):
+    user = User('Adam', 'adam@mail.com')
+    hirings = [Hiring(user, Book(title, 'author'), datetime(2022, 1, 1)) for title in ('Lalka', 'Faraon')]
+    sent = []
+    email_sender.send_email = lambda reciver, message: sent.append((reciver, message.decode('utf8')))
+
+    email_sender.send_digest_email(user, hirings)
+
+    assert len(sent) == 1
+    assert sent[0][0] == 'adam@mail.com'
+    assert 'Lalka' in sent[0][1] and 'Faraon' in sent[0][1]
+
+
+def test_dates_are_stored_as_timestamps(database):
+    database.add_hiring(Hiring(User('Adam', 'adam@mail.com'), Book('Lalka', 'Prus'), datetime(2022, 1, 1, 12, 30)))
+
+    assert database.connection.execute('SELECT returned_to FROM hirings').fetchone() == (1641040200,)
+    assert controllers.from_timestamp(1641040200) == datetime(2022, 1, 1, 12, 30)
+    assert controllers.to_timestamp(datetime(2022, 1, 1, 12, 30, 0, 999)) == 1641040200
+
+
+def test_migration_converts_text_dates(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'database.db')
+    migrate(connection, until=7)
+    connection.execute("INSERT INTO hirings (returned_to) VALUES ('2022-01-01 12:30:00'), ('2022-01-02 00:00:00.123')")
+    connection.execute("INSERT INTO reminder_runs (overdue_until) VALUES ('2022-01-03 00:00:00')")
+
+    migrate(connection, until=8)
+
+    assert connection.execute('SELECT returned_to FROM hirings').fetchall() == [(1641040200,), (1641081600,)]
+    assert connection.execute('SELECT overdue_until FROM reminder_runs').fetchone() == (1641168000,)
+
+
+def test_search_books_and_users(database):
+    database.add_books([Book('W pustyni i w puszczy', 'Henryk Sienkiewicz'), Book('Potop', 'Henryk Sienkiewicz'),
+                        Book('Lalka', 'Bolesław Prus')])
+    database.add_users([User('Łukasz Nowak', 'lukasz@mail.com'), User('Anna Nowakowska', 'anna@mail.com')])
+
+    assert database.search_books('pustyni sienk') == [Book('W pustyni i w puszczy', 'Henryk Sienkiewicz')]
+    assert len(database.search_books('henryk')) == 2
+    assert database.search_books('henr sienkiewicz') == []
+    assert database.search_books('LALKA prus') == [Book('Lalka', 'Bolesław Prus')]
+    assert database.search_books('  ') == []
+    assert [user.name for user in database.search_users('nowak')] == ['Łukasz Nowak', 'Anna Nowakowska']
+    assert [user.name for user in database.search_users('anna@')] == ['Anna Nowakowska']
+
+    database.connection.execute("UPDATE books SET title = 'Krzyżacy' WHERE title = 'Potop'")
+    database.connection.execute("DELETE FROM books WHERE title = 'Lalka'")
+    assert database.search_books('potop') == []
+    assert database.search_books('krzyzacy') == [Book('Krzyżacy', 'Henryk Sienkiewicz')]
+    assert database.search_books('prus') == []
+
+
+def test_search_index_covers_rows_added_before_migration(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'database.db')
+    migrate(connection, until=8)
+    connection.execute("INSERT INTO books (title, author) VALUES ('Lalka', 'Bolesław Prus')")
+
+    migrate(connection, until=9)
+
+    assert connection.execute("SELECT title FROM books_fts WHERE books_fts MATCH 'lal*'").fetchall() == [('Lalka',)]
+
+
+def test_emails_are_normalized_and_validated_on_write(database):
+    database.add_user(User('Adam', ' Adam@Mail.COM '))
+    database.add_users([User('Ewa', 'ewa@mail.com'), User('Bad', 'bad')])
+
+    rows = database.connection.execute('SELECT name, email, email_valid FROM users ORDER BY id').fetchall()
+    assert rows == [('Adam', 'Adam@mail.com', 1), ('Ewa', 'ewa@mail.com', 1), ('Bad', 'bad', 0)]
+    assert database.has_user(User('Adam', 'Adam@MAIL.com'))
+
+
+def test_pending_reminders_skip_invalid_emails(database):
+    for user in (User('Adam', 'adam@mail.com'), User('Bad', 'bad')):
+        database.add_hiring(Hiring(user, Book(f'book of {user.name}', 'author'), datetime(2022, 1, 1)))
+
+    assert [hiring.user.name for hiring in database.get_pending_reminders(datetime(2022, 1, 10))] == ['Adam']
+
+
+def test_validate_emails(database):
+    database.connection.executemany(
+        'INSERT INTO users (name, email) VALUES (?, ?)', [('Adam', 'adam@MAIL.com '), ('Bad', 'bad')])
+    database.connection.execute("INSERT INTO users (name, email, email_valid) VALUES ('Old', 'old@mail', 1)")
+
+    assert database.validate_emails() == 2
+    assert database.validate_emails() == 0
+    assert database.validate_emails(revalidate=True) == 1
+
+    rows = database.connection.execute('SELECT email, email_valid FROM users ORDER BY id').fetchall()
+    assert rows == [('adam@mail.com', 1), ('bad', 0), ('old@mail', 0)]
+    assert database.search_users('adam@mail.com') == [User('Adam', 'adam@mail.com')]
+
+
+def test_hirings_skipped_for_invalid_email_are_reminded_after_fix(database):
+    now = datetime.now().replace(microsecond=0)
+    database.add_hiring(Hiring(User('Bad', 'bad'), Book('Lalka', 'author'), now - timedelta(days=3)))
+
+    def run(as_of):
+        since, hirings_until = database.get_last_reminder_run(), database.get_last_hiring_id()
+        pending = [hiring.book.title for hiring in database.get_pending_reminders(as_of, since)]
+        database.record_reminder_run(as_of, [1] if pending else [], [], hirings_until=hirings_until)
+        return pending
+
+    assert run(now - timedelta(days=1)) == []
+    database.connection.execute("UPDATE users SET email = 'bad@mail.com', email_valid = NULL")
+    assert database.validate_emails() == 1
+    assert run(now + timedelta(seconds=1)) == ['Lalka']
+    assert run(now + timedelta(seconds=2)) == []
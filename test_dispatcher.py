@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+from smtplib import SMTPDataError, SMTPRecipientsRefused, SMTPSenderRefused, SMTPServerDisconnected
+from time import monotonic
+
+from conftest import FakeSender
+from dispatcher import ReminderDispatcher, TokenBucket, is_transient
+from models import Book, Hiring, User
+
+
+def make_hiring(name):
+    return Hiring(User(name, f'{name}@mail.com'), Book('book', 'author'), datetime(2000, 1, 1))
+
+
+def test_dispatch_reports_sent_and_failed():
+    failures = {
+        'flaky@mail.com': (SMTPServerDisconnected(), 2),
+        'broken@mail.com': (SMTPServerDisconnected(), 10),
+        'refused@mail.com': (SMTPRecipientsRefused({}), 10),
+        'unencodable@mail.com': (UnicodeEncodeError('ascii', 'ó', 0, 1, 'ordinal not in range'), 10),
+    }
+    senders = []
+
+    def sender_factory():
+        senders.append(FakeSender(failures))
+        return senders[-1]
+
+    hirings = [make_hiring(name) for name in ('a', 'b', 'flaky', 'broken', 'refused', 'unencodable', 'c')]
+    results = []
+    dispatcher = ReminderDispatcher(sender_factory, concurrency=3, retries=2, backoff=0)
+    report = dispatcher.run(hirings, callback=lambda hiring, error: results.append(hiring))
+
+    assert (report.sent, report.failed) == (4, 3)
+    assert {hiring.user.name for hiring, _ in report.failures} == {'broken', 'refused', 'unencodable'}
+    assert failures['refused@mail.com'][1] == 9
+    assert failures['unencodable@mail.com'][1] == 9
+    assert len(results) == 7
+    assert len(senders) == 3
+    assert sum(len(sender.sent) for sender in senders) == 4
+
+
+def test_permanent_errors_are_not_retried():
+    failures = {
+        'rejected@mail.com': (SMTPDataError(550, b'Message rejected'), 10),
+        'greylisted@mail.com': (SMTPDataError(451, b'Try again later'), 1),
+    }
+    sender = FakeSender(failures)
+    dispatcher = ReminderDispatcher(lambda: sender, concurrency=1, retries=2, backoff=0)
+    report = dispatcher.run([make_hiring('rejected'), make_hiring('greylisted')])
+
+    assert (report.sent, report.failed) == (1, 1)
+    assert failures['rejected@mail.com'][1] == 9
+    assert failures['greylisted@mail.com'][1] == 0
+
+
+def test_is_transient():
+    assert is_transient(SMTPServerDisconnected())
+    assert is_transient(ConnectionResetError())
+    assert is_transient(SMTPSenderRefused(421, b'Too many connections', 'me@mail.com'))
+    assert not is_transient(SMTPSenderRefused(553, b'Not allowed', 'me@mail.com'))
+    assert not is_transient(SMTPRecipientsRefused({}))
+    assert not is_transient(ValueError())
+
+
+def test_token_bucket_limits_rate():
+    async def take(bucket, quantity):
+        for _ in range(quantity):
+            await bucket.acquire()
+
+    bucket = TokenBucket(rate=100, capacity=1)
+    start = monotonic()
+    asyncio.run(take(bucket, 11))
+
+    assert monotonic() - start >= 0.09
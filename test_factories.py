@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from factories import BooksFactory, HiringsFactory, UsersFactory, populate
+
+
+def test_factories_create_unique_rows(database):
+    populate(database, books=300, users=200, hirings=1000, seed=1)
+    BooksFactory(database, seed=1).create(100)
+
+    assert len(database.get_books_ids()) == 400
+    assert len(database.get_users_ids()) == 200
+    assert len(database.get_all_hirings()) == 1000
+
+
+def test_hirings_overdue_ratio(database):
+    populate(database, books=10, users=10, hirings=0)
+    as_of = datetime(2022, 1, 1)
+    HiringsFactory(database, overdue_ratio=0.25, as_of=as_of, seed=1).create(4000)
+
+    overdue = sum(1 for _ in database.get_overdue_hirings(as_of))
+    assert 900 < overdue < 1100
+
+
+def test_same_seed_generates_same_models():
+    assert UsersFactory(seed=5).generate_users(3) == UsersFactory(seed=5).generate_users(3)
+    books = BooksFactory(seed=5).generate_books(3)
+    hirings = HiringsFactory(seed=5).generate_hirings(UsersFactory(seed=5).generate_users(3), books, 10)
+    assert {hiring.book for hiring in hirings} <= set(books)
@@ -0,0 +1,43 @@
+from datetime import datetime
+from io import StringIO
+
+from importer import BulkImporter, read_csv, read_jsonl, rows_to_hirings
+from models import Book, Hiring, User
+
+HIRINGS_CSV = '''returned_to,name,email,title,author
+2022-01-01,Adam,adam@mail.com,Lalka,Bolesław Prus
+2022-01-02 12:00:00,Adam,adam@mail.com,Faraon,Bolesław Prus
+2022-01-03,Ewa,ewa@mail.com,Lalka,Bolesław Prus
+2022-01-04,Ewa,ewa@mail.com,Lalka,Bolesław Prus
+'''
+
+HIRINGS_JSONL = '''{"name": "Ewa", "email": "ewa@mail.com", "title": "Lalka", "author": "Bolesław Prus", "returned_to": "2022-01-05"}
+
+{"name": "Jan", "email": "jan@mail.com", "title": "Potop", "author": "Henryk Sienkiewicz", "returned_to": "2022-01-06"}
+'''
+
+COLUMNS = ('name', 'email', 'title', 'author', 'returned_to')
+
+
+def test_import_hirings(database):
+    database.add_hiring(Hiring(User('Adam', 'adam@mail.com'), Book('Lalka', 'Bolesław Prus'), datetime(2021, 1, 1)))
+    importer = BulkImporter(database, batch_size=2)
+
+    assert importer.import_hirings(rows_to_hirings(read_csv(StringIO(HIRINGS_CSV), COLUMNS))) == 2
+    assert importer.import_hirings(rows_to_hirings(read_jsonl(StringIO(HIRINGS_JSONL), COLUMNS))) == 1
+
+    assert len(database.get_all_users()) == 3
+    assert len(database.get_all_books()) == 3
+    hirings = sorted(database.get_all_hirings(), key=lambda hiring: hiring.returned_to)
+    assert [hiring.returned_to for hiring in hirings] == [
+        datetime(2021, 1, 1), datetime(2022, 1, 2, 12), datetime(2022, 1, 3), datetime(2022, 1, 6)]
+    assert hirings[-1].user.name == 'Jan'
+
+
+def test_import_books_and_users_skips_existing(database):
+    importer = BulkImporter(database)
+    books = [Book('Lalka', 'Bolesław Prus'), Book('Lalka', 'Bolesław Prus'), Book('Potop', 'Henryk Sienkiewicz')]
+
+    assert importer.import_books(books) == 2
+    assert BulkImporter(database).import_books(books) == 0
+    assert importer.import_users([User('Adam', 'adam@mail.com')] * 3) == 1
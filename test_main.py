@@ -0,0 +1,84 @@
+from datetime import datetime
+from itertools import chain
+
+import pytest
+
+import mailer
+import main
+import views
+from benchmarks.bench_startup import BUDGET_MS, LAZY_MODULES, import_time, import_times
+from controllers import Database
+from models import Book, Hiring, User
+
+
+@pytest.fixture
+def database_name(tmp_path):
+    return str(tmp_path / 'database.db')
+
+
+def test_add_and_list(database_name, capsys):
+    main.main(['--database', database_name, 'add', 'user', 'Adam', 'adam@mail.com'])
+    main.main(['--database', database_name, 'add', 'user', 'Adam', 'adam@mail.com'])
+    main.main(['--database', database_name, 'add', 'book', 'Lalka', 'Bolesław Prus'])
+    main.main(['--database', database_name, 'add', 'hiring', 'Ewa', 'ewa@mail.com', 'Potop',
+               'Henryk Sienkiewicz', '2022-01-31'])
+    capsys.readouterr()
+
+    main.main(['--database', database_name, 'list', 'users'])
+    assert capsys.readouterr().out.splitlines() == ['name,email', 'Adam,adam@mail.com', 'Ewa,ewa@mail.com']
+    main.main(['--database', database_name, 'list', 'hirings'])
+    assert capsys.readouterr().out.splitlines() == [
+        'name,email,title,author,returned_to', 'Ewa,ewa@mail.com,Potop,Henryk Sienkiewicz,2022-01-31 00:00:00']
+
+
+def test_import_and_remind(database_name, tmp_path, sender, monkeypatch, capsys):
+    hirings = tmp_path / 'hirings.csv'
+    hirings.write_text('name,email,title,author,returned_to\n'
+                       'Adam,adam@mail.com,Lalka,Bolesław Prus,2022-01-01\n'
+                       'Ewa,ewa@mail.com,Potop,Henryk Sienkiewicz,2022-01-02\n', encoding='utf8')
+    monkeypatch.setattr(mailer, 'EmailSender', lambda: sender)
+
+    main.main(['--database', database_name, 'import', 'hirings', str(hirings)])
+    main.main(['--database', database_name, 'remind'])
+    main.main(['--database', database_name, 'remind'])
+
+    assert 'Zaimportowano: 2' in capsys.readouterr().out
+    assert sorted(sender.sent) == [('adam@mail.com', ['Lalka']), ('ewa@mail.com', ['Potop'])]
+
+
+def test_menu_loop_does_not_recurse(database_name, monkeypatch):
+    # more actions than recursion limit - every action returns to the same loop
+    actions = chain.from_iterable(('4', f'user {number}', 'user@mail.com', '') for number in range(2000))
+    answers = chain(actions, ['0'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    monkeypatch.setattr(views, 'system', lambda command: 0)
+    monkeypatch.setattr(views, 'sleep', lambda seconds: None)
+
+    main.main(['--database', database_name])
+
+    database = Database(database_name)
+    assert len(database.get_all_users()) == 2000
+    database.close_connection()
+
+
+def test_add_hiring_of_found_user_and_book(database_name, monkeypatch):
+    database = Database(database_name)
+    main.main(['--database', database_name, 'add', 'user', 'Jan Kowalski', 'jan@mail.com'])
+    main.main(['--database', database_name, 'add', 'book', 'Lalka', 'Bolesław Prus'])
+    # the only match of phrase is chosen, not added as new user or book named by phrase
+    answers = iter(['6', 'kowal', '1', 'lal', '1', '31', '1', '2022', '0'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    monkeypatch.setattr(views, 'system', lambda command: 0)
+
+    main.main(['--database', database_name])
+
+    assert database.get_all_users() == [User('Jan Kowalski', 'jan@mail.com')]
+    assert database.get_all_hirings() == [
+        Hiring(User('Jan Kowalski', 'jan@mail.com'), Book('Lalka', 'Bolesław Prus'), datetime(2022, 1, 31))]
+    database.close_connection()
+
+
+def test_cold_start_skips_lazy_modules():
+    assert not set(LAZY_MODULES) & set(import_times('main'))
+    # wall-clock time depends on machine - twice the budget of benchmarks/bench_startup.py
+    assert import_time('main', repeat=3) < 2 * BUDGET_MS
@@ -0,0 +1,89 @@
+from datetime import datetime
+from json import loads
+
+import pytest
+
+import metrics
+from metrics import MetricsRegistry, timed
+from models import Book, Hiring, User
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.REGISTRY.reset()
+    metrics.enable()
+    yield metrics.REGISTRY
+    metrics.disable()
+    metrics.REGISTRY.reset()
+
+
+def test_histogram_export():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('call_seconds', 'Duration of calls', buckets=(0.1, 1.0), method='a')
+    for value in (0.05, 0.5, 2.0):
+        histogram.observe(value)
+    registry.counter('rows_total').inc(3)
+
+    assert registry.to_prometheus().splitlines() == [
+        '# HELP call_seconds Duration of calls',
+        '# TYPE call_seconds histogram',
+        'call_seconds_bucket{method="a",le="0.1"} 1',
+        'call_seconds_bucket{method="a",le="1.0"} 2',
+        'call_seconds_bucket{method="a",le="+Inf"} 3',
+        'call_seconds_sum{method="a"} 2.55',
+        'call_seconds_count{method="a"} 3',
+        '# TYPE rows_total counter',
+        'rows_total 3',
+    ]
+    assert loads(registry.to_json())['rows_total'] == [{'labels': {}, 'type': 'counter', 'value': 3}]
+
+
+def test_disabled_metrics_are_not_collected():
+    @timed('test_disabled_seconds')
+    def function():
+        return 1
+
+    assert function() == 1
+    assert 'test_disabled_seconds' not in metrics.REGISTRY.to_dict()
+
+
+def test_database_calls_and_hydration_are_measured(database, enabled_metrics):
+    user = User('Adam', 'adam@mail.com')
+    for title in ('Lalka', 'Faraon'):
+        database.add_hiring(Hiring(user, Book(title, 'Prus'), datetime(2022, 1, 1)))
+
+    database.get_all_hirings()
+    list(database.get_overdue_hirings(datetime(2022, 1, 10)))
+
+    result = enabled_metrics.to_dict()
+    calls = {item['labels']['method']: item['count'] for item in result['database_call_seconds']}
+    assert calls['get_all_hirings'] == 1
+    assert calls['get_overdue_hirings'] == 1
+    assert calls['add_hiring'] == 2
+    assert result['hirings_hydrated_total'][0]['value'] == 4
+    assert result['dates_parsed_total'][0]['value'] == 2
+
+
+
+def test_cached_database_calls_are_measured_once(cached_database, enabled_metrics):
+    cached_database.add_user(User('Adam', 'adam@mail.com'))
+    cached_database.get_all_users()
+    cached_database.get_all_users()
+
+    result = enabled_metrics.to_dict()
+    calls = {item['labels']['method']: item['count'] for item in result['database_call_seconds']}
+    assert calls['add_user'] == 1
+    assert calls['get_all_users'] == 2
+
+
+def test_cache_hits_and_misses_are_exported(cached_database, enabled_metrics):
+    cached_database.get_all_users()
+    cached_database.get_all_users()
+    cached_database.has_user(User('Adam', 'adam@mail.com'))
+
+    result = enabled_metrics.to_dict()
+    hits = {item['labels']['cache']: item['value'] for item in result['cache_hits_total']}
+    misses = {item['labels']['cache']: item['value'] for item in result['cache_misses_total']}
+    assert hits == {'lists': 1}
+    assert misses == {'lists': 1, 'users_ids': 1}
+    assert cached_database.cache_stats()['lists']['hits'] == 1
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from migrations import MIGRATIONS_DIR, current_version, find_migrations, migrate
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'database.db')
+    yield connection
+    connection.close()
+
+
+def test_migrate_applies_pending_scripts_once(connection):
+    migrations = find_migrations()
+
+    assert migrate(connection) == migrations
+    assert current_version(connection) == migrations[-1].version
+    assert migrate(connection) == []
+    assert connection.execute('SELECT COUNT(*) FROM schema_version').fetchone() == (len(migrations),)
+
+
+def test_migrate_until_and_then_rest(connection):
+    migrations = find_migrations()
+
+    assert [migration.version for migration in migrate(connection, until=3)] == [1, 2]
+    assert migrate(connection) == migrations[2:]
+
+
+def test_failed_script_is_rolled_back(connection, tmp_path):
+    directory = tmp_path / 'scripts'
+    directory.mkdir()
+    (directory / '01_books.sql').write_text('CREATE TABLE books (id INTEGER PRIMARY KEY);')
+    (directory / '02_broken.sql').write_text(
+        'CREATE TABLE users (id INTEGER PRIMARY KEY);\nINSERT INTO missing VALUES (1);')
+    (directory / 'notes.txt').write_text('not a migration')
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(connection, str(directory))
+
+    assert current_version(connection) == 1
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'books' in tables and 'users' not in tables
+
+
+def test_legacy_database_is_bootstrapped(connection):
+    # db created by old app - scripts run without recording versions
+    for migration in find_migrations()[:3]:
+        with open(migration.filename, mode='r', encoding='utf8') as sql_script:
+            connection.executescript(sql_script.read())
+    connection.execute("INSERT INTO books (title, author) VALUES ('Lalka', 'Bolesław Prus')")
+    connection.commit()
+
+    applied = migrate(connection)
+
+    assert [migration.version for migration in applied] == [migration.version for migration in find_migrations()[2:]]
+    assert connection.execute('SELECT title FROM books').fetchall() == [('Lalka',)]
+    assert current_version(connection) == find_migrations()[-1].version
+
+
+def test_migrations_dir_does_not_depend_on_cwd(connection, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    assert migrate(connection)
+    assert MIGRATIONS_DIR.endswith('Database')
@@ -24,3 +24,13 @@ def test_is_valid_email():
 
     user.email = 'test@abc.pl'
     assert user._is_valid_email() == True
+
+
+def test_models_compare_by_value():
+    assert User('user', 'a@mail.com') == User('user', 'a@mail.com')
+    assert User('user', 'a@mail.com') != User('user', 'b@mail.com')
+    assert Book('book', 'author') == Book('book', 'author')
+    assert len({Book('book', 'author'), Book('book', 'author')}) == 1
+    assert Hiring(User('user', 'a@mail.com'), Book('book', 'author'), datetime(2000, 1, 1)) == \
+        Hiring(User('user', 'a@mail.com'), Book('book', 'author'), datetime(2000, 1, 1))
+    assert not hasattr(Book('book', 'author'), '__dict__')
@@ -0,0 +1,134 @@
+from datetime import datetime
+from smtplib import SMTPServerDisconnected
+
+import pytest
+
+from conftest import FakeSender
+from models import Book, Hiring, User
+from outbox import Outbox
+from worker import OutboxDispatcher, process_batch, run_worker
+
+
+def add_hirings(database):
+    adam, ewa, bad = User('Adam', 'adam@mail.com'), User('Ewa', 'ewa@mail.com'), User('Bad', 'bad')
+    for user, title in ((adam, 'Lalka'), (ewa, 'Potop'), (adam, 'Faraon'), (bad, 'Quo vadis')):
+        database.add_hiring(Hiring(user, Book(title, 'author'), datetime(2022, 1, 1)))
+
+
+def test_enqueue_reminders_marks_hirings_as_reminded(database):
+    add_hirings(database)
+    outbox = Outbox(database)
+    as_of = datetime(2022, 1, 10)
+
+    # hiring of user with invalid email isn't queued
+    assert outbox.enqueue_reminders(as_of) == 3
+    assert outbox.enqueue_reminders(as_of) == 0
+    assert outbox.stats() == {'pending': 3, 'in_flight': 0, 'delayed': 0, 'dead': 0}
+    assert list(database.get_pending_reminders(as_of)) == []
+    assert database.get_last_reminder_run() == as_of
+
+
+def test_enqueue_digests(database):
+    add_hirings(database)
+    outbox = Outbox(database)
+
+    assert outbox.enqueue_reminders(datetime(2022, 1, 10), digest=True) == 2
+    messages = {message.recipient: message for message in outbox.claim(10)}
+    assert sorted(messages['adam@mail.com'].hirings_ids) == [1, 3]
+    assert messages['adam@mail.com'].kind == 'digest'
+
+
+def test_claimed_messages_are_hidden_until_visibility_timeout(database):
+    add_hirings(database)
+    outbox = Outbox(database, visibility_timeout=0)
+    outbox.enqueue_reminders(datetime(2022, 1, 10))
+
+    first = outbox.claim(2)
+    assert len(first) == 2
+    assert sorted(message.attempts for message in outbox.claim(10)) == [1, 2, 2]
+
+    outbox = Outbox(database, visibility_timeout=300)
+    assert len(outbox.claim(10)) == 3
+    assert outbox.claim(10) == []
+    assert outbox.stats()['in_flight'] == 3
+
+
+def test_failed_messages_are_retried_then_dead_lettered(database):
+    add_hirings(database)
+    outbox = Outbox(database, visibility_timeout=300, max_attempts=2, retry_delay=0)
+    outbox.enqueue_reminders(datetime(2022, 1, 10))
+
+    messages = outbox.claim(10)
+    outbox.ack([messages[0].id])
+    outbox.fail([(message, 'error') for message in messages[1:]])
+    assert outbox.stats() == {'pending': 2, 'in_flight': 0, 'delayed': 0, 'dead': 0}
+
+    outbox.fail([(message, 'error') for message in outbox.claim(10)])
+    assert outbox.stats() == {'pending': 0, 'in_flight': 0, 'delayed': 0, 'dead': 2}
+
+    assert outbox.requeue_dead() == 2
+    assert outbox.stats()['pending'] == 2
+
+
+def test_stats_tell_claimed_from_delayed_messages(database):
+    add_hirings(database)
+    outbox = Outbox(database, visibility_timeout=300, retry_delay=60)
+    outbox.enqueue_reminders(datetime(2022, 1, 10))
+
+    messages = outbox.claim(10)
+    outbox.fail([(messages[0], 'error')])
+    assert outbox.stats() == {'pending': 0, 'in_flight': 2, 'delayed': 1, 'dead': 0}
+
+
+def test_process_batch(database):
+    add_hirings(database)
+    outbox = Outbox(database, retry_delay=0)
+    outbox.enqueue_reminders(datetime(2022, 1, 10), digest=True)
+    sender = FakeSender({'ewa@mail.com': (SMTPServerDisconnected(), None)})
+    dispatcher = OutboxDispatcher(lambda: sender, concurrency=2, retries=0)
+
+    report = process_batch(database, outbox, dispatcher, batch_size=10)
+
+    assert (report.sent, report.failed) == (1, 1)
+    assert sender.sent == [('adam@mail.com', ['Lalka', 'Faraon'])]
+    assert outbox.stats() == {'pending': 1, 'in_flight': 0, 'delayed': 0, 'dead': 0}
+
+
+def test_drain_continues_after_batch_of_dropped_messages(database, sender):
+    add_hirings(database)
+    outbox = Outbox(database)
+    outbox.enqueue_reminders(datetime(2022, 1, 10))
+    with database.connection as connection:
+        connection.execute('DELETE FROM hirings WHERE id = 1')
+
+    report = run_worker(database, outbox, lambda: sender, batch_size=1, drain=True)
+
+    assert report.sent == 2
+    assert outbox.stats()['pending'] == 0
+
+
+def test_messages_never_settled_become_dead_letters(database):
+    add_hirings(database)
+    outbox = Outbox(database, visibility_timeout=0, max_attempts=2)
+    outbox.enqueue_reminders(datetime(2022, 1, 10))
+
+    # worker crashed twice on every message - neither ack nor fail was called
+    assert len(outbox.claim(10)) == 3
+    assert len(outbox.claim(10)) == 3
+    assert outbox.claim(10) == []
+    assert outbox.stats() == {'pending': 0, 'in_flight': 0, 'delayed': 0, 'dead': 3}
+
+
+def test_interrupted_batch_keeps_sent_messages_acknowledged(database):
+    add_hirings(database)
+    outbox = Outbox(database, visibility_timeout=300)
+    outbox.enqueue_reminders(datetime(2022, 1, 10))
+
+    # interrupted after the first message was sent
+    sender = FakeSender({'ewa@mail.com': (KeyboardInterrupt(), None)})
+    dispatcher = OutboxDispatcher(lambda: sender, concurrency=1, retries=0)
+    with pytest.raises(KeyboardInterrupt):
+        process_batch(database, outbox, dispatcher, batch_size=10)
+
+    assert len(sender.sent) == 1
+    assert outbox.stats() == {'pending': 0, 'in_flight': 2, 'delayed': 0, 'dead': 0}
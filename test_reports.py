@@ -0,0 +1,75 @@
+from datetime import datetime
+from io import StringIO
+
+import pytest
+
+import main
+from models import Book, Hiring, User
+from reports import REPORTS, export_report, run_report
+
+AS_OF = datetime(2022, 3, 1)
+
+
+@pytest.fixture
+def hirings(database):
+    adam, ewa = User('Adam', 'adam@mail.com'), User('Ewa', 'ewa@mail.com')
+    lalka, potop = Book('Lalka', 'Bolesław Prus'), Book('Potop', 'Henryk Sienkiewicz')
+    for hiring, created_at in (
+            (Hiring(adam, lalka, datetime(2022, 1, 30)), '2022-01-01 10:00:00'),
+            (Hiring(adam, potop, datetime(2022, 2, 19)), '2022-01-20 10:00:00'),
+            (Hiring(ewa, lalka, datetime(2022, 2, 27)), '2022-02-03 10:00:00'),
+            (Hiring(ewa, potop, datetime(2022, 3, 20)), '2022-03-01 10:00:00')):
+        database.add_hiring(hiring)
+        database.connection.execute('UPDATE hirings SET created_at = ? WHERE id = last_insert_rowid()',
+                                    (created_at,))
+    return database
+
+
+def test_overdue_reports(hirings):
+    assert list(run_report(hirings, 'overdue_by_user', AS_OF)) == [
+        ('Adam', 'adam@mail.com', 2, 20.0, 30), ('Ewa', 'ewa@mail.com', 1, 2.0, 2)]
+    assert list(run_report(hirings, 'overdue_by_author', AS_OF)) == [
+        ('Bolesław Prus', 2, 2, 100.0, 16.0), ('Henryk Sienkiewicz', 2, 1, 50.0, 10.0)]
+    assert list(run_report(hirings, 'days_late', AS_OF)) == [
+        ('2022-01', 1, 30.0, 30, 1), ('2022-02', 2, 6.0, 10, 3)]
+    assert list(run_report(hirings, 'overdue_by_user', datetime(2022, 1, 1))) == []
+
+
+def test_loans_reports(hirings):
+    assert list(run_report(hirings, 'loans_per_month', AS_OF)) == [
+        ('2022-01', 2, 2, 2), ('2022-02', 1, -1, 3), ('2022-03', 1, 0, 4)]
+    assert list(run_report(hirings, 'top_books', limit=1)) == [(1, 'Lalka', 'Bolesław Prus', 2)]
+    assert [row[0] for row in run_report(hirings, 'top_books')] == [1, 1]
+
+
+def test_export_formats(hirings):
+    for file_format, expected in (
+            ('csv', ['name,email,overdue,avg_days_late,max_days_late', 'Adam,adam@mail.com,2,20.0,30']),
+            ('jsonl', ['{"name": "Adam", "email": "adam@mail.com", "overdue": 2, '
+                       '"avg_days_late": 20.0, "max_days_late": 30}']),
+            ('text', ['name              email             overdue           avg_days_late     max_days_late',
+                      '-' * 16 + '  ' + '-' * 16 + '  ' + '-' * 16 + '  ' + '-' * 16 + '  ' + '-' * 16,
+                      'Adam              adam@mail.com     2                 20.0              30'])):
+        file = StringIO()
+        assert export_report(hirings, 'overdue_by_user', file, file_format, AS_OF, limit=1) == 1
+        assert file.getvalue().splitlines() == expected
+
+
+def test_every_report_runs_on_empty_db(database):
+    for name, report in REPORTS.items():
+        file = StringIO()
+        assert export_report(database, name, file, 'csv') == 0
+        assert file.getvalue().splitlines() == [','.join(report.columns)]
+
+
+def test_report_command(tmp_path, capsys):
+    database_name = str(tmp_path / 'database.db')
+    main.main(['--database', database_name, 'add', 'hiring', 'Ewa', 'ewa@mail.com', 'Potop',
+               'Henryk Sienkiewicz', '2022-01-31'])
+    output = tmp_path / 'overdue.csv'
+
+    main.main(['--database', database_name, 'report', 'overdue_by_user', '--format', 'csv',
+               '--as-of', '2022-02-10', '--output', str(output)])
+
+    assert 'Zapisano wierszy: 1' in capsys.readouterr().out
+    assert output.read_text(encoding='utf8').splitlines()[1] == 'Ewa,ewa@mail.com,1,10.0,10'
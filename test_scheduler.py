@@ -0,0 +1,145 @@
+import sqlite3
+from datetime import datetime, timedelta
+from threading import Thread
+
+import pytest
+
+from controllers import Database, to_timestamp
+from models import Book, Hiring, User
+from outbox import Outbox
+from scheduler import Scheduler
+
+NOW = datetime(2022, 1, 10, 12)
+
+
+@pytest.fixture
+def databases(file_database):
+    """ (db of scheduler, db of other process) - connections to the same file """
+    scheduler_database = Database(file_database.name)
+    yield scheduler_database, file_database
+    scheduler_database.close_connection()
+
+
+def add_hiring(database, name, title, returned_to):
+    database.add_hiring(Hiring(User(name, f'{name.lower()}@mail.com'), Book(title, 'author'), returned_to))
+
+
+def make_scheduler(database, sender, **kwargs):
+    return Scheduler(database, Outbox(database), lambda: sender, **kwargs)
+
+
+def test_start_sends_missed_reminders_and_sleeps_until_deadline(databases, sender):
+    scheduler_database, other_database = databases
+    add_hiring(other_database, 'Adam', 'Lalka', NOW - timedelta(days=1))
+    add_hiring(other_database, 'Ewa', 'Potop', NOW + timedelta(seconds=30))
+    add_hiring(other_database, 'Jan', 'Faraon', NOW + timedelta(days=3))
+    scheduler = make_scheduler(scheduler_database, sender, check_interval=60)
+
+    assert scheduler.start(NOW) == 1
+    assert sender.sent == [('adam@mail.com', ['Lalka'])]
+    # deadline beyond lookahead window isn't loaded
+    assert scheduler.deadlines == [to_timestamp(NOW + timedelta(seconds=30))]
+    assert scheduler.tick(NOW) == 31
+
+    assert scheduler.tick(NOW + timedelta(seconds=30)) == 1
+    assert len(sender.sent) == 1
+    scheduler.tick(NOW + timedelta(seconds=31))
+    assert sender.sent[1:] == [('ewa@mail.com', ['Potop'])]
+    assert scheduler.tick(NOW + timedelta(seconds=31)) == 60
+
+
+def test_new_hirings_are_loaded_by_change_marker(databases, sender):
+    scheduler_database, other_database = databases
+    scheduler = make_scheduler(scheduler_database, sender, check_interval=60)
+    scheduler.start(NOW)
+
+    add_hiring(other_database, 'Adam', 'Lalka', NOW - timedelta(days=5))
+    add_hiring(other_database, 'Ewa', 'Potop', NOW + timedelta(seconds=10))
+    add_hiring(other_database, 'Jan', 'Faraon', NOW + timedelta(days=3))
+
+    assert scheduler.tick(NOW + timedelta(seconds=1)) == 10
+    # hiring overdue before last run is sent too (lower bound of run is moved)
+    assert sender.sent == [('adam@mail.com', ['Lalka'])]
+    assert scheduler.last_id == 3
+    scheduler.tick(NOW + timedelta(seconds=11))
+    assert sender.sent[1:] == [('ewa@mail.com', ['Potop'])]
+
+    # the next window loads deadline of the last hiring
+    scheduler.tick(NOW + timedelta(days=3, seconds=1))
+    assert sender.sent[2:] == [('jan@mail.com', ['Faraon'])]
+
+
+def test_reminder_is_repeated_after_interval(databases, sender):
+    scheduler_database, other_database = databases
+    add_hiring(other_database, 'Adam', 'Lalka', NOW - timedelta(days=1))
+    scheduler = make_scheduler(scheduler_database, sender, interval=timedelta(hours=1), digest=True)
+    scheduler.start(NOW)
+
+    scheduler.tick(NOW + timedelta(minutes=30))
+    assert len(sender.sent) == 1
+    scheduler.tick(NOW + timedelta(hours=1, seconds=1))
+    assert sender.sent == [('adam@mail.com', ['Lalka'])] * 2
+
+
+def test_run_until_stopped(databases, sender):
+    scheduler_database, other_database = databases
+    scheduler = make_scheduler(scheduler_database, sender, check_interval=0.01)
+    thread = Thread(target=scheduler.run)
+    thread.start()
+    try:
+        add_hiring(other_database, 'Adam', 'Lalka', datetime.now() - timedelta(days=1))
+        for _ in range(500):
+            if sender.sent:
+                break
+            thread.join(0.01)
+    finally:
+        scheduler.stop()
+        thread.join()
+    assert sender.sent == [('adam@mail.com', ['Lalka'])]
+    assert scheduler.report.sent == 1
+
+
+def test_run_survives_failed_ticks(databases, sender, monkeypatch):
+    scheduler_database, other_database = databases
+    scheduler = make_scheduler(scheduler_database, sender, check_interval=0.01, max_backoff=0.02)
+    enqueue_reminders = scheduler.outbox.enqueue_reminders
+    calls = []
+
+    def locked_once(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= 2:
+            raise sqlite3.OperationalError('database is locked')
+        return enqueue_reminders(*args, **kwargs)
+
+    monkeypatch.setattr(scheduler.outbox, 'enqueue_reminders', locked_once)
+    add_hiring(other_database, 'Adam', 'Lalka', datetime.now() - timedelta(days=1))
+    thread = Thread(target=scheduler.run)
+    thread.start()
+    try:
+        for _ in range(500):
+            if sender.sent:
+                break
+            thread.join(0.01)
+    finally:
+        scheduler.stop()
+        thread.join()
+    assert sender.sent == [('adam@mail.com', ['Lalka'])]
+    assert len(calls) == 3
+
+
+def test_failed_tick_keeps_due_deadlines(databases, sender, monkeypatch):
+    scheduler_database, other_database = databases
+    add_hiring(other_database, 'Ewa', 'Potop', NOW + timedelta(seconds=10))
+    scheduler = make_scheduler(scheduler_database, sender)
+    scheduler.start(NOW)
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(scheduler.outbox, 'enqueue_reminders', locked)
+    with pytest.raises(sqlite3.OperationalError):
+        scheduler.tick(NOW + timedelta(seconds=11))
+    monkeypatch.undo()
+
+    scheduler.tick(NOW + timedelta(seconds=12))
+    assert sender.sent == [('ewa@mail.com', ['Potop'])]
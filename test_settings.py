@@ -0,0 +1,18 @@
+from settings import Settings, load_settings
+
+
+def test_settings_are_parsed_once(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text("email='mail@mail.com'\nsmtp_server='localhost'\nsmtp_port=465\n")
+
+    settings = load_settings(str(env_file))
+    env_file.write_text("email='other@mail.com'\n")
+
+    assert settings == Settings(email='mail@mail.com', smtp_server='localhost', smtp_port=465)
+    assert load_settings(str(env_file)) is settings
+    load_settings.cache_clear()
+    assert load_settings(str(env_file)).email == 'other@mail.com'
+
+
+def test_missing_env_file_gives_empty_settings(tmp_path):
+    assert load_settings(str(tmp_path / 'missing.env')) == Settings()
@@ -0,0 +1,71 @@
+from datetime import datetime
+from functools import partial
+from smtplib import SMTPServerDisconnected
+
+from conftest import FakeSender
+from models import Book, Hiring, User
+from sharding import get_shards, run_sharded
+
+
+# picklable factory - senders are created in worker processes
+sender_factory = partial(FakeSender, {'user0@mail.com': (SMTPServerDisconnected(), None)})
+
+
+def add_hirings(database, users=10, hirings_per_user=3):
+    for number in range(users * hirings_per_user):
+        user_number = number % users
+        name = f'broken {user_number}' if user_number == 0 else f'user {user_number}'
+        email = 'invalid' if user_number == 1 else f'user{user_number}@mail.com'
+        database.add_hiring(Hiring(User(name, email), Book(f'title {number}', 'author'), datetime(2022, 1, 1)))
+
+
+def test_get_shards_cover_all_pending_hirings_without_overlap(database):
+    add_hirings(database)
+    as_of = datetime(2022, 1, 10)
+
+    for shard_key in ('id', 'user_id'):
+        shards = get_shards(database, 4, shard_key, as_of)
+        assert 1 < len(shards) <= 4
+        ids = [hiring.hiring_id for shard in shards for hiring in database.get_pending_reminders(as_of, shard=shard)]
+        # hirings of user with invalid email (ids 2, 12, 22) aren't pending
+        assert sorted(ids) == [hiring_id for hiring_id in range(1, 31) if hiring_id % 10 != 2]
+
+    assert get_shards(database, 4, 'id', datetime(2021, 1, 1)) == []
+
+
+def test_user_is_not_split_between_shards(database):
+    add_hirings(database, users=3, hirings_per_user=20)
+
+    assert len(get_shards(database, 8, 'user_id', datetime(2022, 1, 10))) == 2
+
+
+def test_run_sharded(file_database):
+    add_hirings(file_database)
+
+    report = run_sharded(file_database.name, shards=3, digest=True, sender_factory=sender_factory, concurrency=1)
+
+    assert len(report.shards) == 3
+    assert (report.sent, report.failed) == (24, 3)
+    assert file_database.get_last_reminder_run() is not None
+    # failed reminders are retried by next run
+    assert {hiring.user.name for hiring in file_database.get_pending_reminders()} == {'broken 0'}
+    assert file_database.connection.execute(
+        'SELECT COUNT(*) FROM reminders WHERE sent_count = 1').fetchone() == (24,)
+
+
+class CrashingSender(FakeSender):
+    """ sender which session can't be opened - whole shard crashes """
+    def open_session(self):
+        raise RuntimeError('no connection')
+
+
+def test_crashed_shards_are_recorded_as_failed(file_database):
+    add_hirings(file_database)
+
+    report = run_sharded(file_database.name, shards=3, sender_factory=CrashingSender, concurrency=1)
+
+    # hirings of user with invalid email aren't pending at all
+    assert (report.sent, report.failed) == (0, 27)
+    assert {error for _, error in report.failures} == {'no connection'}
+    assert file_database.get_last_reminder_run() is not None
+    assert len(list(file_database.get_pending_reminders())) == 27
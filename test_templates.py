@@ -0,0 +1,67 @@
+from datetime import datetime
+from email import message_from_bytes, message_from_string
+from email.policy import default
+
+import pytest
+
+from models import Book, Hiring, User
+from templates import MessageRenderer, compile_template, get_template
+
+user = User('Zażółć', 'user@mail.com')
+hirings = [
+    Hiring(user, Book('Lalka', 'Bolesław Prus'), datetime(2022, 1, 2)),
+    Hiring(user, Book('Potop {1}', 'Henryk Sienkiewicz'), datetime(2022, 2, 3)),
+]
+
+
+def test_compile_template():
+    assert compile_template('$a ${b} $$ {c}\n') == '{a} {b} $ {{c}}\r\n'
+    with pytest.raises(ValueError):
+        compile_template('$ a')
+    assert get_template('reminder', 'pl') is get_template('reminder', 'pl')
+
+
+def test_reminder_message():
+    renderer = MessageRenderer('Rafał', 'rafal@mail.com')
+    message = message_from_bytes(renderer.reminder(hirings[0]), policy=default)
+
+    assert message['From'] == 'Rafał <rafal@mail.com>'
+    assert message['To'] == 'Zażółć <user@mail.com>'
+    assert message['Subject'] == 'Czas zwrócić moją książkę'
+    assert message['Message-ID'].endswith('@mail.com>')
+    assert message['Date'] is not None
+    body = message.get_content().replace('\r\n', '\n')
+    assert '02.01.2022' in body and 'Lalka (autorstwa Bolesław Prus)' in body
+    assert body.endswith('Rafał\n')
+
+
+def test_digest_message_in_english():
+    renderer = MessageRenderer('Rafał', 'rafal@mail.com', locale='en')
+    message = message_from_bytes(renderer.digest(user, hirings), policy=default)
+
+    assert message['Subject'] == 'Time to return my books'
+    body = message.get_content().replace('\r\n', '\n')
+    assert '- Lalka (by Bolesław Prus), due: 2022-01-02\n' in body
+    assert '- Potop {1} (by Henryk Sienkiewicz), due: 2022-02-03\n' in body
+
+
+def test_non_ascii_addresses():
+    renderer = MessageRenderer('Rafał', 'rafal@mail.com')
+    for email, expected in (('józef@mail.pl', 'józef@mail.pl'), ('jozef@łódź.pl', 'jozef@xn--d-uga0v4h.pl')):
+        hiring = Hiring(User('Józef "J" Nowak', email), Book('Lalka', 'Bolesław Prus'), datetime(2022, 1, 2))
+        # non-ASCII local part is sent as UTF-8 (RFC 6532)
+        message = message_from_string(renderer.reminder(hiring).decode('utf8'), policy=default)
+
+        assert message['To'].addresses[0].display_name == 'Józef "J" Nowak'
+        assert message['To'].addresses[0].addr_spec == expected
+
+
+def test_line_breaks_cannot_inject_headers():
+    renderer = MessageRenderer('Rafał\r\nBcc: sender@evil.com', 'rafal@mail.com')
+    hiring = Hiring(User('Jan\r\nBcc: victim@evil.com\r\n', 'jan@mail.com\n'), Book('Lalka', 'Prus'), datetime(2022, 1, 2))
+    message = message_from_bytes(renderer.reminder(hiring), policy=default)
+
+    assert message['Bcc'] is None
+    assert message['To'].addresses[0].display_name == 'Jan Bcc: victim@evil.com '
+    assert message['To'].addresses[0].addr_spec == 'jan@mail.com'
+    assert message['From'].addresses[0].display_name == 'Rafał Bcc: sender@evil.com'
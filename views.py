@@ -1,93 +1,88 @@
 """ definition of all views used in app """
-from datetime import datetime
-from os import system, path, listdir
-from sqlite3 import connect
+from datetime import datetime, timedelta
+from os import system, path
+from sys import executable
 from time import sleep
-from tabulate import tabulate
 
-from controllers import Database, EmailSender
+from cache import CachedDatabase
+from migrations import migrate
 from models import User, Book, Hiring
+from outbox import Outbox
 
+WORKER_SCRIPT = path.join(path.dirname(path.abspath(__file__)), 'worker.py')
 
-class Application:
-    """ main class of application """
-
-    def __init__(self, database_name: str = 'database.db'):
-        self.database_name = database_name
 
-        if not path.exists(self.database_name):
-            self._create_empty_database()
-            self._read_sql_scripts_from_database_dir()
-            self._run_sql_scripts()
+def _tabulate(*args, **kwargs) -> str:
+    # tabulate is imported only when interactive view shows table (commands of main.py don't need it)
+    from tabulate import tabulate
+    return tabulate(*args, **kwargs)
 
-        self.database = Database(self.database_name)
 
-    def _create_empty_database(self):
-        open(self.database_name, mode='w').close()
-
-    def _read_sql_scripts_from_database_dir(self):
-        files_list = sorted(listdir('Database'))
-        self.sql_commands = []
+class Application:
+    """ main class of application """
 
-        for filename in files_list:
-            with open(f'Database/{filename}', mode='r', encoding='utf8') as sql_script:
-                lines = sql_script.readlines()
-                lines = ' '.join(lines).split(';')
-                for line in lines:
-                    self.sql_commands.append(line)
+    def __init__(self, database_name: str = 'database.db',
+                 reminder_concurrency: int = 4, reminder_rate_limit: float = None,
+                 reminder_interval: timedelta = timedelta(days=7), page_size: int = 20,
+                 worker_log: str = 'worker.log'):
+        self.database_name = database_name
+        self.worker_log = worker_log
+        self.page_size = page_size
+        self.reminder_concurrency = reminder_concurrency
+        self.reminder_rate_limit = reminder_rate_limit
+        self.reminder_interval = reminder_interval
+
+        self.database = CachedDatabase(self.database_name)
+        migrate(self.database.connection)
+        self.database.validate_emails()
+        self.outbox = Outbox(self.database)
+
+    def _show_pages(self, title: str, headers: tuple, get_page, to_row):
+        """ shows table page by page (only one page is fetched from db at a time) """
+        rows = get_page(limit=self.page_size)
+        offset = 0
 
-    def _run_sql_scripts(self):
-        connection = connect(self.database_name)
-        cursor = connection.cursor()
-        for command in self.sql_commands:
-            cursor.execute(command)
+        while True:
+            system('clear')
+            print(title)
+            print(_tabulate(
+                [to_row(item) for _, item in rows], headers=headers,
+                tablefmt='fancy_grid',
+                showindex=range(offset + 1, offset + len(rows) + 1)))
+
+            choice = input('\n\n--- [n] następna strona, [p] poprzednia strona, '
+                           '[Enter] powrót do menu ---\n\n').strip().lower()
+            if choice == 'n' and len(rows) == self.page_size:
+                next_rows = get_page(after_id=rows[-1][0], limit=self.page_size)
+                if next_rows:
+                    offset += len(rows)
+                    rows = next_rows
+            elif choice == 'p' and offset > 0:
+                rows = get_page(before_id=rows[0][0], limit=self.page_size)
+                offset -= len(rows)
+            elif choice not in ('n', 'p'):
+                break
 
     def _show_users(self):
-        system('clear')
-        print('Wykaz użytkowników')
-        data = [(user.name, user.email) for user in self.database.get_all_users()]
-        headers = ('Imię', 'Adres email')
-
-        print(tabulate(
-            data, headers=headers,
-            tablefmt='fancy_grid',
-            showindex=range(1, len(data)+1)))
-
-        input('\n\n--- Naciśnij dowolny klawisz aby kontynuować ---\n\n')
-        self.run()
+        self._show_pages(
+            'Wykaz użytkowników', ('Imię', 'Adres email'),
+            self.database.get_users_page,
+            lambda user: (user.name, user.email))
 
     def _show_books(self):
-        system('clear')
-        print('Wykaz książek')
-        data = [(book.title, book.author) for book in self.database.get_all_books()]
-        headers = ('Tytuł', 'Autor')
-
-        print(tabulate(
-            data, headers=headers,
-            tablefmt='fancy_grid',
-            showindex=range(1, len(data)+1)))
-
-        input('\n\n--- Naciśnij dowolny klawisz aby kontynuować ---\n\n')
-        self.run()
+        self._show_pages(
+            'Wykaz książek', ('Tytuł', 'Autor'),
+            self.database.get_books_page,
+            lambda book: (book.title, book.author))
 
     def _show_hirings(self):
-        system('clear')
-        print('Wykaz wypożyczeń')
-
-        data = [(hiring.book.title,
-                hiring.book.author,
-                hiring.user.name,
-                hiring.returned_to.strftime('%Y-%m-%d'))
-                for hiring in self.database.get_all_hirings()]
-        headers = ('Tytuł', 'Autor', 'Wypożyczający', 'Data zwrotu')
-
-        print(tabulate(
-            data, headers=headers,
-            tablefmt='fancy_grid',
-            showindex=range(1, len(data)+1)))
-
-        input('\n\n--- Naciśnij dowolny klawisz aby kontynuować ---\n\n')
-        self.run()
+        self._show_pages(
+            'Wykaz wypożyczeń', ('Tytuł', 'Autor', 'Wypożyczający', 'Data zwrotu'),
+            self.database.get_hirings_page,
+            lambda hiring: (hiring.book.title,
+                            hiring.book.author,
+                            hiring.user.name,
+                            hiring.returned_to.strftime('%Y-%m-%d')))
 
     def _add_user(self):
         system('clear')
@@ -95,12 +90,11 @@ class Application:
         username = input('Imię: ')
         email = input('Adres email: ')
 
-        existed_users = self.database.get_all_users()
-        if (username, email) not in existed_users:
-            self.database.add_user(user=User(username, email))
+        user = User(username, email)
+        if not self.database.has_user(user):
+            self.database.add_user(user=user)
 
         input('\n\n--- Naciśnij dowolny klawisz aby kontynuować ---\n\n')
-        self.run()
 
     def _add_book(self):
         system('clear')
@@ -108,27 +102,27 @@ class Application:
         title = input('Tytuł: ')
         author = input('Autor: ')
 
-        existed_books = self.database.get_all_books()
-        if (title, author) not in existed_books:
-            self.database.add_book(book=Book(title, author))
+        book = Book(title, author)
+        if not self.database.has_book(book):
+            self.database.add_book(book=book)
 
         input('\n\n--- Naciśnij dowolny klawisz aby kontynuować ---\n\n')
-        self.run()
 
     def _add_hiring(self):
         system('clear')
         print('Dodaj nowe wypożyczenie\n\n\tWypożyczający:')
 
         username = input('Imię: ')
-        existed_users = self.database.get_users_by_name(username)[username]
+        existed_users = self.database.search_users(username)
 
-        if len(existed_users) > 1:
+        choice = 0
+        if existed_users:
             data = [(user.name, user.email) for user in existed_users]
             print(f'Znaleziono {len(existed_users)} ' +
                   f'użytkowników o nazwie zawierającej frazę "{username}"')
             headers = ('Imię', 'Adres email')
 
-            print(tabulate(
+            print(_tabulate(
                 data, headers=headers,
                 tablefmt='fancy_grid',
                 showindex=range(1, len(data)+1)))
@@ -137,34 +131,29 @@ class Application:
             while True:
                 try:
                     choice = int(input('Wybierz wypożyczającego (naciśnij 0 aby dodać nowego): '))
-                    if choice == 0:
-                        self._add_user()
-                    elif choice not in range(len(existed_users)):
+                    if choice not in range(len(existed_users) + 1):
                         raise ValueError
                 except ValueError:
                     print('!!! Wybrano złą wartość !!!')
                     continue
                 break
+        # new user is added here instead of in nested _add_user view
+        if choice:
+            user = existed_users[choice - 1]
         else:
-            choice = 1
-        try:
-            email = existed_users[choice - 1].email
-        except IndexError:
-            email = input('Adres email: ')
-            self.database.add_user(User(username, email))
-
-        user = User(username, email)
+            user = User(username, input('Adres email: '))
+            self.database.add_user(user)
 
         print('\tKsiążka:')
         title = input('Tytuł: ')
-        existed_books = self.database.get_books_by_titles(title)
-        existed_books = existed_books[title]
+        existed_books = self.database.search_books(title)
         data = [(book.title, book.author) for book in existed_books]
-        if len(data) > 1:
+        choice = 0
+        if data:
             print(f'Znaleziono {len(existed_books)} książek o tytule zawierającym frazę "{title}"')
             headers = ('Tytuł', 'Autor')
 
-            print(tabulate(
+            print(_tabulate(
                 data, headers=headers,
                 tablefmt='fancy_grid',
                 showindex=range(1, len(data)+1)))
@@ -173,19 +162,20 @@ class Application:
             while True:
                 try:
                     choice = int(input('Wybierz, którą książkę chcesz wypożyczyć (aby dodać nową wybierz 0): '))
-                    if choice == 0:
-                        self._add_book()
-                    elif choice not in range(len(existed_books)):
+                    if choice not in range(len(existed_books) + 1):
                         raise ValueError
                 except ValueError:
                     print('!!! Wybrano złą wartość !!!')
                     continue
                 break
+
+        if choice:
             title = existed_books[choice - 1].title
             author = existed_books[choice - 1].author
-
         else:
-            print('Nie znaleziono książki o podobnym tytule. Dodaj taką książkę:')
+            # new book is added with hiring instead of in nested _add_book view
+            print('Nie znaleziono książki o podobnym tytule. Dodaj taką książkę:' if not data
+                  else 'Dodaj nową książkę:')
             title = input('Tytuł: ')
             author = input('Autor: ')
 
@@ -200,25 +190,59 @@ class Application:
         self.database.add_hiring(
             Hiring(user, book, returned_to)
         )
-        self.run()
 
-    def _send_reminder_emails(self):
-        sender = EmailSender()
+    def enqueue_reminders(self, digest: bool = False) -> int:
+        """ queues reminders of hirings overdue since last run (see Outbox.enqueue_reminders)
+
+        Returns:
+            int: number of queued messages
+        """
+        return self.outbox.enqueue_reminders(
+            datetime.now(), self.database.get_last_reminder_run(),
+            digest=digest, interval=self.reminder_interval)
 
+    def start_worker(self):
+        """ starts worker.py draining outbox in background (it outlives app) """
+        command = [executable, WORKER_SCRIPT, '--database', self.database_name, '--drain',
+                   '--concurrency', str(self.reminder_concurrency)]
+        if self.reminder_rate_limit:
+            command += ['--rate', str(self.reminder_rate_limit)]
+        from subprocess import Popen, STDOUT
+
+        with open(self.worker_log, mode='a', encoding='utf8') as log:
+            Popen(command, stdout=log, stderr=STDOUT, start_new_session=True)
+
+    def _send_reminder_emails(self):
         system('clear')
-        print('Wysyłanie maili z przypomnieniem\n')
-        for hiring in self.database.get_all_hirings():
-            if hiring.is_out_of_date():
-                if hiring.user.is_valid_email():
-                    sender.send_reminder_email(hiring)
-                    print(f'Wysłano mail do: {hiring.user}')
-                else:
-                    print(f'Nie udało się wysłać maila do {hiring.user} - niepoprawny adres email!')
+        print('''Wysyłanie maili z przypomnieniem
+
+    1 - osobny mail dla każdego przetrzymanego wypożyczenia
+    2 - jeden zbiorczy mail dla każdego wypożyczającego
+    ''')
+        while True:
+            try:
+                mode = int(input('Wybierz rodzaj maili: '))
+                if mode not in (1, 2):
+                    raise ValueError
+            except ValueError:
+                print('\t!!! Wybierz odpowiednią liczbę !!!')
+                continue
+            break
+        print()
+
+        enqueued = self.enqueue_reminders(digest=mode == 2)
+        stats = self.outbox.stats()
+        print(f'Dodano do kolejki maili: {enqueued}')
+        print(f'Oczekujące: {stats["pending"]}, w trakcie wysyłania: {stats["in_flight"]}, '
+              f'czekające na ponowienie: {stats["delayed"]}, nieudane: {stats["dead"]}')
+        if stats['pending']:
+            self.start_worker()
+            print(f'Maile są wysyłane w tle (postęp w pliku {self.worker_log})')
 
         input('\n\n--- Naciśnij dowolny klawisz aby kontynuować ---\n\n')
-        self.run()
 
     def run(self):
+        """ main menu - every action returns here, until user quits """
         OPTIONS = {
             1: self._show_users,
             2: self._show_books,
@@ -230,6 +254,14 @@ class Application:
             0: self.quit_app,
         }
 
+        while True:
+            choice = self._choose_option(OPTIONS)
+            OPTIONS[choice]()
+            if choice == 0:
+                return
+
+    @staticmethod
+    def _choose_option(options: dict) -> int:
         system('clear')
         print('''Witaj w menadżerze wypożyczania książek
     
@@ -250,14 +282,12 @@ class Application:
         while True:
             try:
                 choice = int(input('Wybierz co chcesz zrobić: '))
-                if choice not in OPTIONS:
+                if choice not in options:
                     raise ValueError
             except ValueError:
                 print('\t!!! Wybierz odpowiednią liczbę !!!')
                 continue
-            break
-
-        OPTIONS[choice]()
+            return choice
 
     @staticmethod
     def quit_app():
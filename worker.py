@@ -0,0 +1,130 @@
+""" Worker sending emails queued in outbox (see outbox.py)
+
+Usage:
+    python worker.py --database database.db          # runs until interrupted
+    python worker.py --database database.db --drain  # exits when queue is empty
+"""
+from argparse import ArgumentParser
+from contextlib import nullcontext
+from time import sleep
+from typing import Callable
+
+import metrics
+from controllers import Database
+from dispatcher import DispatchReport, ReminderDispatcher
+from mailer import EmailSender
+from outbox import Outbox
+
+
+class OutboxDispatcher(ReminderDispatcher):
+    """ ReminderDispatcher sending outbox messages
+
+    Items passed to `run` are tuples (OutboxMessage, list of message's hirings).
+    """
+
+    @staticmethod
+    def _send(sender, item: tuple) -> None:
+        message, hirings = item
+        if message.kind == 'digest':
+            sender.send_digest_email(hirings[0].user, hirings)
+        else:
+            sender.send_reminder_email(hirings[0])
+
+
+def process_batch(database: Database, outbox: Outbox, dispatcher: ReminderDispatcher,
+                  batch_size: int = 100) -> DispatchReport:
+    """ function claims one batch of messages, sends them and acknowledges sent ones
+
+    Messages which hirings don't exist anymore are dropped (invalid addresses aren't
+    queued at all, see controllers.VALID_RECIPIENT_CONDITION).
+
+    Returns:
+        DispatchReport: counters of batch, None when queue is empty
+    """
+    messages = outbox.claim(batch_size)
+    if not messages:
+        return None
+
+    hirings = database.get_hirings_by_id(
+        *{hiring_id for message in messages for hiring_id in message.hirings_ids})
+    items, dropped = [], []
+    for message in messages:
+        message_hirings = [hirings[hiring_id] for hiring_id in message.hirings_ids if hiring_id in hirings]
+        if message_hirings:
+            items.append((message, message_hirings))
+        else:
+            dropped.append(message.id)
+
+    outbox.ack(dropped)
+
+    def settle(item, error):
+        # every message is acknowledged (or failed) as soon as it is sent - when batch is
+        # interrupted, already sent messages aren't claimed again
+        if error is None:
+            outbox.ack([item[0].id])
+        else:
+            outbox.fail([(item[0], error)])
+
+    return dispatcher.run(items, callback=settle)
+
+
+def run_worker(database: Database, outbox: Outbox, sender_factory: Callable = EmailSender,
+               batch_size: int = 100, concurrency: int = 4, rate: float = None,
+               poll_interval: float = 5.0, drain: bool = False) -> DispatchReport:
+    """ function processes batches until interrupted (or until queue is empty if `drain`)
+
+    Returns:
+        DispatchReport: counters of all batches
+    """
+    # failed messages go back to outbox (with backoff), so dispatcher doesn't retry them itself
+    dispatcher = OutboxDispatcher(sender_factory, concurrency=concurrency, rate=rate, retries=0)
+    total = DispatchReport()
+    while True:
+        report = process_batch(database, outbox, dispatcher, batch_size)
+        if report is None:
+            if drain:
+                return total
+            sleep(poll_interval)
+            continue
+        # batch can have no sent nor failed message (all dropped) - the next one is claimed anyway
+        total.sent += report.sent
+        total.failed += report.failed
+        total.elapsed += report.elapsed
+        if report.sent or report.failed:
+            print(f'Paczka - {report}', flush=True)
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Sends emails queued in outbox')
+    parser.add_argument('--database', default='database.db')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=None, help='max messages per second')
+    parser.add_argument('--visibility-timeout', type=float, default=300)
+    parser.add_argument('--max-attempts', type=int, default=5)
+    parser.add_argument('--retry-delay', type=float, default=60)
+    parser.add_argument('--poll-interval', type=float, default=5.0)
+    parser.add_argument('--drain', action='store_true', help='exit when queue is empty')
+    parser.add_argument('--metrics', help='save metrics to file at exit (.json - JSON, else Prometheus text)')
+    parser.add_argument('--profile', help='save cProfile stats of whole run to file')
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+    database = Database(args.database)
+    outbox = Outbox(database, args.visibility_timeout, args.max_attempts, args.retry_delay)
+    try:
+        with metrics.profile(args.profile) if args.profile else nullcontext():
+            report = run_worker(database, outbox, EmailSender, args.batch_size, args.concurrency,
+                                args.rate, args.poll_interval, args.drain)
+        print(f'Podsumowanie - {report}')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        database.close_connection()
+        if args.metrics:
+            metrics.REGISTRY.export(args.metrics)
+
+
+if __name__ == '__main__':
+    main()